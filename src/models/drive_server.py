@@ -0,0 +1,260 @@
+"""
+Drive Prediction Server
+
+Description: Local HTTP server scoring drives with the GradientBoostingClassifier of drives.ipynb. The model and
+its label encoder are loaded once from the model registry (models/registry.py). Requests are queued, and a batching
+thread collects them for a short window (or until max_batch drives are waiting) and scores them with a single
+predict_proba call, so concurrent requests share the per call overhead of the model.
+
+POST /predict takes one drive ({"los": 50, ...}) or several ({"drives": [{...}, ...]}) with the features of
+DRIVE_FEATURES and answers {"classes": [...], "probabilities": [[...], ...]}, one row of class probabilities per
+drive. GET /metrics answers the request, batch, latency and throughput counters of the server.
+"""
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from models.drive_training import DRIVE_FEATURES
+from models.registry import load_model
+
+MODEL_NAME = 'drive_classifier'
+WINDOW_SECONDS = 0.005
+MAX_BATCH = 256
+REQUEST_TIMEOUT = 10
+# Number of recent requests the latency percentiles are computed from
+LATENCY_HISTORY = 10000
+
+
+class ServerMetrics:
+    """
+    Thread safe counters of a prediction server.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.drives = 0
+        self.batches = 0
+        self.predict_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+
+    def record_request(self, seconds):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def record_batch(self, drives, seconds):
+        with self.lock:
+            self.batches += 1
+            self.drives += drives
+            self.predict_seconds += seconds
+
+    def snapshot(self):
+        """Counters, mean batch size, drives per second since the start and latency percentiles in ms."""
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            uptime = time.monotonic() - self.started
+            percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [0.0] * 3
+            return {
+                'requests': self.requests, 'errors': self.errors, 'drives': self.drives, 'batches': self.batches,
+                'mean_batch_size': self.drives / self.batches if self.batches else 0.0,
+                'mean_predict_ms': 1000 * self.predict_seconds / self.batches if self.batches else 0.0,
+                'drives_per_second': self.drives / uptime, 'uptime_seconds': uptime,
+                'latency_ms': {'p50': percentiles[0], 'p95': percentiles[1], 'p99': percentiles[2],
+                               'max': float(latencies.max()) if len(latencies) else 0.0},
+            }
+
+
+class MicroBatcher:
+    """
+    Collects the rows submitted by concurrent callers for up to window seconds (or max_batch rows), runs predict
+    once on all of them and hands every caller its own rows of the result.
+    """
+
+    def __init__(self, predict, window=WINDOW_SECONDS, max_batch=MAX_BATCH, metrics=None):
+        self.predict = predict
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = metrics or ServerMetrics()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, rows):
+        """Future of the predictions of a 2D array of rows."""
+        future = Future()
+        self.queue.put((rows, future))
+        return future
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self, first):
+        pending, size = [first], len(first[0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # Score what was collected, then stop
+                self.queue.put(None)
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            pending = self._collect(item)
+            start = time.perf_counter()
+            try:
+                predictions = self.predict(np.concatenate([rows for rows, _ in pending]))
+            except Exception:
+                # Score every request on its own, so the error only reaches the request that caused it
+                self._run_each(pending)
+                continue
+            self.metrics.record_batch(len(predictions), time.perf_counter() - start)
+            splits = np.cumsum([len(rows) for rows, _ in pending])[:-1]
+            for (_, future), rows in zip(pending, np.split(predictions, splits)):
+                future.set_result(rows)
+
+    def _run_each(self, pending):
+        for rows, future in pending:
+            start = time.perf_counter()
+            try:
+                predictions = self.predict(rows)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(predictions), time.perf_counter() - start)
+            future.set_result(predictions)
+
+
+def drive_rows(payload, features=DRIVE_FEATURES):
+    """
+    Feature rows of the drives of a request payload, in the column order of features.
+    Raises ValueError for a malformed payload, a missing feature or a feature that is not a finite number
+    (JSON parsing accepts NaN and Infinity).
+    """
+    drives = payload.get('drives', [payload]) if isinstance(payload, dict) else None
+    if not isinstance(drives, list) or not drives or not all(isinstance(drive, dict) for drive in drives):
+        raise ValueError('Expected a drive object or {"drives": [...]}')
+    missing = sorted({feature for drive in drives for feature in features if feature not in drive})
+    if missing:
+        raise ValueError(f'Missing features: {", ".join(missing)}')
+    try:
+        rows = np.array([[drive[feature] for feature in features] for drive in drives], dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError('Features must be numbers') from None
+    if not np.isfinite(rows).all():
+        raise ValueError('Features must be finite numbers')
+    return rows
+
+
+def _make_handler(batcher, classes, features, metrics):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        # Keep connections open between requests of the same client, and send the headers and body of a
+        # response without waiting for the client to acknowledge them (Nagle's algorithm)
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send_json(200, metrics.snapshot())
+            else:
+                self._send_json(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path != '/predict':
+                self._send_json(404, {'error': f'Unknown path {self.path}'})
+                return
+            try:
+                rows = drive_rows(json.loads(body), features)
+            except ValueError as e:
+                metrics.record_error()
+                self._send_json(400, {'error': str(e)})
+                return
+            try:
+                probabilities = batcher.submit(rows).result(timeout=REQUEST_TIMEOUT)
+            except Exception as e:
+                metrics.record_error()
+                self._send_json(500, {'error': str(e)})
+                return
+            self._send_json(200, {'classes': classes, 'probabilities': probabilities.tolist()})
+            metrics.record_request(time.perf_counter() - start)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictionHandler
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for many clients connecting at once, the default backlog of 5 resets their connections
+    request_queue_size = 128
+
+
+def load_drive_model(name=MODEL_NAME):
+    """
+    The saved classifier, its class labels in predict_proba column order and its feature columns.
+    """
+    artifact = load_model(name)
+    model = artifact['model']
+    classes = [str(label) for label in artifact['label_encoder'].inverse_transform(model.classes_)]
+    features = list(getattr(model, 'feature_names_in_', DRIVE_FEATURES))
+    return model, classes, features
+
+
+@contextmanager
+def serve_predictions(port=0, window=WINDOW_SECONDS, max_batch=MAX_BATCH, name=MODEL_NAME):
+    """
+    Serves predictions of the saved drive classifier on localhost in background threads.
+    Yields the base URL and the ServerMetrics of the server.
+    """
+    model, classes, features = load_drive_model(name)
+    metrics = ServerMetrics()
+    batcher = MicroBatcher(lambda rows: model.predict_proba(pd.DataFrame(rows, columns=features)), window,
+                           max_batch, metrics)
+    server = PredictionServer(('127.0.0.1', port), _make_handler(batcher, classes, features, metrics))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}', metrics
+    finally:
+        server.shutdown()
+        server.server_close()
+        batcher.close()
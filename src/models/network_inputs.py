@@ -0,0 +1,281 @@
+"""
+Neural Network Input Pipeline
+
+Description: Streaming inputs for the Keras penalty model of nn.ipynb. Instead of one-hot encoding the categorical
+columns into a dense matrix, they are kept as integer ids for embedding layers (0 for labels not seen when the
+inputs were fitted). The flags and rolling penalty averages are min-max scaled, and the target penalty counts are
+scaled with their own ranges. fit_inputs and write_examples read the processed team_performances table one season
+partition at a time, so memory is bounded by a season, and store the encoded examples as .npy files. batches and
+make_dataset stream shuffled mini-batches from them as a generator or a tf.data.Dataset.
+"""
+import hashlib
+import json
+import os
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+
+from utils.partitions import stored_partitions
+from utils.penalty_aggregation import TOTAL_COLUMNS
+from utils.penalty_counts import COUNT_TABLES, load_wide_table, stored_penalty_types, with_penalty_columns
+from utils.rolling_features import rolling_features
+from utils.schemas import load_table
+from utils.storage import DATA_DIR, table_path
+
+CATEGORICAL_COLUMNS = ['ref_crew', 'team_id', 'opp_team_id', 'coach', 'opp_coach', 'year', 'week']
+FLAG_COLUMNS = ['home', 'postseason']
+# Phases of the penalty count columns (e.g. Off_Holding) of the processed tables, special teams are left out
+PENALTY_PHASES = ('Off_', 'Def_')
+CLEANING_SCRIPTS = {'team_performances': 'clean_games.py', 'drives': 'clean_drives.py'}
+EXAMPLES_DIR = os.path.join(DATA_DIR, 'processed', 'features', 'nn_examples')
+
+# Share of the team games held out for testing and for validation, chosen by a hash of game_id and team_id
+SPLITS = {'train': 0, 'validation': 1, 'test': 2}
+TEST_PERCENT = 20
+VALIDATION_PERCENT = 8
+
+
+def _input_columns(name):
+    keys = COUNT_TABLES[name][1]
+    return keys + [column for column in CATEGORICAL_COLUMNS + FLAG_COLUMNS if column not in keys]
+
+
+def _whole_table_seasons(name):
+    """
+    Yield (season, team games of the season) from a processed table that was written without partitions, the
+    layout of the committed data/processed/team_performances.csv.
+    """
+    if not os.path.exists(table_path(name, 'processed')):
+        raise FileNotFoundError(f"No processed {name} table in {os.path.join(DATA_DIR, 'processed')}, "
+                                f"run {CLEANING_SCRIPTS[name]} first")
+    df = load_wide_table(name)
+    penalty_types = stored_penalty_types(name) or [column for column in df.columns
+                                                   if column.startswith(PENALTY_PHASES)]
+    df = df[_input_columns(name) + penalty_types + TOTAL_COLUMNS]
+    for season, season_df in df.groupby(df['year'].astype(str), sort=True):
+        yield season, season_df.reset_index(drop=True)
+
+
+def iter_seasons(name='team_performances'):
+    """
+    Yield (season, team games of the season with a count column per penalty type) from the stored partitions of
+    a processed table, in season order. Week partitions of the same season are read together. Without stored
+    partitions the whole table is read and split by season.
+    """
+    if not stored_partitions(name):
+        yield from _whole_table_seasons(name)
+        return
+
+    counts_name, keys = COUNT_TABLES[name]
+    penalty_types = stored_penalty_types(name)
+    count_labels = set(stored_partitions(counts_name))
+    columns = _input_columns(name) + TOTAL_COLUMNS
+    for season, labels in groupby(stored_partitions(name), key=lambda label: label.split('_')[0]):
+        labels = list(labels)
+        df = pd.concat([load_table(f'{name}/{label}', 'processed', columns=columns) for label in labels],
+                       ignore_index=True)
+        counts = [load_table(f'{counts_name}/{label}', 'processed', typed=False)
+                  for label in labels if label in count_labels]
+        counts = pd.concat(counts, ignore_index=True) if counts else \
+            pd.DataFrame(columns=keys + ['penalty', 'count', 'yards'])
+        yield season, with_penalty_columns(df, counts, keys, penalty_types)
+
+
+def split_codes(df):
+    """
+    Split of every team game (see SPLITS), stable as seasons are added because it only depends on its keys.
+    """
+    percent = pd.util.hash_pandas_object(df[['game_id', 'team_id']].astype(str), index=False).to_numpy() % 100
+    return np.select([percent < TEST_PERCENT, percent < TEST_PERCENT + VALIDATION_PERCENT],
+                     [SPLITS['test'], SPLITS['validation']], SPLITS['train']).astype(np.int8)
+
+
+def rolling_cache_name(name, season):
+    """
+    Feature store table of the rolling means of one season of a processed table, e.g. team_performances_nn/2019.
+    """
+    return f'{name}_nn/{season}'
+
+
+def raw_numeric(df, targets, window, cache_name):
+    """
+    Unscaled flags and lagged rolling means of the targets of df, 0 before a team's first game of the season. The
+    rolling means are cached in the feature store under cache_name.
+    """
+    rolling = rolling_features(df, targets, cache_name, windows=[window]).to_numpy()
+    return np.column_stack([df[FLAG_COLUMNS].to_numpy(dtype=float), np.nan_to_num(rolling)])
+
+
+def _scale(values, low, high):
+    span = np.where(high > low, high - low, 1)
+    return ((values - low) / span).astype(np.float32)
+
+
+class NetworkInputs:
+    """
+    Vocabularies of the categorical columns and scaling ranges of the numeric features and targets.
+    """
+
+    def __init__(self, vocabularies, targets, window, numeric_range, target_range):
+        self.vocabularies = vocabularies
+        self.targets = list(targets)
+        self.window = window
+        self.numeric_range = numeric_range
+        self.target_range = target_range
+        self.lookups = {column: pd.Index(values) for column, values in vocabularies.items()}
+
+    @property
+    def numeric_columns(self):
+        return FLAG_COLUMNS + [f'rolling_avg_{self.window}_{column}' for column in self.targets]
+
+    def encode(self, df, cache_name):
+        """
+        Integer ids of the categorical columns (0 for unseen labels) and scaled numeric features of df, with the
+        rolling means cached under cache_name (see rolling_cache_name).
+        """
+        ids = np.column_stack([self.lookups[column].get_indexer(df[column].astype(object)) + 1
+                               for column in CATEGORICAL_COLUMNS]).astype(np.int32)
+        return ids, _scale(raw_numeric(df, self.targets, self.window, cache_name), *self.numeric_range)
+
+    def scale_targets(self, df):
+        """Min-max scaled target penalty counts of df."""
+        return _scale(df[self.targets].to_numpy(dtype=float), *self.target_range)
+
+    def inverse_targets(self, scaled):
+        """Penalty counts from scaled targets or predictions."""
+        low, high = self.target_range
+        return np.asarray(scaled) * np.where(high > low, high - low, 1) + low
+
+
+def fit_inputs(name='team_performances', window=3):
+    """
+    NetworkInputs fitted on a processed table, read one season at a time. The targets are the penalty type counts
+    and penalty totals, the same columns as the penalty_columns of nn.ipynb.
+    """
+    labels = {column: set() for column in CATEGORICAL_COLUMNS}
+    targets, lows, highs = None, [], []
+    for season, df in iter_seasons(name):
+        if targets is None:
+            targets = [column for column in df.columns if column not in _input_columns(name)]
+        for column in CATEGORICAL_COLUMNS:
+            labels[column].update(df[column].dropna().astype(object))
+        values = np.column_stack([raw_numeric(df, targets, window, rolling_cache_name(name, season)),
+                                  df[targets].to_numpy(dtype=float)])
+        lows.append(values.min(axis=0))
+        highs.append(values.max(axis=0))
+
+    low, high = np.min(lows, axis=0), np.max(highs, axis=0)
+    width = len(FLAG_COLUMNS) + len(targets)
+    return NetworkInputs({column: sorted(values) for column, values in labels.items()}, targets, window,
+                         (low[:width], high[:width]), (low[width:], high[width:]))
+
+
+def write_examples(inputs, name='team_performances', directory=EXAMPLES_DIR):
+    """
+    Encode every team game of a processed table, one season at a time, into the memory mapped ids.npy,
+    numeric.npy, targets.npy and split.npy in directory. Returns the content hash of the examples, which is also
+    saved in meta.json.
+    """
+    os.makedirs(directory, exist_ok=True)
+    labels = stored_partitions(name)
+    if labels:
+        rows = sum(len(load_table(f'{name}/{label}', 'processed', columns=['game_id'])) for label in labels)
+    else:
+        rows = len(load_table(name, 'processed', columns=['game_id']))
+    shapes = {'ids': ((rows, len(CATEGORICAL_COLUMNS)), np.int32),
+              'numeric': ((rows, len(inputs.numeric_columns)), np.float32),
+              'targets': ((rows, len(inputs.targets)), np.float32), 'split': ((rows,), np.int8)}
+    examples = {array: np.lib.format.open_memmap(os.path.join(directory, f'{array}.npy'), mode='w+', dtype=dtype,
+                                                 shape=shape)
+                for array, (shape, dtype) in shapes.items()}
+
+    digest = hashlib.sha256()
+    start = 0
+    for season, df in iter_seasons(name):
+        ids, numeric = inputs.encode(df, rolling_cache_name(name, season))
+        season = {'ids': ids, 'numeric': numeric, 'targets': inputs.scale_targets(df), 'split': split_codes(df)}
+        for array, values in season.items():
+            examples[array][start:start + len(df)] = values
+            digest.update(values.tobytes())
+        start += len(df)
+    for array in examples.values():
+        array.flush()
+
+    data_hash = digest.hexdigest()[:16]
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({'rows': rows, 'data_hash': data_hash}, f, indent=1)
+    return data_hash
+
+
+def load_examples(directory=EXAMPLES_DIR):
+    """
+    Memory mapped ids, numeric, targets and split arrays of the stored examples.
+    """
+    return {array: np.load(os.path.join(directory, f'{array}.npy'), mmap_mode='r')
+            for array in ['ids', 'numeric', 'targets', 'split']}
+
+
+def batches(directory=EXAMPLES_DIR, split='train', batch_size=32, shuffle=True, rng=None):
+    """
+    Yield ({'ids': ..., 'numeric': ...}, targets) mini-batches of one split of the stored examples, reading only
+    the rows of each batch from disk.
+    """
+    examples = load_examples(directory)
+    rows = np.flatnonzero(examples['split'] == SPLITS[split])
+    if shuffle:
+        rows = (rng or np.random.default_rng()).permutation(rows)
+    for start in range(0, len(rows), batch_size):
+        batch = np.sort(rows[start:start + batch_size])
+        yield {'ids': examples['ids'][batch], 'numeric': examples['numeric'][batch]}, examples['targets'][batch]
+
+
+def make_dataset(directory=EXAMPLES_DIR, split='train', batch_size=32, shuffle=True, seed=42):
+    """
+    batches as a prefetching tf.data.Dataset, reshuffled every epoch when shuffle is set.
+    """
+    import tensorflow as tf
+
+    examples = load_examples(directory)
+    rng = np.random.default_rng(seed)
+    signature = ({'ids': tf.TensorSpec((None, examples['ids'].shape[1]), tf.int32),
+                  'numeric': tf.TensorSpec((None, examples['numeric'].shape[1]), tf.float32)},
+                 tf.TensorSpec((None, examples['targets'].shape[1]), tf.float32))
+    dataset = tf.data.Dataset.from_generator(lambda: batches(directory, split, batch_size, shuffle, rng),
+                                             output_signature=signature)
+    # Tell Keras how many batches an epoch has, which a generator does not know
+    rows = np.count_nonzero(examples['split'] == SPLITS[split])
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(-(-rows // batch_size)))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def embedding_size(vocabulary_size):
+    """
+    Width of the embedding of a categorical column, growing slowly with its number of labels.
+    """
+    return int(min(16, round(1.6 * vocabulary_size ** 0.56)))
+
+
+def build_network(inputs, units=128, dropout=0.2, learning_rate=1e-3):
+    """
+    Keras model with an embedding per categorical column, concatenated with the numeric features, followed by
+    the dense layers of nn.ipynb.
+    """
+    import keras
+
+    ids = keras.Input(shape=(len(CATEGORICAL_COLUMNS),), dtype='int32', name='ids')
+    numeric = keras.Input(shape=(len(inputs.numeric_columns),), name='numeric')
+    embedded = []
+    for i, column in enumerate(CATEGORICAL_COLUMNS):
+        size = len(inputs.vocabularies[column]) + 1
+        embedding = keras.layers.Embedding(size, embedding_size(size), name=f'{column}_embedding')(ids[:, i])
+        embedded.append(embedding)
+    hidden = keras.layers.Concatenate()(embedded + [numeric])
+    hidden = keras.layers.Dense(units, activation='relu')(hidden)
+    hidden = keras.layers.Dropout(dropout)(hidden)
+    hidden = keras.layers.Dense(units, activation='relu')(hidden)
+    outputs = keras.layers.Dense(len(inputs.targets), activation='linear')(hidden)
+
+    model = keras.Model(inputs={'ids': ids, 'numeric': numeric}, outputs=outputs)
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate), loss='mse', metrics=['mae'])
+    return model
@@ -0,0 +1,72 @@
+"""
+Penalty Ensemble Model
+
+Description: Batch predictions of the Negative Binomial penalty models of penalties.ipynb. Every model is a GLM
+with a log link over the same predictors, so the ensemble is stored as the label classes of the encoded columns
+and one coefficient column per penalty type. predict encodes a whole frame of matchups once through lookup dicts
+and scores every penalty model with a single matrix product followed by exp.
+"""
+import numpy as np
+import pandas as pd
+
+PREDICTORS = ['team_id', 'opp_id', 'year', 'week', 'ref_crew', 'home', 'postseason']
+ENCODED_COLUMNS = ['team_id', 'opp_id', 'ref_crew', 'home', 'postseason']
+
+
+class PenaltyEnsemble:
+    """
+    Negative Binomial models of several penalty types over the same predictors.
+
+    classes: dict of encoded column -> label classes in code order (LabelEncoder.classes_)
+    coefficients: array of shape (1 + len(predictors), penalty types), the intercepts in the first row
+    penalty_types: penalty name of every coefficient column
+    """
+
+    def __init__(self, classes, coefficients, penalty_types, predictors=PREDICTORS):
+        self.classes = {column: list(values) for column, values in classes.items()}
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.penalty_types = list(penalty_types)
+        self.predictors = list(predictors)
+        self.lookups = {column: {value: code for code, value in enumerate(values)}
+                        for column, values in self.classes.items()}
+
+    @classmethod
+    def from_models(cls, models, label_encoders, predictors=PREDICTORS):
+        """
+        Ensemble of fitted statsmodels GLMs keyed by encoded penalty code, as built in penalties.ipynb.
+        """
+        codes = list(models)
+        coefficients = np.column_stack([models[code].params[['Intercept'] + list(predictors)].to_numpy()
+                                        for code in codes])
+        classes = {column: label_encoders[column].classes_ for column in ENCODED_COLUMNS if column in predictors}
+        penalty_types = label_encoders['penalty'].inverse_transform(codes)
+        return cls(classes, coefficients, penalty_types, predictors)
+
+    def design_matrix(self, frame):
+        """
+        Intercept column followed by the encoded predictors of every row of frame.
+        Raises ValueError for labels the models were not fitted on.
+        """
+        design = np.ones((len(frame), 1 + len(self.predictors)))
+        for i, column in enumerate(self.predictors, start=1):
+            values = pd.Series(frame[column], copy=False)
+            if column in self.lookups:
+                encoded = values.map(self.lookups[column])
+                if encoded.isna().any():
+                    unseen = pd.unique(values[encoded.isna()])
+                    raise ValueError(f'{column} contains previously unseen labels: {list(unseen)}')
+                values = encoded
+            design[:, i] = values.to_numpy(dtype=float)
+        return design
+
+    def predict(self, frame):
+        """
+        Predicted count of every penalty type for every row of frame, an array of shape (rows, penalty types).
+        """
+        return np.exp(self.design_matrix(frame) @ self.coefficients)
+
+    def predict_frame(self, frame):
+        """
+        predict as a DataFrame with one column per penalty type, aligned with frame.
+        """
+        return pd.DataFrame(self.predict(frame), index=frame.index, columns=self.penalty_types)
@@ -0,0 +1,130 @@
+"""
+Penalty Ensemble Training
+
+Description: Fits the Negative Binomial model of every frequent penalty type for a PenaltyEnsemble in a pool of
+worker processes. The grouped penalty counts are encoded once, sorted by penalty type and saved as .npy files that
+every worker memory maps, so each model reads its rows as a slice of the shared arrays instead of receiving its own
+copy of the data. The dispersion alpha is fixed (1.0 in penalties.ipynb) or estimated per penalty type from a
+Poisson fit with the auxiliary regression of Cameron and Trivedi.
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from models.penalty_ensemble import ENCODED_COLUMNS, PREDICTORS, PenaltyEnsemble
+
+GROUP_COLUMNS = ['game_id', 'team_id', 'opp_id', 'year', 'week', 'ref_crew', 'home', 'postseason', 'penalty']
+MIN_ALPHA = 1e-6
+
+# Memory mapped design matrix and counts of the worker process, set by _map_shared
+_shared = {}
+
+
+def penalty_count_frame(penalties, min_count=50):
+    """
+    Count of every frequent (min_count+) penalty type outside special teams per game and team, as grouped in
+    penalties.ipynb.
+    """
+    penalty_counts = penalties['penalty'].value_counts()
+    frequent = penalty_counts[penalty_counts >= min_count].index
+    filtered = penalties[(penalties['phase'] != 'ST') & penalties['penalty'].isin(frequent)]
+    return filtered.groupby(GROUP_COLUMNS, observed=True).size().reset_index(name='count')
+
+
+def encode_counts(grouped):
+    """
+    grouped with the encoded columns and penalty replaced by their label codes, numbered in sorted label order as
+    LabelEncoder does, and the classes of every encoded column.
+    """
+    encoded = grouped.copy()
+    classes = {}
+    for column in ENCODED_COLUMNS + ['penalty']:
+        classes[column], encoded[column] = np.unique(np.asarray(grouped[column]), return_inverse=True)
+    return encoded, classes
+
+
+def estimate_alpha(design, counts):
+    """
+    Negative Binomial dispersion of counts, the least squares slope of ((y - mu)^2 - y) / mu on mu for the means mu
+    of a Poisson fit. Underdispersed counts give MIN_ALPHA.
+    """
+    import statsmodels.api as sm
+
+    mu = sm.GLM(counts, design, family=sm.families.Poisson()).fit().predict(design)
+    return max(np.sum((counts - mu) ** 2 - counts) / np.sum(mu ** 2), MIN_ALPHA)
+
+
+def fit_penalty_model(design, counts, alpha=1.0):
+    """
+    Fit the Negative Binomial GLM of one penalty type on its design matrix (intercept column first) and counts,
+    estimating alpha first when it is None. Returns the coefficients, alpha, the MSE and R^2 on the training data
+    (as evaluated in penalties.ipynb) and the fit time in seconds.
+    """
+    import statsmodels.api as sm
+
+    start = time.perf_counter()
+    design = np.asarray(design)
+    counts = np.asarray(counts, dtype=float)
+    if alpha is None:
+        alpha = estimate_alpha(design, counts)
+    model = sm.GLM(counts, design, family=sm.families.NegativeBinomial(alpha=alpha)).fit()
+    residual = np.sum((counts - model.predict(design)) ** 2)
+    total = np.sum((counts - counts.mean()) ** 2)
+    # Constant counts get an R^2 of 1 if predicted exactly and 0 otherwise, like sklearn's r2_score
+    r2 = 1 - residual / total if total > 0 else float(residual == 0)
+    return {'coefficients': np.asarray(model.params), 'alpha': alpha, 'mse': residual / len(counts), 'r2': r2,
+            'fit_seconds': time.perf_counter() - start}
+
+
+def _map_shared(design_path, counts_path):
+    _shared['design'] = np.load(design_path, mmap_mode='r')
+    _shared['counts'] = np.load(counts_path, mmap_mode='r')
+
+
+def _fit_shared(start, end, alpha):
+    return fit_penalty_model(_shared['design'][start:end], _shared['counts'][start:end], alpha)
+
+
+def fit_ensemble(grouped, penalty_types=None, alpha=1.0, processes=None):
+    """
+    Fit a model for every penalty type of grouped (a penalty_count_frame), or only for penalty_types, in a pool of
+    processes worker processes (the CPU count by default, processes=1 fits them in this process). alpha=None
+    estimates the dispersion of every penalty type. Returns the PenaltyEnsemble and a DataFrame with the rows,
+    alpha, fit time, MSE and R^2 of every model, largest penalty type first.
+    """
+    encoded, classes = encode_counts(grouped)
+    order = np.argsort(encoded['penalty'].to_numpy(), kind='stable')
+    design = np.column_stack([np.ones(len(encoded)), encoded[PREDICTORS].to_numpy(dtype=float)])[order]
+    counts = encoded['count'].to_numpy(dtype=float)[order]
+
+    # Rows of every penalty type in the sorted arrays, fitted largest first so the pool stays busy
+    bounds = np.searchsorted(encoded['penalty'].to_numpy()[order], np.arange(len(classes['penalty']) + 1))
+    codes = range(len(classes['penalty'])) if penalty_types is None else \
+        [list(classes['penalty']).index(penalty) for penalty in penalty_types]
+    codes = sorted(codes, key=lambda code: bounds[code] - bounds[code + 1])
+    starts, ends = [bounds[code] for code in codes], [bounds[code + 1] for code in codes]
+
+    if processes == 1:
+        results = [fit_penalty_model(design[start:end], counts[start:end], alpha) for start, end in zip(starts, ends)]
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, 'design.npy'), os.path.join(directory, 'counts.npy')]
+            np.save(paths[0], design)
+            np.save(paths[1], counts)
+            with ProcessPoolExecutor(max_workers=processes, initializer=_map_shared, initargs=paths) as executor:
+                results = list(executor.map(_fit_shared, starts, ends, repeat(alpha)))
+
+    penalty_names = [classes['penalty'][code] for code in codes]
+    ensemble = PenaltyEnsemble({column: classes[column] for column in ENCODED_COLUMNS},
+                               np.column_stack([result['coefficients'] for result in results]), penalty_names)
+    report = pd.DataFrame({
+        'penalty': penalty_names,
+        'rows': np.subtract(ends, starts),
+        **{field: [result[field] for result in results] for field in ['alpha', 'fit_seconds', 'mse', 'r2']},
+    })
+    return ensemble, report
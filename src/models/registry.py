@@ -0,0 +1,212 @@
+"""
+Model Registry
+
+Description: Fitted models saved in data/models/<name>/ together with their encoders, scalers and the hash of the
+data they were trained on. fit_or_load skips retraining when a model was already trained on the same data and
+settings. Saved components are loaded lazily on first access, and the libraries they need (sklearn when a pickle
+is read, tensorflow for Keras models) are only imported then, so a prediction process starts quickly.
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.penalty_ensemble import PenaltyEnsemble
+from utils.storage import DATA_DIR
+
+REGISTRY_DIR = os.path.join(DATA_DIR, 'models')
+
+
+def _save_pickle(component, path):
+    with open(path, 'wb') as f:
+        pickle.dump(component, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _save_keras(component, path):
+    component.save(path)
+
+
+def _load_keras(path):
+    import keras
+
+    return keras.models.load_model(path)
+
+
+def _save_ensemble(component, path):
+    fields = {'classes': {column: np.asarray(values).tolist() for column, values in component.classes.items()},
+              'penalty_types': component.penalty_types, 'predictors': component.predictors}
+    np.savez(path, coefficients=component.coefficients, fields=np.array(json.dumps(fields)))
+
+
+def _load_ensemble(path):
+    with np.load(path) as saved:
+        fields = json.loads(str(saved['fields']))
+        return PenaltyEnsemble(fields['classes'], saved['coefficients'], fields['penalty_types'],
+                               fields['predictors'])
+
+
+# Kind of component -> (file extension, save, load)
+SERIALIZERS = {
+    'pickle': ('pkl', _save_pickle, _load_pickle),
+    'keras': ('keras', _save_keras, _load_keras),
+    'ensemble': ('npz', _save_ensemble, _load_ensemble),
+}
+
+
+def component_kind(component):
+    """
+    How a component is saved: PenaltyEnsembles as plain arrays, Keras models in the Keras format and everything
+    else (sklearn models, encoders, scalers, metrics) as a pickle.
+    """
+    if isinstance(component, PenaltyEnsemble):
+        return 'ensemble'
+    if type(component).__module__.split('.')[0] in ['keras', 'tensorflow', 'tf_keras']:
+        return 'keras'
+    return 'pickle'
+
+
+def data_hash(*frames):
+    """
+    Content hash of the DataFrames, Series or arrays a model is trained on, its data version.
+    """
+    digest = hashlib.sha256()
+    for frame in frames:
+        if isinstance(frame, np.ndarray):
+            frame = pd.DataFrame(frame.reshape(len(frame), -1))
+        if isinstance(frame, pd.DataFrame):
+            digest.update(json.dumps([str(column) for column in frame.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def model_dir(name):
+    """
+    Directory of a saved model.
+    """
+    return os.path.join(REGISTRY_DIR, name)
+
+
+def load_meta(name):
+    """
+    Metadata of a saved model (data hash, settings and components), or an empty dict if it was never saved.
+    """
+    path = os.path.join(model_dir(name), 'meta.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def saved_models():
+    """
+    Names of the saved models.
+    """
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(name for name in os.listdir(REGISTRY_DIR) if load_meta(name))
+
+
+class Artifact:
+    """
+    The components of a saved model, e.g. artifact['model'] or artifact['scaler'], each loaded on first access.
+    """
+
+    def __init__(self, name, meta, loaded=None):
+        self.name = name
+        self.meta = meta
+        self.loaded = dict(loaded or {})
+
+    @property
+    def data_hash(self):
+        return self.meta['data_hash']
+
+    @property
+    def settings(self):
+        return self.meta['settings']
+
+    def keys(self):
+        return list(self.meta['components'])
+
+    def __contains__(self, component):
+        return component in self.meta['components']
+
+    def __getitem__(self, component):
+        if component not in self.loaded:
+            kind = self.meta['components'][component]
+            extension, _, load = SERIALIZERS[kind]
+            self.loaded[component] = load(os.path.join(model_dir(self.name), f'{component}.{extension}'))
+        return self.loaded[component]
+
+
+def save_model(name, components, data_hash, settings=None, fit_seconds=None):
+    """
+    Save the components of a model (a dict of name -> fitted model, encoder, scaler, ...) with the hash of its
+    training data and optionally how long it took to fit. The model is written to a temporary directory first, so
+    a failed save keeps the previous one.
+    """
+    directory = model_dir(name)
+    temp_dir, old_dir = f'{directory}.tmp', f'{directory}.old'
+    for path in [temp_dir, old_dir]:
+        shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(temp_dir)
+
+    kinds = {}
+    for component, value in components.items():
+        kinds[component] = component_kind(value)
+        extension, save, _ = SERIALIZERS[kinds[component]]
+        save(value, os.path.join(temp_dir, f'{component}.{extension}'))
+    meta = {'name': name, 'data_hash': data_hash, 'settings': settings or {}, 'components': kinds,
+            'fit_seconds': fit_seconds, 'saved': time.strftime('%Y-%m-%d %H:%M:%S')}
+    with open(os.path.join(temp_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1, sort_keys=True)
+
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(temp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return Artifact(name, meta, components)
+
+
+def load_model(name):
+    """
+    The saved model as an Artifact whose components are loaded on first access.
+    Raises FileNotFoundError if the model was never saved.
+    """
+    meta = load_meta(name)
+    if not meta:
+        raise FileNotFoundError(f'No saved model named {name} in {REGISTRY_DIR}')
+    return Artifact(name, meta)
+
+
+def is_current(name, data_hash, settings=None):
+    """
+    True if the model is saved and was trained on data with the same hash and the same settings.
+    """
+    meta = load_meta(name)
+    # Compare the settings as they come back from meta.json, where tuples become lists
+    settings = json.loads(json.dumps(settings or {}))
+    return bool(meta) and meta['data_hash'] == data_hash and meta['settings'] == settings
+
+
+def fit_or_load(name, data_hash, fit, settings=None):
+    """
+    The saved model if it was trained on the same data and settings. Otherwise fit() is called to train it, and
+    the dict of components it returns is saved and returned as an Artifact.
+    """
+    if is_current(name, data_hash, settings):
+        print(f'Loaded {name}, trained on the same data ({data_hash}).')
+        return load_model(name)
+    print(f'Training {name} on data version {data_hash}.')
+    start = time.perf_counter()
+    components = fit()
+    return save_model(name, components, data_hash, settings, time.perf_counter() - start)
@@ -0,0 +1,139 @@
+"""
+Drive Prediction Server Benchmark
+
+Description: Load generator for the drive prediction server of models/drive_server.py. Starts the server in a child
+process, checks its probabilities against predict_proba of the saved classifier, then sends single drive requests
+from an increasing number of concurrent clients, with micro-batching off (one drive per predict_proba call) and on.
+Prints the client side latency percentiles, the throughput and the mean batch size the server reached, next to the
+one row DataFrame predict_drive_result of drives.ipynb called in process.
+"""
+import http.client
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.drive_server import WINDOW_SECONDS, load_drive_model, serve_predictions
+from models.drive_training import DRIVE_FEATURES
+from utils.schemas import load_table
+
+CLIENTS = [1, 8, 32]
+REQUESTS = 2000
+# (label, batching window in seconds, most drives per batch)
+CONFIGS = [('unbatched', 0.0, 1), ('micro-batched', WINDOW_SECONDS, 256)]
+
+
+def drive_features(rows=REQUESTS):
+    """
+    Feature rows of the first processed drives, with time_left converted to seconds as in drives.ipynb.
+    """
+    data = load_table('drives', 'processed', columns=DRIVE_FEATURES[:-1] + ['time_left'])
+    data['time_left_seconds'] = pd.to_timedelta(data['time_left']).dt.total_seconds().astype(int)
+    return data[DRIVE_FEATURES].head(rows).reset_index(drop=True)
+
+
+def _serve(connection, window, max_batch):
+    with serve_predictions(0, window, max_batch) as (base_url, _):
+        connection.send(base_url)
+        connection.recv()
+
+
+class ServerProcess:
+    """
+    Prediction server running in a child process, so the load generator does not share its interpreter.
+    """
+
+    def __init__(self, window, max_batch):
+        context = multiprocessing.get_context('spawn')
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, window, max_batch), daemon=True)
+
+    def __enter__(self):
+        self.process.start()
+        self.base_url = self.connection.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self.connection.send('stop')
+        self.process.join()
+
+    def request(self, method, path, body=None, connection=None):
+        """JSON response of a request, on connection if given (kept open by the server)."""
+        url = urlparse(self.base_url)
+        connection = connection or http.client.HTTPConnection(url.hostname, url.port)
+        connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                           headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return json.loads(response.read())
+
+
+def run_clients(server, drives, clients):
+    """
+    Send every drive as its own request, spread over concurrent clients. Returns the request latencies in seconds
+    and the wall time.
+    """
+    url = urlparse(server.base_url)
+    latencies = [[] for _ in range(clients)]
+
+    def client(i):
+        connection = http.client.HTTPConnection(url.hostname, url.port)
+        for drive in drives[i::clients]:
+            start = time.perf_counter()
+            server.request('POST', '/predict', drive, connection)
+            latencies[i].append(time.perf_counter() - start)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate(latencies), time.perf_counter() - start
+
+
+def in_process_seconds(model, drives):
+    """
+    Mean seconds per drive of the one row DataFrame prediction of drives.ipynb.
+    """
+    start = time.perf_counter()
+    for drive in drives:
+        model.predict(pd.DataFrame([drive]))
+    return (time.perf_counter() - start) / len(drives)
+
+
+def main():
+    model, classes, features = load_drive_model()
+    data = drive_features()
+    drives = [{feature: int(value) for feature, value in row.items()} for row in data.to_dict('records')]
+
+    with ServerProcess(WINDOW_SECONDS, 256) as server:
+        response = server.request('POST', '/predict', {'drives': drives[:500]})
+        expected = model.predict_proba(data.head(500)[features])
+        assert response['classes'] == classes
+        assert np.allclose(response['probabilities'], expected, rtol=0, atol=1e-12)
+    print(f'Server probabilities match predict_proba for 500 drives, classes {classes}')
+
+    per_drive = in_process_seconds(model, drives[:200])
+    print(f'In process one row predict: {1000 * per_drive:.2f} ms per drive, {1 / per_drive:.0f} drives/s\n')
+
+    print(f"{'mode':>14} {'clients':>8} {'drives/s':>9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'batch':>6}")
+    for label, window, max_batch in CONFIGS:
+        for clients in CLIENTS:
+            with ServerProcess(window, max_batch) as server:
+                latencies, seconds = run_clients(server, drives, clients)
+                metrics = server.request('GET', '/metrics')
+            p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+            print(f'{label:>14} {clients:>8} {len(drives) / seconds:>9.0f} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f} '
+                  f"{metrics['mean_batch_size']:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
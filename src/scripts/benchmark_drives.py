@@ -0,0 +1,97 @@
+"""
+Drive Matching Benchmark
+
+Description: Times the penalty-to-drive matching in clean_drives.py on synthetic seasons, comparing the original
+per-penalty loop with the as-of join. Both outputs (drive totals and long penalty counts) are checked for
+equality wherever the loop is run.
+The loop is only run up to --max-loop-seasons because its runtime grows with penalties x drives.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from clean_drives import add_penalties, add_penalties_loop
+
+GAMES_PER_SEASON = 272
+DRIVES_PER_GAME = 22
+PENALTIES_PER_GAME = 13
+PENALTY_TYPES = ['Off_Holding', 'Off_False_Start', 'Def_Pass_Interference', 'Def_Offside',
+                 'Def_Holding', 'Off_Delay_of_Game', 'Def_Roughing_the_Passer', 'Def_Face_Mask']
+
+
+def format_time_left(total_seconds):
+    """
+    Format seconds the way compute_time_left_helper does, including negative overtime values.
+    """
+    hours, remainder = divmod(int(total_seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def synthetic_frames(seasons, seed=0):
+    """
+    Build sorted drives and filtered penalties frames for the given number of seasons.
+    """
+    rng = np.random.default_rng(seed)
+    n_games = seasons * GAMES_PER_SEASON
+    game_ids = np.array([f"{2009 + g // GAMES_PER_SEASON}_{g % 18 + 1}_A{g}_H{g}" for g in range(n_games)])
+
+    # Drive start times spread over regulation with a few overtime drives (negative time left)
+    drive_games = np.repeat(game_ids, DRIVES_PER_GAME)
+    drive_seconds = rng.integers(-600, 3600, size=len(drive_games))
+    drives_df = pd.DataFrame({
+        'game_id': drive_games,
+        'team_id': np.where(rng.random(len(drive_games)) < 0.5, 'HOM', 'AWY'),
+        'num': np.tile(np.arange(1, DRIVES_PER_GAME + 1), n_games),
+        'time_left': [format_time_left(s) for s in drive_seconds],
+        'date': np.repeat(pd.date_range('2009-09-10', periods=n_games, freq='h').strftime('%Y-%m-%d'),
+                          DRIVES_PER_GAME)
+    })
+    drives_df = drives_df.sort_values(by=['date', 'game_id', 'time_left'], ascending=[True, True, False])
+
+    penalty_games = np.repeat(game_ids, PENALTIES_PER_GAME)
+    penalty_types = rng.choice(PENALTY_TYPES, size=len(penalty_games))
+    penalties_df = pd.DataFrame({
+        'game_id': penalty_games,
+        'penalty': penalty_types,
+        'phase': [p.split('_')[0] for p in penalty_types],
+        'yardage': rng.choice([5, 10, 15], size=len(penalty_games)),
+        'time_left': [format_time_left(s) for s in rng.integers(-600, 3600, size=len(penalty_games))]
+    })
+    return drives_df, penalties_df
+
+
+def time_call(func, *args):
+    """
+    Return the result of func(*args) and its wall time in seconds.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark drive matching against the number of seasons.')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[1, 2, 4, 8, 15])
+    parser.add_argument('--max-loop-seasons', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'seasons':>8} {'drives':>8} {'penalties':>10} {'loop (s)':>10} {'as-of (s)':>10} {'speedup':>8}")
+    for seasons in args.seasons:
+        drives_df, penalties_df = synthetic_frames(seasons)
+        (joined, joined_counts), joined_time = time_call(add_penalties, drives_df.copy(), penalties_df.copy())
+
+        loop_time = np.nan
+        if seasons <= args.max_loop_seasons:
+            (looped, looped_counts), loop_time = time_call(add_penalties_loop, drives_df.copy(), penalties_df.copy())
+            pd.testing.assert_frame_equal(joined, looped)
+            pd.testing.assert_frame_equal(joined_counts, looped_counts)
+
+        print(f"{seasons:>8} {len(drives_df):>8} {len(penalties_df):>10} {loop_time:>10.2f} "
+              f"{joined_time:>10.3f} {loop_time / joined_time:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""
+Table Memory Report
+
+Description: Reports how much memory the schemas in utils/schemas.py save on every processed table that has one,
+comparing the table as read by read_table with the table loaded through load_table.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.schemas import SCHEMAS, memory_usage
+from utils.storage import table_path
+
+
+def main():
+    print(f"{'table':>18} {'plain (MB)':>11} {'typed (MB)':>11} {'saved':>7}")
+    for name, stage in SCHEMAS:
+        if not os.path.exists(table_path(name, stage)):
+            print(f'{name:>18} not built yet')
+            continue
+        plain, typed = memory_usage(name, stage)
+        print(f'{name:>18} {plain / 2 ** 20:>11.1f} {typed / 2 ** 20:>11.1f} {1 - typed / plain:>7.0%}')
+
+
+if __name__ == '__main__':
+    main()
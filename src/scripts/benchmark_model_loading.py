@@ -0,0 +1,53 @@
+"""
+Model Loading Benchmark
+
+Description: Measures the cold start of a prediction process for every model saved in the registry
+(models/registry.py). Each model is loaded in a fresh Python process, which imports the registry, loads every
+component of the model and exits, and the wall time is printed next to the time the model took to train.
+"""
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.registry import load_meta, saved_models
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+LOAD_SCRIPT = '''
+import sys
+sys.path.insert(0, {src!r})
+from models.registry import load_model
+artifact = load_model({name!r})
+for component in artifact.keys():
+    artifact[component]
+'''
+
+
+def cold_start_seconds(name, repeats=3):
+    """
+    Best wall time of a fresh process that loads every component of a saved model.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', LOAD_SCRIPT.format(src=SRC_DIR, name=name)], check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    names = saved_models()
+    if not names:
+        print('No saved models yet, run the model notebooks first.')
+        return
+    print(f"{'model':>20} {'components':>36} {'fit (s)':>9} {'cold start (s)':>15}")
+    for name in names:
+        meta = load_meta(name)
+        fit_seconds = meta.get('fit_seconds')
+        fit = f'{fit_seconds:.1f}' if fit_seconds is not None else '-'
+        print(f"{name:>20} {', '.join(meta['components']):>36} {fit:>9} {cold_start_seconds(name):>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Network Input Benchmark
+
+Description: Compares the dense one-hot inputs nn.ipynb used to build (pd.get_dummies and MinMaxScaler over the
+whole table) with the streamed inputs of models/network_inputs.py. Prints the feature width, the peak memory and
+time of building the inputs, and the time to stream one epoch of training batches from the stored examples.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.network_inputs import CATEGORICAL_COLUMNS, batches, fit_inputs, write_examples
+from utils.penalty_counts import load_wide_table
+from utils.rolling_features import lagged_rolling_means
+
+# Game statistics nn.ipynb dropped before using the remaining columns after the first 9 as targets
+DROPPED_COLUMNS = ['game_id', 'pts', 'first_downs', 'net_pass_yards', 'total_yards', 'turnovers',
+                   'time_of_possession', 'rush_attempts', 'rush_yards', 'rush_tds', 'passes_completed',
+                   'passes_attempted', 'pass_yards', 'pass_tds', 'interceptions', 'times_sacked', 'sack_yards_lost',
+                   'fumbles', 'fumbles_lost', 'third_down_attempts', 'third_down_conversions',
+                   'fourth_down_attempts', 'fourth_down_conversions']
+
+
+def dense_inputs():
+    """
+    The scaled one-hot feature matrix and targets as built in nn.ipynb before the streaming pipeline.
+    """
+    data = load_wide_table('team_performances')
+    data = data.drop(columns=DROPPED_COLUMNS)
+    penalty_columns = data.columns[9:].tolist()
+    data = pd.concat([data, lagged_rolling_means(data, penalty_columns, windows=[3])], axis=1)
+    data['year'] = pd.Categorical(data['year'])
+    data = pd.get_dummies(data, columns=['ref_crew', 'team_id', 'opp_team_id', 'coach', 'opp_coach', 'home',
+                                         'postseason', 'year', 'week'], drop_first=True)
+    scaler = MinMaxScaler()
+    features = scaler.fit_transform(data.drop(penalty_columns, axis=1))
+    targets = scaler.fit_transform(data[penalty_columns])
+    return features, targets
+
+
+def measured(function, *args):
+    """
+    Result, wall time in seconds and peak traced memory in MB of a call.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def stream_epoch(directory):
+    """
+    Number of rows streamed in one shuffled epoch of training batches.
+    """
+    return sum(len(targets) for _, targets in batches(directory, 'train', batch_size=32))
+
+
+def main():
+    (features, targets), dense_seconds, dense_peak = measured(dense_inputs)
+    print(f'dense one-hot:  width {features.shape[1]:>5}, {dense_seconds:.2f} s, peak {dense_peak:.0f} MB, '
+          f'matrix {(features.nbytes + targets.nbytes) / 2 ** 20:.1f} MB')
+
+    with tempfile.TemporaryDirectory() as directory:
+        inputs, fit_seconds, fit_peak = measured(fit_inputs)
+        _, write_seconds, write_peak = measured(write_examples, inputs, 'team_performances', directory)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)) / 2 ** 20
+        print(f'streamed ids:   width {len(CATEGORICAL_COLUMNS) + len(inputs.numeric_columns):>5}, '
+              f'{fit_seconds + write_seconds:.2f} s, peak {max(fit_peak, write_peak):.0f} MB, examples {size:.1f} MB')
+
+        rows, epoch_seconds, epoch_peak = measured(stream_epoch, directory)
+        print(f'one epoch of batches: {rows} rows in {epoch_seconds:.2f} s, peak {epoch_peak:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
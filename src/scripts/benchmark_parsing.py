@@ -0,0 +1,122 @@
+"""
+Boxscore Parsing Benchmark
+
+Description: Checks that every parser backend of scrape_games.py returns identical results on saved boxscore pages
+and times them. Pages come from the page cache, or from a directory of saved .htm files with --pages. Every parse_*
+function is compared on every page, including the starters and snap counts sections, and the timings are only
+printed once all backends agree.
+"""
+import argparse
+import glob
+import os
+import time
+
+from scrape_games import CACHE_SITE, PARSERS, parse_game
+from utils.page_cache import PageCache
+
+PLACEHOLDER_GAME_ID = '0_0_AWAY_HOME'
+
+
+def load_pages(pages_dir=None, limit=None):
+    """
+    Returns (game_id, html_source) pairs from a directory of saved pages, or from the page cache.
+    Saved pages have no game ID, so they are parsed with a placeholder one.
+    """
+    if pages_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(pages_dir, '*.htm*'))):
+            with open(path, encoding='utf-8') as f:
+                pages.append((PLACEHOLDER_GAME_ID, f.read()))
+    else:
+        cache = PageCache(CACHE_SITE)
+        pages = [(entry['key'], cache.read(entry['sha256'])) for entry in cache.entries().values()]
+    return pages[:limit]
+
+
+def section_results(backend, game_id, html_source):
+    """
+    Result of every parse_* function of a backend on one page. Failures are recorded by exception type, so a
+    section missing from a page counts as a match when both backends fail on it.
+    """
+    parts = game_id.split('_')
+    away_team_id, home_team_id = (parts[2], parts[3]) if len(parts) == 4 else ('AWAY', 'HOME')
+    page = backend.load(html_source)
+
+    calls = {
+        'scorebox': lambda: backend.parse_scorebox(page),
+        'meta_data': lambda: backend.parse_meta_data(page),
+        'game_info': lambda: backend.parse_game_info(page),
+        'officials': lambda: backend.parse_officials(page),
+        'linescore': lambda: backend.parse_linescore(page, away_team_id, home_team_id),
+        'team_stats': lambda: backend.parse_team_stats(page, home_team_id, away_team_id),
+    }
+    for side, team_id in [('home', home_team_id), ('vis', away_team_id)]:
+        calls[f'{side}_drives'] = lambda d=f'div_{side}_drives', t=team_id: backend.parse_drives(page, d, t, game_id)
+        calls[f'{side}_starters'] = (
+            lambda d=f'div_{side}_starters', t=team_id: backend.parse_starters(page, d, t, game_id))
+        calls[f'{side}_snap_counts'] = (
+            lambda d=f'div_{side}_snap_counts', t=team_id: backend.parse_snap_counts(page, d, t, game_id))
+
+    results = {}
+    for name, call in calls.items():
+        try:
+            results[name] = call()
+        except Exception as e:
+            results[name] = f'raised {type(e).__name__}'
+    return results
+
+
+def check_parity(pages, reference='soup'):
+    """
+    Compares every backend against the reference backend and returns the (game_id, backend, section) mismatches.
+    """
+    mismatches = []
+    for game_id, html_source in pages:
+        expected = section_results(PARSERS[reference], game_id, html_source)
+        for name, backend in PARSERS.items():
+            if name == reference:
+                continue
+            results = section_results(backend, game_id, html_source)
+            mismatches += [(game_id, name, section) for section in expected if results[section] != expected[section]]
+    return mismatches
+
+
+def time_backend(pages, parser):
+    """
+    Wall time in seconds of parse_game over all pages with one backend.
+    """
+    start = time.perf_counter()
+    for game_id, html_source in pages:
+        try:
+            parse_game(game_id, html_source, parser)
+        except Exception:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the boxscore parser backends.')
+    parser.add_argument('--pages', help='directory of saved .htm pages, defaults to the page cache')
+    parser.add_argument('--limit', type=int, help='only use the first pages')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.limit)
+    if not pages:
+        print('No pages to parse.')
+        return
+
+    mismatches = check_parity(pages)
+    for game_id, name, section in mismatches:
+        print(f'{name} differs from soup on {game_id}: {section}')
+    assert not mismatches, f'{len(mismatches)} sections differ between backends'
+    print(f'All {len(PARSERS)} backends agree on {len(pages)} pages.')
+
+    reference_time = time_backend(pages, 'soup')
+    print(f"{'backend':>8} {'total (s)':>10} {'per page (ms)':>14} {'speedup':>8}")
+    for name in PARSERS:
+        seconds = reference_time if name == 'soup' else time_backend(pages, name)
+        print(f"{name:>8} {seconds:>10.2f} {1000 * seconds / len(pages):>14.1f} {reference_time / seconds:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
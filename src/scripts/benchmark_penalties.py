@@ -0,0 +1,81 @@
+"""
+Penalty Cleaning Benchmark
+
+Description: Times the game_id, week, postseason and time left derivation in clean_penalties.py for the row-wise
+and the column-wise implementations. Penalties are generated for the games in game_detail.csv and repeated
+--scale times. Both outputs are checked for equality before the timings are printed.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from clean_penalties import (POSTSEASON_WEEKS, apply_adjustments, apply_adjustments_rowwise, compute_time_left,
+                             compute_time_left_rowwise, get_valid_game_ids)
+from utils.storage import read_table
+
+PENALTIES_PER_GAME = 13
+
+
+def synthetic_penalties(game_details, scale=1, seed=0):
+    """
+    Build penalties as they look after preprocess_data, for every game in game_details repeated scale times.
+    Postseason weeks are named as on nflpenalties.com and neutral site games sometimes list the wrong home team.
+    """
+    rng = np.random.default_rng(seed)
+    week_names = {week: name for name, week in POSTSEASON_WEEKS.items()}
+    games = pd.concat([game_details[['season', 'week', 'home_team', 'away_team']]] * scale, ignore_index=True)
+    games = games.loc[games.index.repeat(PENALTIES_PER_GAME)].reset_index(drop=True)
+
+    postseason_week = games['week'] - (games['season'] >= 2021)
+    week = postseason_week.map(week_names).where(postseason_week >= 18, games['week'].astype(str))
+    is_home = rng.random(len(games)) < 0.5
+    flip_home = (postseason_week == 21) & (rng.random(len(games)) < 0.5)
+
+    return pd.DataFrame({
+        'year': games['season'],
+        'week': week,
+        'team_id': np.where(is_home, games['home_team'], games['away_team']),
+        'opp_id': np.where(is_home, games['away_team'], games['home_team']),
+        'home': np.where(is_home ^ flip_home, 'Yes', 'No'),
+        'quarter': rng.choice([1, 2, 3, 4, 5], size=len(games), p=[0.24, 0.25, 0.24, 0.25, 0.02]),
+        'time': [f"{m}:{s:02}" for m, s in zip(rng.integers(0, 15, len(games)), rng.integers(0, 60, len(games)))]
+    })
+
+
+def time_call(func, *args):
+    """
+    Return the result of func(*args) and its wall time in seconds.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark row-wise against column-wise penalty cleaning.')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    game_details = read_table('game_detail', 'raw', columns=['game_id', 'season', 'week', 'home_team', 'away_team'])
+    valid_game_ids = get_valid_game_ids(game_details)
+
+    print(f"{'scale':>6} {'penalties':>10} {'stage':>18} {'row-wise (s)':>13} {'columnar (s)':>13} {'speedup':>8}")
+    for scale in args.scale:
+        penalties = synthetic_penalties(game_details, scale)
+
+        rowwise, rowwise_adjust = time_call(apply_adjustments_rowwise, penalties.copy(), valid_game_ids)
+        columnar, columnar_adjust = time_call(apply_adjustments, penalties.copy(), valid_game_ids)
+        rowwise, rowwise_time = time_call(compute_time_left_rowwise, rowwise)
+        columnar, columnar_time = time_call(compute_time_left, columnar)
+        assert rowwise.to_csv(index=False) == columnar.to_csv(index=False)
+
+        for stage, rowwise_s, columnar_s in [('apply_adjustments', rowwise_adjust, columnar_adjust),
+                                              ('compute_time_left', rowwise_time, columnar_time)]:
+            print(f"{scale:>6} {len(penalties):>10} {stage:>18} {rowwise_s:>13.2f} {columnar_s:>13.3f} "
+                  f"{rowwise_s / columnar_s:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Penalty Count Storage Benchmark
+
+Description: Compares the long penalty count tables with the wide layout they replaced. For drives and
+team_performances the wide table is rebuilt from the long counts, checked against a sparse widening, and written
+to a temporary directory, then the disk size and load time of both layouts are printed for CSV and Parquet.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.penalty_counts import (COUNT_TABLES, HAS_SCIPY, load_penalty_counts, load_wide_table, sparse_counts,
+                                  stored_penalty_types)
+from utils.storage import HAS_PARQUET, PARQUET_COMPRESSION, table_path
+
+
+def time_reads(read, paths):
+    """
+    Wall time in seconds of reading every path, best of three.
+    """
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for path in paths:
+            read(path)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def compare_layouts(name, directory):
+    """
+    Returns (format, wide MB, long MB, wide load s, long load s) rows for a processed table.
+    """
+    wide = load_wide_table(name, typed=False)
+    if HAS_SCIPY:
+        counts = load_penalty_counts(name, typed=False)
+        penalty_types = stored_penalty_types(name, counts)
+        matrix = sparse_counts(wide, counts, COUNT_TABLES[name][1], penalty_types)
+        assert np.array_equal(matrix.toarray(), wide[penalty_types].to_numpy()), f'sparse {name} differs'
+
+    formats = [('csv', pd.read_csv, lambda df, path: df.to_csv(path, index=False))]
+    if HAS_PARQUET:
+        formats.append(('parquet', pd.read_parquet,
+                        lambda df, path: df.to_parquet(path, compression=PARQUET_COMPRESSION, index=False)))
+
+    rows = []
+    for extension, read, write in formats:
+        wide_path = os.path.join(directory, f'{name}.{extension}')
+        write(wide, wide_path)
+        long_paths = [table_path(name, 'processed', extension),
+                      table_path(COUNT_TABLES[name][0], 'processed', extension)]
+        rows.append((extension, os.path.getsize(wide_path) / 2 ** 20,
+                     sum(os.path.getsize(path) for path in long_paths) / 2 ** 20,
+                     time_reads(read, [wide_path]), time_reads(read, long_paths)))
+    return rows
+
+
+def main():
+    print(f"{'table':>18} {'format':>8} {'wide (MB)':>10} {'long (MB)':>10} {'wide (s)':>9} {'long (s)':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in COUNT_TABLES:
+            if not os.path.exists(table_path(COUNT_TABLES[name][0], 'processed')):
+                print(f'{name:>18} not built yet')
+                continue
+            for extension, wide_mb, long_mb, wide_s, long_s in compare_layouts(name, directory):
+                print(f'{name:>18} {extension:>8} {wide_mb:>10.1f} {long_mb:>10.1f} {wide_s:>9.3f} {long_s:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
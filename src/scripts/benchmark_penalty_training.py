@@ -0,0 +1,57 @@
+"""
+Penalty Training Benchmark
+
+Description: Checks the parallel training of models/penalty_training.py against the formula GLMs of
+penalties.ipynb on the top 5 penalty types, then times fitting the model of every frequent penalty type with 1, 2,
+4, ... worker processes up to the CPU count.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from benchmark_predictions import fit_notebook_models
+from models.penalty_ensemble import PenaltyEnsemble
+from models.penalty_training import fit_ensemble, penalty_count_frame
+from utils.schemas import load_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the parallel penalty model training.')
+    parser.add_argument('--estimate-alpha', action='store_true', help='time the fits with estimated dispersion')
+    args = parser.parse_args()
+
+    matchups, label_encoders, models = fit_notebook_models()
+    expected = PenaltyEnsemble.from_models(models, label_encoders)
+    penalties = load_table('penalties', 'processed', columns=['game_id', 'team_id', 'opp_id', 'penalty', 'year',
+                                                              'week', 'ref_crew', 'home', 'postseason', 'phase'])
+    grouped = penalty_count_frame(penalties)
+    ensemble, _ = fit_ensemble(grouped, penalty_types=expected.penalty_types, processes=2)
+    assert ensemble.penalty_types == expected.penalty_types
+    assert np.allclose(ensemble.coefficients, expected.coefficients), 'coefficients differ from the notebook models'
+    assert np.allclose(ensemble.predict(matchups), expected.predict(matchups)), 'predictions differ'
+    print('Top 5 models match the notebook models.')
+
+    alpha = None if args.estimate_alpha else 1.0
+    counts = [1]
+    while counts[-1] * 2 <= os.cpu_count():
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+
+    print(f"{'processes':>9} {'models':>7} {'wall (s)':>9} {'model fits (s)':>15} {'speedup':>8}")
+    serial_seconds = None
+    for processes in counts:
+        start = time.perf_counter()
+        _, report = fit_ensemble(grouped, alpha=alpha, processes=processes)
+        seconds = time.perf_counter() - start
+        serial_seconds = serial_seconds or seconds
+        print(f"{processes:>9} {len(report):>7} {seconds:>9.2f} {report['fit_seconds'].sum():>15.2f} "
+              f"{serial_seconds / seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Pipeline Benchmark
+
+Description: Times clean_penalties.py, clean_games.py, clean_drives.py and output_penalties.py on synthetic data of
+generate_synthetic_data.py at multiples of the scraped history (15 seasons). Every scale gets its own temporary data
+directory, and every script runs --repeat times in a fresh interpreter with NFL_PENALTY_DATA_DIR pointing at it, as
+it would from the command line. The median and fastest wall time and the peak RSS of the profile report of each
+script are printed and saved with the git commit, Python version and machine to data/benchmarks/, so results of
+different commits can be compared.
+
+Past MAX_SEASONS seasons the extra history is added as more games per week: 50x is 250 seasons of 3 games a week.
+
+Usage: python benchmark_pipeline.py [--scale 1 10 50] [--repeat 3] [--keep /tmp/pipeline_benchmark]
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from generate_synthetic_data import HISTORY_SEASONS, MAX_SEASONS
+from utils.storage import DATA_DIR
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS_DIR = os.path.join(DATA_DIR, 'benchmarks')
+# In pipeline order, each script reads what the ones before it wrote
+SCRIPTS = ['clean_penalties', 'clean_games', 'clean_drives', 'output_penalties']
+# Files (relative to the root of a scale) a script would reuse from its last run, deleted before every timed run
+STALE_FILES = {'output_penalties': [os.path.join('data', 'processed', 'analytics.sqlite'),
+                                    os.path.join('outputs', 'penalty_list.csv')]}
+# Files a script has to write for its run to count
+EXPECTED_FILES = {'output_penalties': [os.path.join('outputs', 'penalty_list.csv')]}
+
+
+def scale_settings(scale):
+    """
+    (seasons, games per week) with scale times the games of the scraped history.
+    """
+    season_equivalents = scale * HISTORY_SEASONS
+    seasons = min(season_equivalents, MAX_SEASONS)
+    return seasons, math.ceil(season_equivalents / seasons)
+
+
+def git_commit():
+    """Commit of the working tree, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPTS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_script(script, root):
+    """
+    Run a script on the data directory of root and return its wall time in seconds and the peak RSS of its profile
+    report. The files of its last run listed in STALE_FILES are deleted first, so every run starts from scratch, e.g.
+    output_penalties.py builds the analytics database again. Raises RuntimeError if the script fails or does not
+    write its EXPECTED_FILES.
+    """
+    env = dict(os.environ, NFL_PENALTY_DATA_DIR=os.path.join(root, 'data'))
+    for name in STALE_FILES.get(script, []):
+        if os.path.exists(os.path.join(root, name)):
+            os.remove(os.path.join(root, name))
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, f'{script}.py')], cwd=root, env=env,
+                            capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f'{script} failed:\n{result.stderr[-2000:]}')
+    missing = [name for name in EXPECTED_FILES.get(script, []) if not os.path.exists(os.path.join(root, name))]
+    if missing:
+        raise RuntimeError(f"{script} did not write {', '.join(missing)}:\n{result.stdout[-2000:]}")
+
+    reports = sorted(glob.glob(os.path.join(root, 'data', 'profiles', f'{script}_*.json')), key=os.path.getmtime)
+    with open(reports[-1]) as f:
+        peak = json.load(f)['peak_rss_mb']
+    return seconds, peak
+
+
+def table_rows(path):
+    """Rows of a generated CSV, none of which span lines."""
+    with open(path) as f:
+        return sum(1 for _ in f) - 1
+
+
+def benchmark_scale(scale, root, repeat):
+    """
+    Generate the data of one scale into root and time every script on it. Returns one result dict per script.
+    The data is generated in a child process too: a child starts with the peak RSS of its parent on Linux, so the
+    runner itself has to stay small.
+    """
+    seasons, games_per_week = scale_settings(scale)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'generate_synthetic_data.py'), '--seasons',
+                    str(seasons), '--games-per-week', str(games_per_week), '--data-dir', os.path.join(root, 'data')],
+                   check=True, capture_output=True)
+    generate_seconds = time.perf_counter() - start
+    sizes = {f'{name}_rows': table_rows(os.path.join(root, 'data', 'raw', f'{name}.csv'))
+             for name in ['game_detail', 'penalties', 'drives']}
+
+    results = [{'scale': scale, 'seasons': seasons, 'games_per_week': games_per_week, 'script': 'generate',
+                'median_s': generate_seconds, 'min_s': generate_seconds, 'peak_rss_mb': None, **sizes}]
+    for script in SCRIPTS:
+        timings = [run_script(script, root) for _ in range(repeat)]
+        seconds = [timing[0] for timing in timings]
+        results.append({'scale': scale, 'seasons': seasons, 'games_per_week': games_per_week, 'script': script,
+                        'median_s': statistics.median(seconds), 'min_s': min(seconds),
+                        'peak_rss_mb': max(timing[1] or 0 for timing in timings) or None, **sizes})
+        print(f"{scale:>5}x {script:>17} {results[-1]['median_s']:>9.2f} s", flush=True)
+    return results
+
+
+def save_results(results, directory=BENCHMARKS_DIR):
+    """
+    Write the results with the commit, Python version and machine to <directory>/pipeline_<time>.json.
+    """
+    os.makedirs(directory, exist_ok=True)
+    run = time.strftime('%Y%m%dT%H%M%S')
+    path = os.path.join(directory, f'pipeline_{run}.json')
+    with open(path, 'w') as f:
+        json.dump({'run': run, 'commit': git_commit(), 'python': platform.python_version(),
+                   'machine': platform.platform(), 'cpus': os.cpu_count(), 'results': results}, f, indent=1)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cleaning scripts on synthetic multi-season data.')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 50], help='multiples of the scraped history')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every script per scale')
+    parser.add_argument('--keep', help='generate into this directory and keep it instead of a temporary one')
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scale:
+        if args.keep:
+            results += benchmark_scale(scale, os.path.join(args.keep, f'{scale}x'), args.repeat)
+            continue
+        with tempfile.TemporaryDirectory(prefix=f'pipeline_{scale}x_') as root:
+            results += benchmark_scale(scale, root, args.repeat)
+
+    table = pd.DataFrame(results)
+    columns = ['scale', 'seasons', 'games_per_week', 'game_detail_rows', 'penalties_rows', 'drives_rows', 'script',
+               'median_s', 'min_s', 'peak_rss_mb']
+    print(table[columns].to_string(index=False, float_format=lambda value: f'{value:.2f}'))
+    print(f'Results saved to {save_results(results)}')
+
+
+if __name__ == '__main__':
+    main()
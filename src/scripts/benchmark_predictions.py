@@ -0,0 +1,101 @@
+"""
+Penalty Prediction Benchmark
+
+Description: Fits the top penalty type Negative Binomial models as in penalties.ipynb and compares the one matchup
+per call predict_penalties function of the notebook with the batch PenaltyEnsemble.predict of
+models/penalty_ensemble.py. Checks that both give the same counts and prints the throughput for slates of 1,
+1,000 and 100,000 matchups (the per call function is only timed on the first 1,000).
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from statsmodels.formula.api import glm
+from statsmodels.genmod.families import NegativeBinomial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.penalty_ensemble import PREDICTORS, PenaltyEnsemble
+from utils.schemas import load_table
+
+SLATE_SIZES = [1, 1000, 100000]
+MAX_PER_CALL_ROWS = 1000
+
+
+def fit_notebook_models(top_n=5):
+    """
+    Grouped penalty counts, label encoders and the models of the top_n penalty types, as fitted in penalties.ipynb.
+    """
+    df = load_table('penalties', 'processed', columns=['game_id', 'team_id', 'opp_id', 'penalty', 'year', 'week',
+                                                       'ref_crew', 'home', 'postseason', 'phase'])
+    penalties_count = df['penalty'].value_counts()
+    frequent_penalties = penalties_count[penalties_count >= 50].index.tolist()
+    penalties_data = df[(df['phase'] != 'ST') & (df['penalty'].isin(frequent_penalties))]
+    df_grouped = penalties_data.groupby(['game_id', 'team_id', 'opp_id', 'year', 'week', 'ref_crew', 'home',
+                                         'postseason', 'penalty'], observed=True).size().reset_index(name='count')
+    matchups = df_grouped[PREDICTORS].copy()
+
+    label_encoders = {}
+    for column in ['team_id', 'opp_id', 'ref_crew', 'home', 'postseason', 'penalty']:
+        le = LabelEncoder()
+        df_grouped[column] = le.fit_transform(df_grouped[column])
+        label_encoders[column] = le
+
+    models = {}
+    formula = 'count ~ ' + ' + '.join(PREDICTORS)
+    for penalty_code in df_grouped['penalty'].value_counts().nlargest(top_n).index.tolist():
+        df_penalty = df_grouped[df_grouped['penalty'] == penalty_code]
+        models[penalty_code] = glm(formula, data=df_penalty, family=NegativeBinomial(alpha=1.0)).fit()
+    return matchups, label_encoders, models
+
+
+def per_call_predictions(slate, label_encoders, models):
+    """
+    Predictions of the predict_penalties function of penalties.ipynb, one matchup per call.
+    """
+    rows = []
+    for team_id, opp_id, year, week, ref_crew, home, postseason in slate.itertuples(index=False, name=None):
+        input_data = {
+            'team_id': label_encoders['team_id'].transform([team_id])[0],
+            'opp_id': label_encoders['opp_id'].transform([opp_id])[0],
+            'year': year,
+            'week': week,
+            'ref_crew': label_encoders['ref_crew'].transform([ref_crew])[0],
+            'home': label_encoders['home'].transform([home])[0],
+            'postseason': label_encoders['postseason'].transform([postseason])[0]
+        }
+        predictions = []
+        for model in models.values():
+            features_df = pd.DataFrame([input_data])
+            predictions.append(max(0, model.predict(features_df)[0]))
+        rows.append(predictions)
+    return np.array(rows)
+
+
+def main():
+    matchups, label_encoders, models = fit_notebook_models()
+    ensemble = PenaltyEnsemble.from_models(models, label_encoders)
+    print(f'{len(ensemble.penalty_types)} penalty models: {ensemble.penalty_types}')
+
+    print(f"{'rows':>8} {'per call (rows/s)':>18} {'batch (rows/s)':>15} {'max difference':>15}")
+    for size in SLATE_SIZES:
+        slate = matchups.sample(size, replace=True, random_state=size).reset_index(drop=True)
+
+        start = time.perf_counter()
+        batch = ensemble.predict(slate)
+        batch_rate = size / (time.perf_counter() - start)
+
+        per_call_rows = min(size, MAX_PER_CALL_ROWS)
+        start = time.perf_counter()
+        expected = per_call_predictions(slate.head(per_call_rows), label_encoders, models)
+        per_call_rate = per_call_rows / (time.perf_counter() - start)
+
+        difference = np.max(np.abs(batch[:per_call_rows] - expected))
+        assert np.allclose(batch[:per_call_rows], expected), f'batch predictions differ by {difference}'
+        print(f'{size:>8} {per_call_rate:>18,.0f} {batch_rate:>15,.0f} {difference:>15.2e}')
+
+
+if __name__ == '__main__':
+    main()
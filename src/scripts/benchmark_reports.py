@@ -0,0 +1,89 @@
+"""
+Report Query Benchmark
+
+Description: Checks the standard report queries of utils/analytics_db.py against the pandas groupbys they replace
+(penalties_eda.ipynb and output_penalties.py) and times both. The pandas side re-reads the penalties CSV like the
+notebook did, the database side runs each report against the indexed SQLite database.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.analytics_db import DB_PATH, build_database, run_report
+from utils.storage import table_path
+
+MIN_COUNT = 50
+
+
+def pandas_reports(penalties):
+    """
+    The reports computed with pandas from the penalties table, as Series keyed by their first report column.
+    """
+    counts = penalties['penalty'].value_counts()
+    filtered = penalties[(penalties['phase'] != 'ST') & penalties['penalty'].isin(counts[counts >= MIN_COUNT].index)]
+    offense = filtered[filtered['phase'] == 'Off']
+
+    time_left = pd.to_timedelta(filtered['time_left']).dt.total_seconds() / 60
+    minutes = (60 - time_left[time_left >= 0]).astype(int)
+
+    accepted = penalties[(penalties['declined'] != 'Yes') & (penalties['offsetting'] != 'Yes')]
+    yards = accepted.groupby('penalty')['yardage'].agg(
+        lambda x: 'spot' if x.std() > 10 else x.mode()[0] if len(x.mode()) > 0 else 'spot')
+
+    return {
+        'penalty_counts': offense['penalty'].value_counts(),
+        'yards_by_penalty': offense.groupby('penalty')['yardage'].sum(),
+        'yards_given_up_by_team': filtered.groupby('team_id')['yardage'].sum(),
+        'yards_gained_by_team': filtered.groupby('opp_id')['yardage'].sum(),
+        'penalties_by_position': filtered.groupby('pos')['penalty'].count(),
+        'penalties_per_game_by_crew': filtered.groupby(['ref_crew', 'game_id']).size().groupby(level=0).mean(),
+        'penalties_by_minute': minutes.groupby(minutes).size(),
+        'penalty_list': yards.astype(str),
+    }
+
+
+def as_series(report):
+    """
+    A report DataFrame as a Series of its second column keyed by its first.
+    """
+    return report.set_index(report.columns[0])[report.columns[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time the report queries against pandas.')
+    parser.add_argument('--rebuild', action='store_true', help='time a full rebuild of the database first')
+    args = parser.parse_args()
+
+    if args.rebuild or not os.path.exists(DB_PATH):
+        start = time.perf_counter()
+        build_database()
+        print(f'Built {DB_PATH} in {time.perf_counter() - start:.1f} s')
+
+    start = time.perf_counter()
+    penalties = pd.read_csv(table_path('penalties', 'processed'))
+    read_seconds = time.perf_counter() - start
+    print(f'pandas read of penalties.csv: {1000 * read_seconds:.0f} ms')
+
+    print(f"{'report':>28} {'pandas (ms)':>12} {'sqlite (ms)':>12}")
+    start = time.perf_counter()
+    expected = pandas_reports(penalties)
+    pandas_ms = 1000 * (time.perf_counter() - start) / len(expected)
+    for name, series in expected.items():
+        start = time.perf_counter()
+        report = run_report(name, phase='Off')
+        sqlite_ms = 1000 * (time.perf_counter() - start)
+        result = as_series(report)
+        if name == 'penalty_list':
+            result = result.astype(str)
+        pd.testing.assert_series_equal(result.sort_index(), series.sort_index(), check_names=False,
+                                       check_dtype=False, check_index_type=False)
+        print(f'{name:>28} {pandas_ms:>12.1f} {sqlite_ms:>12.1f}')
+    print('All reports match pandas (pandas time is the average per report, excluding the CSV read).')
+
+
+if __name__ == '__main__':
+    main()
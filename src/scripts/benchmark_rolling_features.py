@@ -0,0 +1,72 @@
+"""
+Rolling Feature Benchmark
+
+Description: Compares the rolling penalty features of utils/rolling_features.py with the per column groupby
+transform that nn.ipynb used before. Checks that both give the same features, then times the transform loop, the
+vectorized pass, a cached read, and an incremental update after the last week of the latest season is appended.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.penalty_counts import load_wide_table, stored_penalty_types
+from utils.rolling_features import GROUP_KEYS, feature_name, lagged_rolling_means, rolling_features
+
+WINDOW = 3
+
+
+def transform_loop(data, penalty_columns, window_size):
+    """
+    The per column rolling averages as computed in nn.ipynb before the feature store.
+    """
+    features = pd.DataFrame(index=data.index)
+    for col in penalty_columns:
+        features[feature_name(col, window_size)] = data.groupby(GROUP_KEYS, observed=True)[col].transform(
+            lambda x: x.shift(1).rolling(window=window_size, min_periods=1).mean())
+    return features
+
+
+def timed(function, *args, **kwargs):
+    """
+    Result and wall time in seconds of a call.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    data = load_wide_table('team_performances')
+    penalty_columns = stored_penalty_types('team_performances')
+    print(f'{len(data)} team games, {len(penalty_columns)} penalty columns')
+
+    expected, loop_seconds = timed(transform_loop, data, penalty_columns, WINDOW)
+    vectorized, vectorized_seconds = timed(lagged_rolling_means, data, penalty_columns, windows=[WINDOW])
+    pd.testing.assert_frame_equal(vectorized, expected, check_exact=False)
+    print(f'groupby transform loop: {loop_seconds:.3f} s')
+    print(f'vectorized pass:        {vectorized_seconds:.3f} s')
+
+    # Work in a temporary feature directory so the real cache is left alone
+    latest = data['year'] == data['year'].max()
+    last_week = latest & (data['week'] == data.loc[latest, 'week'].max())
+    with tempfile.TemporaryDirectory() as stage:
+        _, first_seconds = timed(rolling_features, data[~last_week], penalty_columns, 'benchmark', windows=[WINDOW],
+                                 stage=stage)
+        _, cached_seconds = timed(rolling_features, data[~last_week], penalty_columns, 'benchmark', windows=[WINDOW],
+                                  stage=stage)
+        updated, update_seconds = timed(rolling_features, data, penalty_columns, 'benchmark', windows=[WINDOW],
+                                        stage=stage)
+    pd.testing.assert_frame_equal(updated, expected, check_exact=False)
+    print(f'first cached run:       {first_seconds:.3f} s')
+    print(f'cache hit:              {cached_seconds:.3f} s')
+    print(f'append one week:        {update_seconds:.3f} s')
+    print(f'max difference from transform loop: {np.nanmax(np.abs(updated.to_numpy() - expected.to_numpy())):.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,23 +5,37 @@ Date: 2024-5-1
 
 Description: Cleans the drives.csv file and conforms it to the schema of the other data files.
 """
+import argparse
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 
-# Read in the data
-drives_df = pd.read_csv('../../data/raw/drives.csv')
-penalties_df = pd.read_csv('../../data/processed/penalties.csv')
-games_df = pd.read_csv('../../data/raw/game_detail.csv')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.drive_matching import assign_drives
+from utils.partitions import PARTITION_LEVELS, game_id_partitions, hash_partitions, save_partitioned_table, select_partitions
+from utils.penalty_aggregation import filter_frequent_penalties, merge_penalty_totals, penalty_totals
+from utils.penalty_counts import COUNT_TABLES, DRIVE_KEYS, count_penalties
+from utils.profiling import profile_run, profiled
+from utils.schemas import load_table
+
 
-# Fill missing 'quarter' values based on 'result'
-drives_df.loc[(drives_df['quarter'].isnull()) & (drives_df['result'] == 'End of Half'), 'quarter'] = 2
-drives_df.loc[(drives_df['quarter'].isnull()) & (drives_df['result'] == 'End of Game'), 'quarter'] = 4
+@profiled()
+def load_data():
+    """
+    Load the raw drives with only the penalty and game columns needed to match them.
+    """
+    drives_df = load_table('drives', 'raw')
+    penalties_df = load_table('penalties', 'processed', columns=['game_id', 'penalty', 'phase', 'yardage', 'time_left'])
+    games_df = load_table('game_detail', 'raw', columns=['game_id', 'date'])
+    return drives_df, penalties_df, games_df
 
-# Fix 'result' values based on 'quarter'
-drives_df.loc[(drives_df['quarter'] == 4) & (drives_df['result'] == 'End of Half'), 'result'] = 'End of Game'
-drives_df.loc[(drives_df['quarter'] == 2) & (drives_df['result'] == 'End of Game'), 'result'] = 'End of Half'
 
-# Compute time left in the game
 def compute_time_left_helper(row):
+    """
+    Compute the time left in the game based on the quarter and time columns.
+    """
     if pd.isna(row['quarter']):
         return None
     quarter_time_left = (4 - row['quarter']) * 15
@@ -32,10 +46,11 @@ def compute_time_left_helper(row):
     minutes, seconds = divmod(remainder, 60)
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
-drives_df['time_left'] = drives_df.apply(compute_time_left_helper, axis=1)
 
-# Calculate 'los' values
 def calculate_los(row):
+    """
+    Calculate the line of scrimmage as yards from the opponent's end zone.
+    """
     if pd.isna(row['los']):
         return None
     team_field, position = row['los'].split()
@@ -44,47 +59,142 @@ def calculate_los(row):
     else:
         return int(position)
 
-drives_df['los'] = drives_df.apply(calculate_los, axis=1)
-
-drives_df['quarter'] = drives_df['quarter'].astype(int)
-drives_df['los'] = drives_df['los'].fillna(100).astype(int)
-
-# Merge the 'date' column from games_df into drives_df
-drives_df = pd.merge(drives_df, games_df[['game_id', 'date']], on='game_id', how='left')
-drives_df = drives_df.sort_values(by=['date', 'game_id', 'time_left'], ascending=[True, True, False])
-
-# Filter penalties to only penalties that occur 50+ times and are not special teams penalties
-penalties_count = penalties_df['penalty'].value_counts()
-frequent_penalties = penalties_count[penalties_count >= 50].index.tolist()
-filtered_penalties = penalties_df[(penalties_df['phase'] != 'ST') & (penalties_df['penalty'].isin(frequent_penalties))].copy()
-
-unique_penalties = filtered_penalties['penalty'].unique()
-for penalty in unique_penalties:
-    drives_df[penalty] = 0
-
-drives_df['total_off_pen'] = 0
-drives_df['total_def_pen'] = 0
-drives_df['total_off_pen_yards'] = 0
-drives_df['total_def_pen_yards'] = 0
-
-# Convert 'time_left' to timedelta
-drives_df['time_left_timedelta'] = pd.to_timedelta(drives_df['time_left'])
-filtered_penalties['time_left_timedelta'] = pd.to_timedelta(filtered_penalties['time_left'])
-
-# Match penalties to the exact drive they occurred in
-for idx, penalty in filtered_penalties.iterrows():
-    matching_drive = drives_df[(drives_df['game_id'] == penalty['game_id']) &
-                               (drives_df['time_left_timedelta'] >= penalty['time_left_timedelta'])].tail(1)
-    if not matching_drive.empty:
-        drive_index = matching_drive.index[0]
-        drives_df.at[drive_index, penalty['penalty']] += 1
-        if penalty['phase'] == 'Off':
-            drives_df.at[drive_index, 'total_off_pen'] += 1
-            drives_df.at[drive_index, 'total_off_pen_yards'] += penalty['yardage']
-        elif penalty['phase'] == 'Def':
-            drives_df.at[drive_index, 'total_def_pen'] += 1
-            drives_df.at[drive_index, 'total_def_pen_yards'] += penalty['yardage']
-
-# Cleanup and save
-drives_df.drop(columns=['time_left_timedelta'], inplace=True)
-drives_df.to_csv('../../data/processed/drives.csv', index=False)
+
+@profiled()
+def preprocess_drives(drives_df, games_df):
+    """
+    Fix quarters and results, compute time left and line of scrimmage, and sort drives by game and time.
+    """
+    # Fill missing 'quarter' values based on 'result'
+    drives_df.loc[(drives_df['quarter'].isnull()) & (drives_df['result'] == 'End of Half'), 'quarter'] = 2
+    drives_df.loc[(drives_df['quarter'].isnull()) & (drives_df['result'] == 'End of Game'), 'quarter'] = 4
+
+    # Fix 'result' values based on 'quarter'
+    drives_df.loc[(drives_df['quarter'] == 4) & (drives_df['result'] == 'End of Half'), 'result'] = 'End of Game'
+    drives_df.loc[(drives_df['quarter'] == 2) & (drives_df['result'] == 'End of Game'), 'result'] = 'End of Half'
+
+    drives_df['time_left'] = drives_df.apply(compute_time_left_helper, axis=1)
+    drives_df['los'] = drives_df.apply(calculate_los, axis=1)
+
+    drives_df['quarter'] = drives_df['quarter'].astype(int)
+    drives_df['los'] = drives_df['los'].fillna(100).astype(int)
+
+    # Merge the 'date' column from games_df into drives_df
+    drives_df = pd.merge(drives_df, games_df[['game_id', 'date']], on='game_id', how='left')
+    drives_df = drives_df.sort_values(by=['date', 'game_id', 'time_left'], ascending=[True, True, False])
+    return drives_df
+
+
+@profiled()
+def add_penalties_loop(drives_df, filtered_penalties, penalty_types=None):
+    """
+    Original per-penalty matching, kept behind --legacy to check add_penalties against.
+    """
+    drives_df['total_off_pen'] = 0
+    drives_df['total_def_pen'] = 0
+    drives_df['total_off_pen_yards'] = 0
+    drives_df['total_def_pen_yards'] = 0
+
+    # Convert 'time_left' to timedelta
+    drives_df['time_left_timedelta'] = pd.to_timedelta(drives_df['time_left'])
+    filtered_penalties['time_left_timedelta'] = pd.to_timedelta(filtered_penalties['time_left'])
+
+    # Match penalties to the exact drive they occurred in
+    positions = np.full(len(filtered_penalties), -1, dtype=np.int64)
+    for i, (idx, penalty) in enumerate(filtered_penalties.iterrows()):
+        matching_drive = drives_df[(drives_df['game_id'] == penalty['game_id']) &
+                                   (drives_df['time_left_timedelta'] >= penalty['time_left_timedelta'])].tail(1)
+        if not matching_drive.empty:
+            drive_index = matching_drive.index[0]
+            positions[i] = drives_df.index.get_loc(drive_index)
+            if penalty['phase'] == 'Off':
+                drives_df.at[drive_index, 'total_off_pen'] += 1
+                drives_df.at[drive_index, 'total_off_pen_yards'] += penalty['yardage']
+            elif penalty['phase'] == 'Def':
+                drives_df.at[drive_index, 'total_def_pen'] += 1
+                drives_df.at[drive_index, 'total_def_pen_yards'] += penalty['yardage']
+
+    drives_df.drop(columns=['time_left_timedelta'], inplace=True)
+    filtered_penalties.drop(columns=['time_left_timedelta'], inplace=True)
+    return drives_df, count_drive_penalties(drives_df, filtered_penalties, positions, penalty_types)
+
+
+def count_drive_penalties(drives_df, filtered_penalties, positions, penalty_types=None):
+    """
+    Count every penalty type per drive in long format from the position of the drive matched to each penalty
+    (-1 for none). The counts are keyed by the drive, so team_id is the team with the ball.
+    """
+    if penalty_types is None:
+        penalty_types = filtered_penalties['penalty'].unique()
+    matched = filtered_penalties[positions >= 0]
+    drive_keys = drives_df[DRIVE_KEYS].iloc[positions[positions >= 0]]
+    matched = matched.assign(**{key: drive_keys[key].to_numpy() for key in DRIVE_KEYS})
+    return count_penalties(matched, DRIVE_KEYS, penalty_types)
+
+
+@profiled()
+def add_penalties(drives_df, filtered_penalties, penalty_types=None):
+    """
+    Match every penalty to the drive it occurred in with one as-of join, then add the offensive/defensive totals
+    in a single grouped aggregation. Returns the drives and their penalty counts in long format.
+    """
+    positions = assign_drives(drives_df, filtered_penalties)
+    matched = filtered_penalties[positions >= 0].assign(drive_position=positions[positions >= 0])
+    totals = penalty_totals(matched, ['drive_position'])
+
+    drives_with_totals = drives_df.assign(drive_position=np.arange(len(drives_df)))
+    drives_with_totals = merge_penalty_totals(drives_with_totals, totals, ['drive_position'])
+    return (drives_with_totals.drop(columns=['drive_position']),
+            count_drive_penalties(drives_df, filtered_penalties, positions, penalty_types))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Clean the drives.csv file.')
+    parser.add_argument('--legacy', action='store_true',
+                        help='match penalties to drives with the original per-penalty loop')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only reprocess the partitions whose drives, penalties or games changed since the last run')
+    parser.add_argument('--partition-by', choices=PARTITION_LEVELS, default='season')
+    args = parser.parse_args(argv)
+
+    drives_df, penalties_df, games_df = load_data()
+
+    # Penalty columns depend on counts over every season, so they are fixed before selecting partitions
+    filtered_penalties = filter_frequent_penalties(penalties_df)
+    penalty_types = filtered_penalties['penalty'].unique().tolist()
+
+    labels = game_id_partitions(drives_df['game_id'], args.partition_by)
+    penalty_labels = game_id_partitions(filtered_penalties['game_id'], args.partition_by)
+    game_labels = game_id_partitions(games_df['game_id'], args.partition_by)
+    settings = {'partition_by': args.partition_by, 'penalty_types': penalty_types,
+                'columns': list(drives_df.columns), 'penalty_counts': COUNT_TABLES['drives'][0]}
+    input_hashes = {
+        'drives': hash_partitions(drives_df, labels),
+        'penalties': hash_partitions(filtered_penalties, penalty_labels),
+        'game_detail': hash_partitions(games_df, game_labels)
+    }
+    changed = select_partitions('drives', settings, input_hashes, args.incremental)
+    if changed is not None:
+        if not changed:
+            return
+        drives_df = drives_df[labels.isin(changed)].copy()
+        filtered_penalties = filtered_penalties[penalty_labels.isin(changed)].copy()
+        games_df = games_df[game_labels.isin(changed)]
+
+    drives_df = preprocess_drives(drives_df, games_df)
+    if args.legacy:
+        drives_df, penalty_counts = add_penalties_loop(drives_df, filtered_penalties, penalty_types)
+    else:
+        drives_df, penalty_counts = add_penalties(drives_df, filtered_penalties, penalty_types)
+
+    # The penalty counts are saved first so an interrupted run is redone
+    save_partitioned_table(penalty_counts, COUNT_TABLES['drives'][0],
+                           game_id_partitions(penalty_counts['game_id'], args.partition_by),
+                           changed, settings, input_hashes)
+    save_partitioned_table(drives_df, 'drives', game_id_partitions(drives_df['game_id'], args.partition_by),
+                           changed, settings, input_hashes)
+
+
+if __name__ == '__main__':
+    with profile_run('clean_drives'):
+        main()
@@ -5,17 +5,22 @@ Date: 2024-5-1
 
 Description: Cleans the team_performances.csv file and conforms it to the schema of the other data files.
 """
+import argparse
+import os
+import sys
+
 import pandas as pd
 
-# Load the datasets
-team_data_path = '../../data/raw/team_performances.csv'
-penalty_data_path = '../../data/processed/penalties.csv'
-games_data_path = '../../data/raw/game_detail.csv'
-team_performances = pd.read_csv(team_data_path)
-penalties = pd.read_csv(penalty_data_path)
-game_details = pd.read_csv(games_data_path)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.partitions import PARTITION_LEVELS, game_id_partitions, hash_partitions, save_partitioned_table, select_partitions
+from utils.penalty_aggregation import filter_frequent_penalties, merge_penalty_totals, penalty_totals
+from utils.penalty_counts import COUNT_TABLES, TEAM_KEYS, count_penalties
+from utils.profiling import PROFILER, profile_run, profiled
+from utils.schemas import load_table
+
 
-def preprocess_data(df, penalty_df, games_df):
+@profiled()
+def preprocess_data(df, penalty_df, games_df, penalty_types=None):
     df['otpts'].replace('N/A', pd.NA, inplace=True)
     df['otpts'] = df['otpts'].astype('Int64')  # Using nullable integer type
 
@@ -69,40 +74,69 @@ def preprocess_data(df, penalty_df, games_df):
 
     ## Add penalties -----------------------------------------------------------
 
-    # Filter penalties to only penalties that occur 50+ times and are not special teams penalties
-    penalties_count = penalty_df['penalty'].value_counts()
-    frequent_penalties = penalties_count[penalties_count >= 50].index.tolist()
-    filtered_penalties = penalty_df[(penalty_df['phase'] != 'ST') & (penalty_df['penalty'].isin(frequent_penalties))].copy()
-
-    # Initialize penalty types from penalties.csv
-    unique_penalties = filtered_penalties['penalty'].unique()
-    for penalty in unique_penalties:
-        df[penalty] = 0
-
-    # Initialize additional penalty-related columns
-    df['total_off_pen'] = 0
-    df['total_def_pen'] = 0
-    df['total_off_pen_yards'] = 0
-    df['total_def_pen_yards'] = 0
-
-    # Increment penalty counts and yardages
-    for _, row in filtered_penalties.iterrows():
-        game_id = row['game_id']
-        team_id = row['team_id']
-        penalty = row['penalty']
-        yardage = row['yardage']
-        phase = row['phase']
-
-        # Locate the team and game in team performances
-        mask = (df['game_id'] == game_id) & (df['team_id'] == team_id)
-        if phase in ['Off', 'Def']:
-            df.loc[mask, penalty] += 1
-            column_prefix = 'total_off_' if phase == 'Off' else 'total_def_'
-            df.loc[mask, column_prefix + 'pen'] += 1
-            df.loc[mask, column_prefix + 'pen_yards'] += yardage
-
-    return df
-
-# Preprocess and save the data
-processed_data = preprocess_data(team_performances, penalties, game_details)
-processed_data.to_csv('../../data/processed/team_performances.csv', index=False)
+    # Filter penalties to only penalties that occur 50+ times (or the given types) and are not special teams penalties
+    filtered_penalties = filter_frequent_penalties(penalty_df, penalty_types=penalty_types)
+    if penalty_types is None:
+        penalty_types = filtered_penalties['penalty'].unique()
+
+    # Sum penalties and yards per phase for every team and game and merge them in once
+    df = merge_penalty_totals(df, penalty_totals(filtered_penalties, TEAM_KEYS), TEAM_KEYS)
+
+    # Count each penalty type in long format, only for the teams and games that are in the table
+    penalty_counts = count_penalties(filtered_penalties, TEAM_KEYS, penalty_types)
+    penalty_counts = penalty_counts.merge(df[TEAM_KEYS].drop_duplicates(), on=TEAM_KEYS)
+
+    return df, penalty_counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Clean the team_performances.csv file.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only reprocess the partitions whose team performances, penalties or games changed')
+    parser.add_argument('--partition-by', choices=PARTITION_LEVELS, default='season')
+    args = parser.parse_args(argv)
+
+    # Load the datasets, only reading the penalty and game columns that are used
+    with PROFILER.stage('load_data') as stage:
+        team_performances = load_table('team_performances', 'raw')
+        penalties = load_table('penalties', 'processed', columns=[
+            'game_id', 'team_id', 'home', 'postseason', 'year', 'week', 'ref_crew', 'penalty', 'phase', 'yardage'])
+        game_details = load_table('game_detail', 'raw', columns=[
+            'game_id', 'home_team', 'away_team', 'home_coach', 'away_coach'])
+        stage.rows = len(team_performances)
+
+    # Penalty columns depend on counts over every season, so they are fixed before selecting partitions
+    penalty_types = filter_frequent_penalties(penalties)['penalty'].unique().tolist()
+
+    labels = game_id_partitions(team_performances['game_id'], args.partition_by)
+    penalty_labels = game_id_partitions(penalties['game_id'], args.partition_by)
+    game_labels = game_id_partitions(game_details['game_id'], args.partition_by)
+    settings = {'partition_by': args.partition_by, 'penalty_types': penalty_types,
+                'columns': list(team_performances.columns), 'penalty_counts': COUNT_TABLES['team_performances'][0]}
+    input_hashes = {
+        'team_performances': hash_partitions(team_performances, labels),
+        'penalties': hash_partitions(penalties, penalty_labels),
+        'game_detail': hash_partitions(game_details, game_labels)
+    }
+    changed = select_partitions('team_performances', settings, input_hashes, args.incremental)
+    if changed is not None:
+        if not changed:
+            return
+        team_performances = team_performances[labels.isin(changed)].copy()
+        penalties = penalties[penalty_labels.isin(changed)]
+        game_details = game_details[game_labels.isin(changed)]
+
+    # Preprocess and save the data, the penalty counts first so an interrupted run is redone
+    processed_data, penalty_counts = preprocess_data(team_performances, penalties, game_details, penalty_types)
+    save_partitioned_table(penalty_counts, COUNT_TABLES['team_performances'][0],
+                           game_id_partitions(penalty_counts['game_id'], args.partition_by),
+                           changed, settings, input_hashes)
+    save_partitioned_table(processed_data, 'team_performances',
+                           game_id_partitions(processed_data['game_id'], args.partition_by),
+                           changed, settings, input_hashes)
+
+
+if __name__ == '__main__':
+    with profile_run('clean_games'):
+        main()
+
@@ -5,15 +5,35 @@ Date: 2024-4-17
 
 Description: Cleans the penalties.csv file and conforms it to the schema of the other data files.
 """
+import argparse
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.normalization import PENALTY_OPPONENT_IDS, PENALTY_TEAM_IDS, recode
+from utils.partitions import (PARTITION_LEVELS, game_id_partitions, hash_partitions, partition_labels,
+                              save_partitioned_table, select_partitions)
+from utils.profiling import profile_run, profiled
+from utils.schemas import load_table
+
+POSTSEASON_WEEKS = {
+    "Wildcard Weekend": 18,
+    "Divisional Playoffs": 19,
+    "Conference Championships": 20,
+    "Super Bowl": 21
+}
+
 
+@profiled()
 def load_data():
     """
-    Load data from CSV files.
+    Load the raw penalties and the game ids from game_detail.
     """
-    penalties = pd.read_csv('../../data/raw/penalties.csv')
-    game_details = pd.read_csv('../../data/raw/game_detail.csv')
+    penalties = load_table('penalties', 'raw')
+    game_details = load_table('game_detail', 'raw', columns=['game_id'])
     return penalties, game_details
 
 
@@ -28,36 +48,12 @@ def map_ids(penalties):
     """
     Map team and opponent IDs to the penalties dataframe.
     """
-    team_id_mapping = {
-        'arizona-cardinals': 'ARI', 'atlanta-falcons': 'ATL', 'baltimore-ravens': 'BAL',
-        'buffalo-bills': 'BUF', 'carolina-panthers': 'CAR', 'chicago-bears': 'CHI',
-        'cincinnati-bengals': 'CIN', 'cleveland-browns': 'CLE', 'dallas-cowboys': 'DAL',
-        'denver-broncos': 'DEN', 'detroit-lions': 'DET', 'green-bay-packers': 'GB',
-        'houston-texans': 'HOU', 'indianapolis-colts': 'IND', 'jacksonville-jaguars': 'JAX',
-        'kansas-city-chiefs': 'KC', 'las-vegas-raiders': 'LV', 'los-angeles-chargers': 'LAC',
-        'los-angeles-rams': 'LAR', 'miami-dolphins': 'MIA', 'minnesota-vikings': 'MIN',
-        'new-england-patriots': 'NE', 'new-orleans-saints': 'NO', 'new-york-giants': 'NYG',
-        'new-york-jets': 'NYJ', 'philadelphia-eagles': 'PHI', 'pittsburgh-steelers': 'PIT',
-        'san-francisco-49ers': 'SF', 'seattle-seahawks': 'SEA', 'tampa-bay-buccaneers': 'TB',
-        'tennessee-titans': 'TEN', 'washington-commanders': 'WAS'
-    }
-
-    opp_id_mapping = {
-        'San Francisco': 'SF', 'Jacksonville': 'JAX', 'Arizona': 'ARI', 'Indianapolis': 'IND',
-        'Houston': 'HOU', 'Seattle': 'SEA', 'N.Y. Giants': 'NYG', 'Carolina': 'CAR',
-        'Chicago': 'CHI', 'St. Louis': 'LAR', 'Tennessee': 'TEN', 'Minnesota': 'MIN',
-        'Detroit': 'DET', 'Green Bay': 'GB', 'New Orleans': 'NO', 'Miami': 'MIA',
-        'New England': 'NE', 'Dallas': 'DAL', 'Washington': 'WAS', 'Tampa Bay': 'TB',
-        'Philadelphia': 'PHI', 'N.Y. Jets': 'NYJ', 'Buffalo': 'BUF', 'Kansas City': 'KC',
-        'San Diego': 'LAC', 'Cleveland': 'CLE', 'Cincinnati': 'CIN', 'Denver': 'DEN',
-        'Pittsburgh': 'PIT', 'Oakland': 'LV', 'Atlanta': 'ATL', 'Baltimore': 'BAL',
-        'LA Rams': 'LAR', 'LA Chargers': 'LAC', 'Las Vegas': 'LV'
-    }
-    penalties['team_id'] = penalties['Team'].map(team_id_mapping)
-    penalties['opp_id'] = penalties['Opp'].map(opp_id_mapping)
+    penalties['team_id'] = recode(penalties['Team'], PENALTY_TEAM_IDS, keep_unmapped=False)
+    penalties['opp_id'] = recode(penalties['Opp'], PENALTY_OPPONENT_IDS, keep_unmapped=False)
     return penalties
 
 
+@profiled()
 def preprocess_data(penalties):
     """
     Preprocess the penalties dataframe.
@@ -78,12 +74,7 @@ def adjust_week(row):
     """
     Adjust the week number for the postseason and return if it is postseason.
     """
-    postseason_mapping = {
-        "Wildcard Weekend": 18,
-        "Divisional Playoffs": 19,
-        "Conference Championships": 20,
-        "Super Bowl": 21
-    }
+    postseason_mapping = POSTSEASON_WEEKS
     is_postseason = False
     if row['year'] <= 2020:
         if row['week'] in postseason_mapping:
@@ -120,9 +111,11 @@ def verify_and_adjust_game_id(row, valid_game_ids):
     return row['game_id'], row['home']
 
 
-def apply_adjustments(penalties, valid_game_ids):
+@profiled()
+def apply_adjustments_rowwise(penalties, valid_game_ids):
     """
-    Apply adjustments to the penalties dataframe.
+    Apply adjustments to the penalties dataframe one row at a time. Kept behind --legacy to check
+    apply_adjustments against.
     """
     week_postseason = penalties.apply(
         lambda row: adjust_week(row), axis=1, result_type='expand')
@@ -153,17 +146,80 @@ def compute_time_left_helper(row):
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
 
-def compute_time_left(penalties):
+@profiled()
+def compute_time_left_rowwise(penalties):
     """
-    Compute the time left in the game based on the quarter and time columns.
+    Compute the time left in the game one row at a time. Kept behind --legacy to check compute_time_left against.
     """
     penalties['time_left'] = penalties.apply(compute_time_left_helper, axis=1)
     return penalties
 
 
+@profiled()
+def apply_adjustments(penalties, valid_game_ids):
+    """
+    Apply adjustments to the penalties dataframe with column operations. Gives the same result as
+    apply_adjustments_rowwise.
+    """
+    # Postseason weeks are named; they shift by one from 2021 on with the 17 game season
+    postseason_week = penalties['week'].map(POSTSEASON_WEEKS)
+    is_postseason = postseason_week.notna() & penalties['year'].notna()
+    postseason_week = postseason_week.fillna(0).astype(int) + (penalties['year'] >= 2021)
+    penalties['week'] = np.where(is_postseason, postseason_week, penalties['week'])
+    penalties['postseason'] = np.where(is_postseason, 'Yes', 'No')
+
+    year_week = penalties['year'].astype(str) + '_' + penalties['week'].astype(str) + '_'
+    team_id = penalties['team_id'].astype(str)
+    opp_id = penalties['opp_id'].astype(str)
+    is_home = penalties['home'] == 'Yes'
+    game_id = pd.Series(np.where(is_home, year_week + opp_id + '_' + team_id, year_week + team_id + '_' + opp_id),
+                        index=penalties.index)
+    swapped_game_id = pd.Series(np.where(is_home, year_week + team_id + '_' + opp_id, year_week + opp_id + '_' + team_id),
+                                index=penalties.index)
+
+    # Superbowl home teams are not always correct, so swap the teams if only the swapped game exists
+    swap = ~game_id.isin(valid_game_ids) & swapped_game_id.isin(valid_game_ids)
+    penalties['game_id'] = game_id.where(~swap, swapped_game_id)
+    penalties['home'] = penalties['home'].where(~swap, np.where(is_home, 'No', 'Yes'))
+
+    return penalties
+
+
+def time_left_seconds(penalties):
+    """
+    Seconds left in the game from the quarter and time columns, negative in overtime.
+    """
+    time_parts = penalties['time'].str.split(':', expand=True).astype(int)
+    minute_left = (4 - penalties['quarter']) * 15 + time_parts[0] + (time_parts[1] / 60)
+    return np.trunc(minute_left * 60).astype(int)
+
+
+@profiled()
+def compute_time_left(penalties):
+    """
+    Compute the time left in the game based on the quarter and time columns, formatted as HH:MM:SS.
+    """
+    hours, remainder = np.divmod(time_left_seconds(penalties), 3600)
+    minutes, seconds = np.divmod(remainder, 60)
+    penalties['time_left'] = (hours.astype(str).str.zfill(2) + ':' + minutes.astype(str).str.zfill(2) + ':' +
+                              seconds.astype(str).str.zfill(2))
+    return penalties
+
+
+def raw_partitions(penalties, by='season'):
+    """
+    Partition labels of the raw penalties from the scraped season and week, with postseason weeks numbered
+    as in apply_adjustments.
+    """
+    week = pd.to_numeric(penalties['Week'], errors='coerce')
+    postseason_week = penalties['Week'].map(POSTSEASON_WEEKS) + (penalties['Year'] >= 2021)
+    return partition_labels(penalties['Year'], week.fillna(postseason_week), by)
+
+
+@profiled()
 def finalize_dataframe(penalties):
     """
-    Finalize the penalties dataframe and save it to a CSV file.
+    Select and order the columns of the penalties dataframe and sort it by date, game and time left.
     """
     column_order = [
         'game_id', 'team_id', 'opp_id', 'penalty', 'player', 'pos', 'date', 'year', 'week',
@@ -173,18 +229,47 @@ def finalize_dataframe(penalties):
     penalties = penalties[column_order]
     penalties = penalties.sort_values(
         by=['date', 'game_id', 'time_left'], ascending=[True, True, False])
-    penalties.to_csv('../../data/processed/penalties.csv', index=False)
+    return penalties
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Clean the penalties.csv file.')
+    parser.add_argument('--legacy', action='store_true',
+                        help='derive game ids, weeks and time left with the original row-wise functions')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only reprocess the partitions whose raw penalties or games changed since the last run')
+    parser.add_argument('--partition-by', choices=PARTITION_LEVELS, default='season')
+    args = parser.parse_args(argv)
 
-def main():
     penalties, game_details = load_data()
     valid_game_ids = get_valid_game_ids(game_details)
+
+    # Hash the inputs per partition and keep only the partitions that changed in incremental mode
+    labels = raw_partitions(penalties, args.partition_by)
+    settings = {'partition_by': args.partition_by, 'columns': list(penalties.columns)}
+    input_hashes = {
+        'penalties': hash_partitions(penalties, labels),
+        'game_detail': hash_partitions(game_details, game_id_partitions(game_details['game_id'], args.partition_by))
+    }
+    changed = select_partitions('penalties', settings, input_hashes, args.incremental)
+    if changed is not None:
+        if not changed:
+            return
+        penalties = penalties[labels.isin(changed)].copy()
+
     penalties = map_ids(penalties)
     penalties = preprocess_data(penalties)
-    penalties = apply_adjustments(penalties, valid_game_ids)
-    penalties = compute_time_left(penalties)
-    finalize_dataframe(penalties)
+    if args.legacy:
+        penalties = apply_adjustments_rowwise(penalties, valid_game_ids)
+        penalties = compute_time_left_rowwise(penalties)
+    else:
+        penalties = apply_adjustments(penalties, valid_game_ids)
+        penalties = compute_time_left(penalties)
+    penalties = finalize_dataframe(penalties)
+
+    save_partitioned_table(penalties, 'penalties', labels.loc[penalties.index], changed, settings, input_hashes)
 
 
 if __name__ == '__main__':
-    main()
+    with profile_run('clean_penalties'):
+        main()
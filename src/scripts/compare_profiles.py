@@ -0,0 +1,62 @@
+"""
+Profile Comparison
+
+Description: Compares the latest profiled run of a pipeline script (see utils/profiling.py) with the median of its
+previous runs, stage by stage, and flags the stages that got slower by more than --threshold percent.
+
+Usage: python compare_profiles.py clean_penalties [--runs 5] [--threshold 20]
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.profiling import load_history
+
+
+def compare_runs(history, runs=5, threshold=20):
+    """
+    Seconds, rows and peak RSS of every stage of the latest run next to the median of up to runs previous runs,
+    with the change in percent and whether it is a slowdown beyond threshold percent.
+    """
+    run_order = history['run'].drop_duplicates().tolist()
+    latest = history[history['run'] == run_order[-1]].set_index('stage')
+    previous = history[history['run'].isin(run_order[-runs - 1:-1])]
+    baseline = previous.groupby('stage')[['seconds', 'rows', 'peak_rss_mb']].median()
+
+    comparison = pd.DataFrame({
+        'seconds': latest['seconds'],
+        'baseline_seconds': baseline['seconds'].reindex(latest.index),
+        'rows': latest['rows'],
+        'baseline_rows': baseline['rows'].reindex(latest.index),
+        'peak_rss_mb': latest['peak_rss_mb'],
+    })
+    comparison['change_percent'] = 100 * (comparison['seconds'] / comparison['baseline_seconds'] - 1)
+    comparison['slower'] = comparison['change_percent'] > threshold
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the latest profiled run of a script with its previous runs.')
+    parser.add_argument('script', help='name of the profiled script, e.g. clean_penalties')
+    parser.add_argument('--runs', type=int, default=5, help='previous runs the baseline is the median of')
+    parser.add_argument('--threshold', type=float, default=20, help='slowdown in percent that is flagged')
+    args = parser.parse_args()
+
+    history = load_history(args.script)
+    runs = history['run'].nunique()
+    if runs < 2:
+        print(f'Only {runs} profiled run of {args.script}, nothing to compare with yet.')
+        return
+    comparison = compare_runs(history, args.runs, args.threshold)
+    print(f"Latest run {history['run'].iloc[-1]} against the median of up to {args.runs} previous runs:")
+    print(comparison.to_string(float_format=lambda value: f'{value:.3f}'))
+    slower = comparison.index[comparison['slower']].tolist()
+    if slower:
+        print(f"Slower by more than {args.threshold:g}%: {', '.join(slower)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""
+Synthetic Data Generator
+
+Description: Builds schema-faithful synthetic raw tables (penalties.csv, drives.csv, game_detail.csv and
+team_performances.csv) for any number of seasons, so the cleaning scripts can be run and benchmarked at scale. The
+schedule follows the league format of each season (17 regular season weeks, 18 from 2021, 4 bye teams per week in
+the middle of the season and 11 or 13 playoff games), the penalties use the team and opponent names, named playoff
+weeks and phases of nflpenalties.com, and every game gets about as many penalties (13) and drives (22) as the
+scraped games. Seasons start in 2009; beyond MAX_SEASONS (dates past 2262 do not fit pandas timestamps) every team
+plays --games-per-week games a week instead. The same seed always gives the same tables.
+
+Usage: python generate_synthetic_data.py --seasons 150 --data-dir /tmp/synthetic/data
+"""
+import argparse
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from clean_penalties import POSTSEASON_WEEKS
+from utils.normalization import PENALTY_OPPONENT_IDS, PENALTY_TEAM_IDS
+from utils.storage import DATA_DIR
+
+FIRST_SEASON = 2009
+MAX_SEASONS = 250
+# Seasons of the scraped history (2009 to 2023), the 1x scale of benchmark_pipeline.py
+HISTORY_SEASONS = 15
+PENALTIES_PER_TEAM_GAME = 6.5
+DRIVES_PER_GAME = 22
+
+TEAM_NAMES = {team_id: name for name, team_id in PENALTY_TEAM_IDS.items()}
+# The last city listed for a team is its current one, e.g. LA Rams rather than St. Louis
+OPPONENT_NAMES = {team_id: name for name, team_id in PENALTY_OPPONENT_IDS.items()}
+TEAMS = np.array(sorted(TEAM_NAMES))
+
+# (phase, penalty as listed on nflpenalties.com, yards, relative frequency)
+PENALTY_TYPES = [
+    ('Off', 'Offensive Holding', 10, 20), ('Off', 'False Start', 5, 18), ('Off', 'Delay of Game', 5, 4),
+    ('Off', 'Offensive Pass Interference', 10, 3), ('Off', 'Illegal Formation', 5, 3),
+    ('Off', 'Intentional Grounding', 10, 1), ('Off', 'Illegal Shift', 5, 1), ('Off', 'Illegal Block Above the Waist', 10, 1),
+    ('Def', 'Defensive Pass Interference', 15, 8), ('Def', 'Defensive Holding', 5, 7), ('Def', 'Defensive Offside', 5, 6),
+    ('Def', 'Roughing the Passer', 15, 3), ('Def', 'Unnecessary Roughness', 15, 4), ('Def', 'Neutral Zone Infraction', 5, 3),
+    ('Def', 'Face Mask (15 Yards)', 15, 3), ('Def', 'Illegal Use of Hands', 5, 2), ('Def', 'Encroachment', 5, 1),
+    ('Def', 'Unsportsmanlike Conduct', 15, 1),
+    ('ST', 'Offensive Holding', 10, 4), ('ST', 'Illegal Block Above the Waist', 10, 4),
+    ('ST', 'Running Into the Kicker', 5, 1), ('ST', 'Fair Catch Interference', 15, 1),
+]
+POSITIONS = {'Off': ['T', 'G', 'C', 'WR', 'TE', 'QB', 'RB'], 'Def': ['CB', 'S', 'LB', 'DE', 'DT'],
+             'ST': ['WR', 'LB', 'CB', 'S', 'TE']}
+# (drive result, relative frequency)
+DRIVE_RESULTS = [('Punt', 37), ('Touchdown', 22), ('Field Goal', 14), ('Interception', 6), ('Fumble', 4),
+                 ('Downs', 5), ('Missed FG', 2), ('Safety', 1)]
+FIRST_NAMES = ['Mike', 'John', 'Bill', 'Sean', 'Andy', 'Kyle', 'Matt', 'Dan', 'Ron', 'Pete', 'Tom', 'Jim']
+LAST_NAMES = ['Smith', 'Johnson', 'Brown', 'Miller', 'Davis', 'Wilson', 'Moore', 'Taylor', 'Clark', 'Allen',
+              'Young', 'King', 'Wright', 'Hill', 'Green', 'Baker']
+OFFICIAL_COLUMNS = ['Referee', 'Umpire', 'Head Linesman', 'Line Judge', 'Back Judge', 'Side Judge', 'Field Judge',
+                    'Down Judge']
+
+
+def names(rng, size):
+    """Random 'First Last' names."""
+    return pd.Series(rng.choice(FIRST_NAMES, size)) + ' ' + pd.Series(rng.choice(LAST_NAMES, size))
+
+
+def pairs(rng, teams, games_per_week):
+    """
+    (away, home) pairs of one week: the teams are shuffled and paired games_per_week times, so every team plays
+    games_per_week games.
+    """
+    rounds = [rng.permutation(teams).reshape(-1, 2) for _ in range(games_per_week)]
+    return np.concatenate(rounds)
+
+
+def schedule(seasons, games_per_week=1, seed=0):
+    """
+    Games of every season: season, week, away and home team, date and whether it is a playoff game. A game between
+    the same away and home team twice in one week (possible with games_per_week > 1) is only kept once.
+    """
+    rng = np.random.default_rng(seed)
+    games = []
+    for season in range(FIRST_SEASON, FIRST_SEASON + seasons):
+        regular_weeks = 17 if season <= 2020 else 18
+        wildcard_games = 4 if season <= 2019 else 6
+        # The season opens on the Thursday after Labor Day
+        opening_day = pd.Timestamp(f'{season}-09-05')
+        opening_day += pd.Timedelta(days=(3 - opening_day.weekday()) % 7)
+        for week in range(1, regular_weeks + 5):
+            if week <= regular_weeks:
+                byes = 4 if 4 <= week <= 13 else 0
+                matchups = pairs(rng, rng.permutation(TEAMS)[byes:], games_per_week)
+            else:
+                playoff_games = [wildcard_games, 4, 2, 1][week - regular_weeks - 1]
+                matchups = rng.permutation(TEAMS)[:2 * playoff_games].reshape(-1, 2)
+            # Thursday, Sunday or Monday of the week
+            days = rng.choice([0, 3, 3, 3, 4], size=len(matchups))
+            games.append(pd.DataFrame({
+                'season': season, 'week': week, 'away_team': matchups[:, 0], 'home_team': matchups[:, 1],
+                'date': opening_day + pd.to_timedelta(7 * (week - 1) + days, unit='D'),
+                'postseason': week > regular_weeks,
+            }))
+    games = pd.concat(games, ignore_index=True).drop_duplicates(['season', 'week', 'away_team', 'home_team'])
+    games.insert(0, 'game_id', games['season'].astype(str) + '_' + games['week'].astype(str) + '_' +
+                 games['away_team'] + '_' + games['home_team'])
+    return games.reset_index(drop=True)
+
+
+def split_stat(*columns):
+    """Columns of numbers joined as 'a-b-c', the format of the combined boxscore statistics."""
+    joined = columns[0].astype(str)
+    for column in columns[1:]:
+        joined = joined + '-' + column.astype(str)
+    return joined
+
+
+def clock(seconds):
+    """Seconds as 'M:SS'."""
+    seconds = pd.Series(seconds)
+    return (seconds // 60).astype(str) + ':' + (seconds % 60).astype(str).str.zfill(2)
+
+
+def synthetic_penalties(games, rng):
+    """
+    Raw penalties of every game in the columns of nflpenalties.com team logs, one team at a time.
+    """
+    team_games = team_game_frame(games)
+    counts = rng.poisson(PENALTIES_PER_TEAM_GAME, len(team_games))
+    rows = team_games.loc[team_games.index.repeat(counts)].reset_index(drop=True)
+    n = len(rows)
+
+    types = pd.DataFrame(PENALTY_TYPES, columns=['phase', 'penalty', 'yards', 'weight'])
+    kinds = types.iloc[rng.choice(len(types), n, p=types['weight'] / types['weight'].sum())].reset_index(drop=True)
+    position = np.empty(n, dtype=object)
+    for phase, options in POSITIONS.items():
+        in_phase = (kinds['phase'] == phase).to_numpy()
+        position[in_phase] = rng.choice(options, in_phase.sum())
+
+    # Playoff weeks are named and the Super Bowl, played on a neutral field, sometimes lists the other team as home
+    regular_weeks = np.where(rows['season'] <= 2020, 17, 18)
+    week_names = {week: name for name, week in POSTSEASON_WEEKS.items()}
+    playoff_round = (rows['week'] - regular_weeks + 17).map(week_names)
+    week = playoff_round.where(rows['postseason'], rows['week'].astype(str))
+    super_bowl = rows['week'] - regular_weeks == 4
+    home = rows['home'] ^ (super_bowl & (rng.random(n) < 0.5))
+
+    return pd.DataFrame({
+        'Date': rows['date'].dt.strftime('%Y-%m-%d'),
+        'Opp': rows['opp_team_id'].map(OPPONENT_NAMES),
+        'Week': week,
+        'Player': names(rng, n),
+        'Pos': position,
+        'Quarter': rng.choice([1, 2, 3, 4, 5], n, p=[0.24, 0.25, 0.24, 0.25, 0.02]),
+        'Time': clock(rng.integers(0, 900, n)),
+        'Down': rng.choice([1, 2, 3, 4], n, p=[0.45, 0.3, 0.2, 0.05]),
+        'Dist': rng.integers(1, 21, n),
+        'Ref Crew': rows['referee'],
+        'Declined': np.where(rng.random(n) < 0.1, 'Yes', 'No'),
+        'Offsetting': np.where(rng.random(n) < 0.03, 'Yes', 'No'),
+        'Yardage': kinds['yards'],
+        'Home': np.where(home, 'Yes', 'No'),
+        'Phase': kinds['phase'],
+        'Penalty': kinds['penalty'],
+        'Team': rows['team_id'].map(TEAM_NAMES),
+        'Year': rows['season'],
+    })
+
+
+def team_game_frame(games):
+    """
+    Two rows per game, one for each team, with its opponent and whether it played at home.
+    """
+    away = games.assign(team_id=games['away_team'], opp_team_id=games['home_team'], home=False)
+    home = games.assign(team_id=games['home_team'], opp_team_id=games['away_team'], home=True)
+    team_games = pd.concat([home, away]).sort_index(kind='stable')
+    return team_games.reset_index(drop=True)
+
+
+def synthetic_drives(games, rng):
+    """
+    Raw drives of every game: the teams alternate possessions, which are spread over the four quarters and numbered
+    from 1 for each team, as on the site. The last drive of a game sometimes ends the game without a listed quarter.
+    """
+    counts = np.maximum(rng.poisson(DRIVES_PER_GAME, len(games)), 8)
+    rows = games.loc[games.index.repeat(counts)].reset_index(drop=True)
+    n = len(rows)
+    # Position of each drive in its game, which sets the team and the quarter
+    order = rows.groupby('game_id', sort=False).cumcount().to_numpy() + 1
+    total = np.repeat(counts, counts)
+    first_team_home = np.repeat(rng.random(len(games)) < 0.5, counts)
+    on_home_team = (order % 2 == 1) == first_team_home
+    team_id = np.where(on_home_team, rows['home_team'], rows['away_team'])
+    opp_id = np.where(on_home_team, rows['away_team'], rows['home_team'])
+    num = pd.Series(team_id).groupby([rows['game_id'].to_numpy(), team_id], sort=False).cumcount().to_numpy() + 1
+
+    quarter = (1 + 4 * (order - 1) // total).astype(float)
+    # Drives of a quarter start at evenly spaced times with some noise, counting down from 15:00
+    position_in_quarter = (order - 1) - np.floor((quarter - 1) * total / 4)
+    per_quarter = np.maximum(np.ceil(total / 4), 1)
+    seconds = np.clip(900 - (position_in_quarter + rng.random(n)) * 900 / per_quarter, 0, 899).astype(int)
+
+    results = pd.DataFrame(DRIVE_RESULTS, columns=['result', 'weight'])
+    result = results['result'].to_numpy()[rng.choice(len(results), n, p=results['weight'] / results['weight'].sum())]
+    last = order == total
+    ends_game = last & (rng.random(n) < 0.3)
+    result = np.where(ends_game, 'End of Game', result)
+    quarter = np.where(ends_game & (rng.random(n) < 0.5), np.nan, quarter)
+
+    yard = rng.integers(1, 51, n)
+    own_field = rng.random(n) < 0.7
+    plays = rng.integers(1, 15, n)
+    return pd.DataFrame({
+        'game_id': rows['game_id'],
+        'team_id': team_id,
+        'num': num,
+        'quarter': pd.array(quarter, dtype='Int64'),
+        'time': clock(seconds),
+        'los': pd.Series(np.where(own_field, team_id, opp_id)) + ' ' + pd.Series(yard).astype(str),
+        'plays': plays,
+        'length': clock(plays * rng.integers(15, 40, n)),
+        'net_yds': rng.integers(-10, 90, n),
+        'result': result,
+    })
+
+
+def synthetic_team_performances(games, penalties, rng):
+    """
+    Boxscore team statistics of both teams of every game, with the penalty count and yards of the generated
+    penalties.
+    """
+    team_games = team_game_frame(games)
+    n = len(team_games)
+    quarters = rng.choice([0, 3, 7, 10, 14], (n, 4), p=[0.3, 0.2, 0.3, 0.12, 0.08])
+    overtime = np.where(rng.random(n) < 0.06, rng.choice([0, 3, 6], n), np.nan)
+
+    accepted = penalties[(penalties['Declined'] == 'No') & (penalties['Offsetting'] == 'No')]
+    keys = accepted['Date'] + accepted['Team'].map(PENALTY_TEAM_IDS)
+    penalty_stats = accepted.groupby(keys)['Yardage'].agg(['size', 'sum'])
+    team_keys = team_games['date'].dt.strftime('%Y-%m-%d') + team_games['team_id']
+    penalty_count = penalty_stats['size'].reindex(team_keys).fillna(0).astype(int).to_numpy()
+    penalty_yards = penalty_stats['sum'].reindex(team_keys).fillna(0).astype(int).to_numpy()
+
+    rush = [rng.integers(15, 40, n), rng.integers(20, 200, n), rng.integers(0, 3, n)]
+    attempts = rng.integers(20, 50, n)
+    passing = [(attempts * rng.uniform(0.5, 0.75, n)).astype(int), attempts, rng.integers(100, 400, n),
+               rng.integers(0, 4, n), rng.integers(0, 3, n)]
+    sacks = [rng.integers(0, 6, n), rng.integers(0, 40, n)]
+    fumbles = rng.integers(0, 4, n)
+    fumbles_lost = (fumbles * rng.random(n)).astype(int)
+    third_attempts = rng.integers(8, 18, n)
+    fourth_attempts = rng.integers(0, 4, n)
+    possession = rng.integers(1500, 2100, n)
+    # The two teams of a game share the 60 minutes of regulation
+    possession[1::2] = 3600 - possession[0::2]
+
+    net_pass_yards = passing[2] - sacks[1]
+    return pd.DataFrame({
+        'game_id': team_games['game_id'],
+        'team_id': team_games['team_id'],
+        'pts': quarters.sum(axis=1) + np.nan_to_num(overtime).astype(int),
+        'q1pts': quarters[:, 0], 'q2pts': quarters[:, 1], 'q3pts': quarters[:, 2], 'q4pts': quarters[:, 3],
+        'otpts': overtime,
+        'first_downs': rng.integers(10, 30, n),
+        'rush-yds-tds': split_stat(*map(pd.Series, rush)),
+        'cmp-att-yd-td-int': split_stat(*map(pd.Series, passing)),
+        'sacked-yards': split_stat(*map(pd.Series, sacks)),
+        'net_pass_yards': net_pass_yards,
+        'total_yards': net_pass_yards + rush[1],
+        'fumbles-lost': split_stat(pd.Series(fumbles), pd.Series(fumbles_lost)),
+        'turnovers': passing[4] + fumbles_lost,
+        'penalties-yards': split_stat(pd.Series(penalty_count), pd.Series(penalty_yards)),
+        'third_down_conv.': split_stat(pd.Series((third_attempts * rng.uniform(0.2, 0.6, n)).astype(int)),
+                                       pd.Series(third_attempts)),
+        'fourth_down_conv.': split_stat(pd.Series((fourth_attempts * rng.random(n)).astype(int)),
+                                        pd.Series(fourth_attempts)),
+        'time_of_possession': clock(possession),
+    })
+
+
+def synthetic_game_detail(games, team_performances, rng):
+    """
+    Game details in the columns of the scraped game_detail table, with the points of the team performances.
+    """
+    n = len(games)
+    points = team_performances.set_index(['game_id', 'team_id'])['pts']
+    home_points = points.reindex(pd.MultiIndex.from_arrays([games['game_id'], games['home_team']])).to_numpy()
+    away_points = points.reindex(pd.MultiIndex.from_arrays([games['game_id'], games['away_team']])).to_numpy()
+    duration = clock(rng.integers(170, 230, n))
+    detail = pd.DataFrame({
+        'game_id': games['game_id'],
+        'home_team': games['home_team'],
+        'away_team': games['away_team'],
+        'home_points': home_points,
+        'away_points': away_points,
+        'home_coach': games['home_coach'],
+        'away_coach': games['away_coach'],
+        'home_record': split_stat(pd.Series(rng.integers(0, 17, n)), pd.Series(rng.integers(0, 17, n))),
+        'away_record': split_stat(pd.Series(rng.integers(0, 17, n)), pd.Series(rng.integers(0, 17, n))),
+        'week': games['week'],
+        'weekday': games['date'].dt.day_name(),
+        'season': games['season'],
+        'date': games['date'].dt.strftime('%Y-%m-%d'),
+        'start_time': rng.choice(['13:02:00', '16:05:00', '16:25:00', '20:20:00', '20:15:00'], n),
+        'stadium': games['home_team'].map(OPPONENT_NAMES) + ' Stadium',
+        'attendance': pd.Series(rng.integers(55000, 80000, n)).map('{:,}'.format),
+        'time_of_game': duration,
+        'Won Toss': games['away_team'].map(OPPONENT_NAMES),
+        'Roof': rng.choice(['outdoors', 'dome', 'retractable roof (closed)'], n, p=[0.7, 0.2, 0.1]),
+        'Surface': rng.choice(['grass', 'fieldturf', 'sportturf'], n),
+        'Duration': duration,
+        'Weather': pd.Series(rng.integers(20, 90, n)).astype(str) + ' degrees, wind ' +
+                   pd.Series(rng.integers(0, 20, n)).astype(str) + ' mph',
+        'Vegas Line': games['home_team'].map(OPPONENT_NAMES) + ' -' + pd.Series(rng.integers(1, 14, n)).astype(str),
+        'Over/Under': pd.Series(rng.integers(35, 55, n)).astype(str) + '.5 (over)',
+        'Won OT Toss': np.nan,
+        'Referee': games['referee'],
+    })
+    for column in OFFICIAL_COLUMNS[1:]:
+        detail[column] = names(rng, n)
+    return detail
+
+
+def generate(seasons, games_per_week=1, seed=0):
+    """
+    The raw game_detail, team_performances, drives and penalties tables of seasons synthetic seasons.
+    """
+    rng = np.random.default_rng(seed)
+    games = schedule(seasons, games_per_week, seed)
+
+    # Every team has a head coach for a few seasons at a time, and every season has 17 referee crews
+    coach_terms = dict(zip(TEAMS, rng.integers(2, 8, len(TEAMS))))
+    coaches = {(team, season): f'{FIRST_NAMES[(season - FIRST_SEASON) // coach_terms[team] % len(FIRST_NAMES)]} '
+                               f'{LAST_NAMES[i % len(LAST_NAMES)]}'
+               for i, team in enumerate(TEAMS) for season in games['season'].unique()}
+    games['home_coach'] = [coaches[key] for key in zip(games['home_team'], games['season'])]
+    games['away_coach'] = [coaches[key] for key in zip(games['away_team'], games['season'])]
+    crews = names(rng, 17).to_numpy()
+    games['referee'] = crews[rng.integers(0, len(crews), len(games))]
+
+    penalties = synthetic_penalties(games, rng)
+    drives = synthetic_drives(games, rng)
+    team_performances = synthetic_team_performances(games, penalties, rng)
+    game_detail = synthetic_game_detail(games, team_performances, rng)
+    return {'game_detail': game_detail, 'team_performances': team_performances, 'drives': drives,
+            'penalties': penalties}
+
+
+def write_tables(tables, data_dir):
+    """
+    Write the raw tables as CSV to <data_dir>/raw and copy the teams table to <data_dir>/processed, which gives a
+    data directory the scripts can run on with NFL_PENALTY_DATA_DIR=<data_dir>.
+    """
+    os.makedirs(os.path.join(data_dir, 'raw'), exist_ok=True)
+    os.makedirs(os.path.join(data_dir, 'processed'), exist_ok=True)
+    for name, df in tables.items():
+        df.to_csv(os.path.join(data_dir, 'raw', f'{name}.csv'), index=False)
+    shutil.copy(os.path.join(DATA_DIR, 'processed', 'teams.csv'), os.path.join(data_dir, 'processed', 'teams.csv'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic raw tables for any number of seasons.')
+    parser.add_argument('--seasons', type=int, default=HISTORY_SEASONS)
+    parser.add_argument('--games-per-week', type=int, default=1, help='games every team plays in a week')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', required=True, help='data directory to write raw/ and processed/ to')
+    args = parser.parse_args()
+    if args.seasons > MAX_SEASONS:
+        parser.error(f'at most {MAX_SEASONS} seasons, use --games-per-week for more games')
+    if os.path.abspath(args.data_dir) == os.path.abspath(DATA_DIR):
+        parser.error('refusing to overwrite the project data directory')
+
+    tables = generate(args.seasons, args.games_per_week, args.seed)
+    write_tables(tables, args.data_dir)
+    print(', '.join(f'{len(df)} {name} rows' for name, df in tables.items()) + f' written to {args.data_dir}/raw')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,64 +5,36 @@ Date: 2023-12-29
 
 Description: Checks for which games are missing from the game_detail.csv file. Then outputs to missing.csv.
 Essentially prepares the games.csv and game_detail.csv files for the scrape_games.py script.
+
+The nflverse games.csv and standings.csv are refreshed with conditional requests (see utils/downloads.py), so when
+they have not changed nothing is parsed or rewritten. --mirror reads them from a local directory for offline runs.
 """
-import io
+import argparse
+import os
+import sys
 import pandas as pd
 from datetime import datetime
 import requests
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.downloads import read_meta, refresh_download, update_meta
+from utils.fetching import pooled_session
+from utils.normalization import normalize_games, parse_start_times
+from utils.profiling import profile_run, profiled
+from utils.storage import read_table, table_path, write_table
+
 
-def load_data(games_path, game_detail_path):
+@profiled()
+def load_game_detail():
     """
-    Load data from CSV files.
+    Load the game_detail table.
     """
-    games_df = pd.read_csv(games_path)
-    game_detail_df = pd.read_csv(game_detail_path)
+    game_detail_df = read_table('game_detail', 'raw')
 
     # Remove duplicate rows from game_detail_df
     game_detail_df = game_detail_df.drop_duplicates()
 
-    return games_df, game_detail_df
-
-
-def update_game_ids(games_df):
-    """
-    Update game_id to remove leading zeros in 01-09 from the week part.
-    """
-    # Splitting the game_id into parts
-    split_game_id = games_df['game_id'].str.split('_', expand=True)
-
-    # Removing leading zeros from the week part (second part of game_id)
-    split_game_id[1] = split_game_id[1].str.lstrip('0')
-
-    # Reconstructing the game_id
-    games_df['game_id'] = split_game_id[0] + '_' + split_game_id[1] + \
-        '_' + split_game_id[2] + '_' + split_game_id[3]
-
-    return games_df
-
-
-def update_team_codes(games_df):
-    """
-    Replace team codes in game_id, away_team, and home_team fields.
-    """
-    team_code_changes = {'LA': 'LAR', 'SD': 'LAC', 'OAK': 'LV', 'STL': 'LAR'}
-
-    # Splitting the game_id into parts
-    split_game_id = games_df['game_id'].str.split('_', expand=True)
-
-    # Apply the team code changes to the split game_id parts, away_team, and home_team
-    for col in [2, 3]:  # Columns 2 and 3 of split_game_id correspond to away_team and home_team in game_id
-        split_game_id[col] = split_game_id[col].replace(team_code_changes)
-
-    games_df['away_team'] = games_df['away_team'].replace(team_code_changes)
-    games_df['home_team'] = games_df['home_team'].replace(team_code_changes)
-
-    # Reconstructing the game_id with updated team codes
-    games_df['game_id'] = split_game_id[0] + '_' + split_game_id[1] + \
-        '_' + split_game_id[2] + '_' + split_game_id[3]
-
-    return games_df
+    return game_detail_df
 
 
 def filter_games(games_df):
@@ -75,6 +47,7 @@ def filter_games(games_df):
     return games_df[(games_df['gameday'] >= start_date) & (games_df['gameday'] <= end_date)]
 
 
+@profiled()
 def find_missing_game_ids(filtered_games_df, game_detail_df):
     """
     Find game_ids present in filtered_games_df but not in game_detail_df.
@@ -93,23 +66,6 @@ def prepare_missing_data(filtered_games_df, missing_game_ids):
     return missing_data
 
 
-def parse_start_time(time_str):
-    """
-    Parse the start time string to a time object.
-    Default to 4 PM if the format is incorrect.
-    """
-    try:
-        # Try parsing as 24-hour format
-        return pd.to_datetime(time_str, format='%H:%M:%S').time()
-    except ValueError:
-        try:
-            # Try parsing as 12-hour format
-            return pd.to_datetime(time_str, format='%I:%M%p').time()
-        except ValueError:
-            # Default to 4 PM
-            return pd.to_datetime('16:00:00', format='%H:%M:%S').time()
-
-
 def sort_game_detail(game_detail_df):
     """
     Sort game_detail_df by date and start_time.
@@ -117,60 +73,91 @@ def sort_game_detail(game_detail_df):
     # Convert 'date' to datetime for accurate sorting
     game_detail_df['date'] = pd.to_datetime(game_detail_df['date'])
 
-    # Apply the parse_start_time function to each start_time entry
-    game_detail_df['start_time'] = game_detail_df['start_time'].apply(
-        parse_start_time)
+    # Parse the start times, defaulting to 4 PM if the format is not recognized
+    game_detail_df['start_time'] = parse_start_times(game_detail_df['start_time'])
 
     # Sort by date then start_time
     game_detail_df = game_detail_df.sort_values(by=['date', 'start_time'])
     return game_detail_df
 
 
-def main():
+def next_gameday(games_df):
+    """
+    First gameday after today in the unfiltered games, when filter_games would start including more games.
+    """
+    gamedays = pd.to_datetime(games_df['gameday'])
+    upcoming = gamedays[gamedays > pd.Timestamp(datetime.now())]
+    return upcoming.min().isoformat() if not upcoming.empty else None
+
+
+@profiled()
+def refresh_games(games_changed, games_path):
+    """
+    Returns the filtered games with updated game_ids and team codes. The download is only parsed again if it
+    changed or if a game has been played since the last run, otherwise the stored games table is used as is.
+    """
+    due = read_meta(games_path).get('next_gameday')
+    stored = os.path.exists(table_path('games', 'raw'))
+    if not games_changed and stored and (due is None or pd.Timestamp(due) > pd.Timestamp(datetime.now())):
+        print('games.csv is unchanged, skipping the parse and rewrite.')
+        return read_table('games', 'raw')
+
+    games_df = pd.read_csv(games_path)
+    games_df = normalize_games(games_df)
+    update_meta(games_path, next_gameday=next_gameday(games_df))
+    filtered_games_df = filter_games(games_df)
+
+    # Overwrite the filtered and updated games data to the original games table
+    write_table(filtered_games_df, 'games', 'raw')
+    return filtered_games_df
+
+
+def main(argv=None):
     """
     Main function to process data and output missing game data.
     """
-    games_url = 'https://raw.githubusercontent.com/nflverse/nfldata/master/data/games.csv'
+    parser = argparse.ArgumentParser(description='Refresh the nflverse tables and list the games missing from game_detail.')
+    parser.add_argument('--mirror', help='copy games.csv and standings.csv from this directory instead of downloading')
+    parser.add_argument('--base-url', help='download from this host instead, e.g. a local fake_server.py')
+    args = parser.parse_args(argv)
 
-    response = requests.get(games_url)
-    if response.status_code == 200:
-        games_df = pd.read_csv(io.BytesIO(response.content))
-        games_df.to_csv('../../data/raw/games.csv', index=False)
-    else:
-        print(f"Failed to download {games_url}")
-        return
-    
+    games_url = 'https://raw.githubusercontent.com/nflverse/nfldata/master/data/games.csv'
     standings_url = 'https://raw.githubusercontent.com/nflverse/nfldata/master/data/standings.csv'
 
-    response = requests.get(standings_url)
-    if response.status_code == 200:
-        games_df = pd.read_csv(io.BytesIO(response.content))
-        games_df.to_csv('../../data/raw/standings.csv', index=False)
-    else:
-        print(f"Failed to download {standings_url}")
-        return
-
-    games_path = '../../data/raw/games.csv'
-    game_detail_path = '../../data/raw/game_detail.csv'
-    output_path = '../../data/raw/missing.csv'
-
-    games_df, game_detail_df = load_data(games_path, game_detail_path)
-    games_df = update_game_ids(games_df)
-    games_df = update_team_codes(games_df)
-    filtered_games_df = filter_games(games_df)
+    session = None if args.mirror else pooled_session(pool_size=1)
+    downloads = {}
+    for url in [games_url, standings_url]:
+        try:
+            downloads[url] = refresh_download(url, session, args.mirror, args.base_url)
+        except (requests.RequestException, OSError) as e:
+            print(f"Failed to download {url}: {e}")
+            return 1
+
+    standings_path, standings_changed = downloads[standings_url]
+    if standings_changed or not os.path.exists(table_path('standings', 'raw')):
+        write_table(pd.read_csv(standings_path), 'standings', 'raw')
+
+    output_path = table_path('missing', 'raw')
+
+    games_path, games_changed = downloads[games_url]
+    filtered_games_df = refresh_games(games_changed, games_path)
+    game_detail_df = load_game_detail()
     missing_game_ids = find_missing_game_ids(filtered_games_df, game_detail_df)
     missing_data = prepare_missing_data(filtered_games_df, missing_game_ids)
     sorted_game_detail = sort_game_detail(game_detail_df)
-    missing_data.to_csv(output_path, index=False)
-
-    # Overwrite the sorted game_detail data to the original CSV file
-    sorted_game_detail.to_csv(game_detail_path, index=False)
+    write_table(missing_data, 'missing', 'raw')
 
-    # Overwrite the filtered and updated games data to the original games CSV file
-    filtered_games_df.to_csv(games_path, index=False)
+    # Overwrite the sorted game_detail data to the original table, unless it is already sorted
+    sorted_csv = sorted_game_detail.to_csv(index=False)
+    with open(table_path('game_detail', 'raw'), newline='') as f:
+        if f.read() != sorted_csv:
+            write_table(sorted_game_detail, 'game_detail', 'raw')
 
     print(f'Missing script complete. Missing games output to {output_path}')
 
 
 if __name__ == "__main__":
-    main()
+    with profile_run('missing'):
+        status = main()
+        if status:
+            sys.exit(status)
@@ -6,37 +6,41 @@ Description: This script reads in the penalties.csv file and extracts the penalt
 filters out entries where penalties are either declined or offsetting, calculates the most common yardage or spot for each penalty, 
 and writes the results to penalty_list.csv.
 """
-import pandas as pd
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.analytics_db import run_report
+from utils.profiling import profile_run
+from utils.storage import OUTPUTS_DIR
 
 def extract_penalty_data():
-    input_file = '../../data/processed/penalties.csv'
-    output_file = '../../outputs/penalty_list.csv'
+    """
+    Write penalty_list.csv. Returns False if an error occurred, so a failed run is not taken for a finished one.
+    """
+    output_file = os.path.join(OUTPUTS_DIR, 'penalty_list.csv')
     
     try:
-        # Read the CSV file
-        data = pd.read_csv(input_file)
-
-        # Calculate the total occurrences of each penalty
-        total_occurrences = data['penalty'].value_counts().rename('num_occ')
-
-        # Filter out entries where penalties are either declined or offsetting
-        clean_data = data[(data['declined'] != 'Yes') & (data['offsetting'] != 'Yes')]
-
-        # Calculate the most common yardage or spot for each penalty
-        penalty_yards = clean_data.groupby('penalty').agg(
-            yards=('yardage', lambda x: 'spot' if x.std() > 10 else x.mode()[0] if len(x.mode()) > 0 else 'spot')
-        )
-
-        # Merge the total occurrences with the yardage data
-        penalty_summary = penalty_yards.join(total_occurrences, how='left').reset_index()
+        # Total occurrences of each penalty and its most common yardage or spot among accepted penalties,
+        # computed by the penalty_list report of the analytics database
+        penalty_summary = run_report('penalty_list')
 
         # Write to CSV
+        os.makedirs(OUTPUTS_DIR, exist_ok=True)
         penalty_summary.to_csv(output_file, index=False)
         
         print(f'Penalty data has been written to {output_file}.')
+        return True
     except Exception as e:
         print(f'An error occurred: {e}')
+        return False
+
+def main(argv=None):
+    return 0 if extract_penalty_data() else 1
 
 # Call the function
 if __name__ == "__main__":
-    extract_penalty_data()
+    with profile_run('output_penalties'):
+        status = main()
+        if status:
+            sys.exit(status)
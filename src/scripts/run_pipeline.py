@@ -0,0 +1,95 @@
+"""
+Pipeline Runner
+
+Description: Runs the whole data pipeline (missing.py, scrape_games.py, scrape_penalties.py, clean_penalties.py,
+clean_drives.py, clean_games.py and output_penalties.py) in one process, from any working directory. The tables
+every script reads and writes are declared in STAGES, which gives the dependency graph:
+
+    missing -> scrape_games, scrape_penalties -> clean_penalties -> clean_drives, clean_games -> output_penalties
+
+Stages whose inputs, outputs and arguments have not changed since their last run are skipped, make-style, and
+independent stages (scrape_games and scrape_penalties, clean_drives and clean_games) run in parallel with --jobs
+threads. game_detail.csv and the processed penalties are read by several stages and only parsed once. The three
+scraping stages fetch from the web and always run unless --offline is given; they skip unchanged pages themselves.
+
+Usage: python run_pipeline.py [stages ...] [--offline] [--force] [--jobs 2]
+       [--args "scrape_penalties=--backend http --rate 20"]
+"""
+import argparse
+import os
+import shlex
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import clean_drives
+import clean_games
+import clean_penalties
+import missing
+import output_penalties
+import scrape_games
+import scrape_penalties
+from utils.analytics_db import DB_PATH, DB_TABLES
+from utils.pipeline import Pipeline, PipelineStage
+from utils.profiling import profile_run
+from utils.storage import OUTPUTS_DIR
+
+STAGES = [
+    PipelineStage('missing', missing.main, external=True,
+                  outputs=[('games', 'raw'), ('standings', 'raw'), ('missing', 'raw'), ('game_detail', 'raw')]),
+    PipelineStage('scrape_games', scrape_games.main, external=True, inputs=[('missing', 'raw')],
+                  outputs=[('game_detail', 'raw'), ('team_performances', 'raw'), ('drives', 'raw')]),
+    PipelineStage('scrape_penalties', scrape_penalties.main, external=True,
+                  inputs=[('games', 'raw'), ('teams', 'processed')], outputs=[('penalties', 'raw')]),
+    PipelineStage('clean_penalties', clean_penalties.main, inputs=[('penalties', 'raw'), ('game_detail', 'raw')],
+                  outputs=[('penalties', 'processed')]),
+    PipelineStage('clean_drives', clean_drives.main,
+                  inputs=[('drives', 'raw'), ('penalties', 'processed'), ('game_detail', 'raw')],
+                  outputs=[('drives', 'processed'), ('drive_penalty_counts', 'processed')]),
+    PipelineStage('clean_games', clean_games.main,
+                  inputs=[('team_performances', 'raw'), ('penalties', 'processed'), ('game_detail', 'raw')],
+                  outputs=[('team_performances', 'processed'), ('team_penalty_counts', 'processed')]),
+    PipelineStage('output_penalties', output_penalties.main,
+                  inputs=[spec['source'] for spec in DB_TABLES.values()],
+                  outputs=[DB_PATH, os.path.join(OUTPUTS_DIR, 'penalty_list.csv')]),
+]
+
+
+def stage_arguments(values, parser):
+    """
+    Arguments of every stage from --args values of the form 'stage=arguments'.
+    """
+    argvs = {}
+    for value in values:
+        name, _, arguments = value.partition('=')
+        if name not in [stage.name for stage in STAGES]:
+            parser.error(f'--args for unknown stage {name}')
+        argvs[name] = argvs.get(name, []) + shlex.split(arguments)
+    return argvs
+
+
+def main():
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description='Run the data pipeline, skipping stages whose inputs are unchanged.')
+    parser.add_argument('stages', nargs='*', help=f"stages to run, all by default: {', '.join(names)}")
+    parser.add_argument('--offline', action='store_true', help='skip the scraping stages')
+    parser.add_argument('--force', action='store_true', help='run every stage, even unchanged ones')
+    parser.add_argument('--jobs', type=int, default=2, help='stages run at the same time')
+    parser.add_argument('--args', action='append', default=[], metavar='STAGE=ARGS',
+                        help="command line arguments of a stage's script, e.g. 'clean_drives=--incremental'")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in names]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    results = Pipeline(STAGES).run(args.stages or None, stage_arguments(args.args, parser), args.jobs, args.force,
+                                   args.offline)
+    print(f"{'stage':>17} {'status':>8} {'seconds':>8}")
+    for name, (status, seconds) in results.items():
+        print(f'{name:>17} {status:>8} {seconds:>8.1f}')
+    if any(status in ['failed', 'blocked'] for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    with profile_run('run_pipeline'):
+        main()
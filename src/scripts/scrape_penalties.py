@@ -3,21 +3,47 @@ NFL Penalty Scraper
 Author: Eric Uehling
 Date: 2023-12-22
 
-Description: Scrapes NFL penalties data from nflpenalties.com and saves it to a CSV file in the raw data directory. 
+Description: Scrapes NFL penalties data from nflpenalties.com and saves it to a CSV file in the raw data directory.
 The data is scraped for each team and season year. The script is designed to update the existing CSV file if it exists,
-otherwise it will create a new CSV file. Therefore, the script can be run multiple times to update the data in an 
+otherwise it will create a new CSV file. Therefore, the script can be run multiple times to update the data in an
 efficient manner.
 
+Every (team, season) page is stored as its own partition in data/raw/penalties/ as soon as it is scraped, and
+penalties.csv is reassembled from the partitions. A manifest (data/raw/penalties.manifest.json) records for every
+partition a hash of its rows and a hash of the team's played games in games.csv. A team season is only fetched again
+when the team has played since it was last scraped, so an in-season refresh only fetches the teams that played that
+week, and an interrupted crawl resumes with the pages it has not stored yet. Pages are fetched by --workers threads
+under a global limit of --rate requests per minute.
+
 Total Duration: 2 seconds * 32 teams * (Year - 2009) seasons / 60 seconds per minute = 14.93 minutes (Year = 2023)
-Update Duration: 2 seconds * 32 teams * x seasons / 60 seconds per minute = 1.06 minutes per season
+Update Duration: 2 seconds * teams that played / 60 seconds per minute = about 0.5 minutes per football week
+Measured timings of every fetch, rate limit wait and parse are written to data/profiles/ by each run.
+
+Every page is kept in the page cache (data/html), and --reparse rebuilds penalties.csv from the cached pages.
 """
 from bs4 import BeautifulSoup
 import pandas as pd
 from selenium import webdriver
+import argparse
+import hashlib
+import io
 import time
 import os
+import sys
 import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.fetching import HttpFetcher, SeleniumFetcher, TokenBucket, fetch_pages
+from utils.page_cache import PageCache, reparse_pages
+from utils.partitions import load_manifest, save_manifest
+from utils.profiling import profile_run, profiled
+from utils.storage import read_table, table_path, write_table
+
+CACHE_SITE = 'nflpenalties'
+FIRST_SEASON = 2009
+NO_GAMES = 'no games'
+SITE_LAG = pd.Timedelta(days=2)  # nflpenalties.com is assumed to be up to date this long after a game
+
 def current_nfl_season():
     """
     Returns the current NFL season year based on the current date.
@@ -30,64 +56,269 @@ def get_start_year(file_path):
     Determines the start year for data collection based on the existing data in a CSV file.
     """
     if os.path.exists(file_path):
-        existing_df = pd.read_csv(file_path)
+        existing_df = read_table('penalties', 'raw', columns=['Year'])
         if not existing_df.empty:
             return existing_df['Year'].max()
-    return 2009  # Default start year if file doesn't exist or is empty
-
-def scrape_penalties_data(driver, teams_df, start_year, end_year):
-    """
-    Scrapes NFL penalties data for each team and season year.
-    """
-    data = []
-    for year in range(start_year, end_year + 1):
-        for index, row in teams_df.iterrows():
-            city_name = f"{row['city']} {row['name']}".replace(' ', '-').lower()
-            try:
-                url = f'https://www.nflpenalties.com/team/{city_name}?year={year}&view=log'
-                driver.get(url)
-                time.sleep(2)  # Wait for the page to load
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                table = soup.find('table')
-                if table:
-                    headers = [header.text for header in table.find_all('th')]
-                    for row in table.find_all('tr')[1:-1]:
-                        cols = row.find_all('td')
-                        row_data = [ele.text.strip() for ele in cols]
-                        row_data.extend([city_name, year])  # Add city-name and year for reference
-                        data.append(row_data)
-                else:
-                    print(f"Table not found in URL: {url}")
-            except Exception as e:
-                print(f"Failed to process URL: {url}, Error: {e}")
-    return data, headers
-
-def update_penalties_csv(data, headers, csv_file, start_year):
-    """
-    Updates or creates the penalties CSV file with the scraped data.
-    """
-    columns = headers + ['Team', 'Year']  # Add team and year to headers
-    new_df = pd.DataFrame(data, columns=columns)
-    if os.path.exists(csv_file):
-        existing_df = pd.read_csv(csv_file)
-        existing_df = existing_df[existing_df['Year'] != start_year]
-        updated_df = pd.concat([existing_df, new_df])
-    else:
-        updated_df = new_df
-    updated_df.to_csv(csv_file, index=False)
-
-def main():
-    teams_df = pd.read_csv('../../data/processed/teams.csv')
-    driver = webdriver.Chrome()
-    output_dir = '../../data/raw/'
-    csv_file = os.path.join(output_dir, 'penalties.csv')
-    os.makedirs(output_dir, exist_ok=True)
+    return FIRST_SEASON  # Default start year if file doesn't exist or is empty
+
+def team_city_name(row):
+    """
+    Team name as used in nflpenalties.com URLs and in the Team column, e.g. 'kansas-city-chiefs'.
+    """
+    return f"{row['city']} {row['name']}".replace(' ', '-').lower()
+
+def partition_label(city_name, year):
+    """
+    Name of the partition holding the penalties of one team season, e.g. '2023_kansas-city-chiefs'.
+    """
+    return f'{year}_{city_name}'
+
+def team_season_url(city_name, year):
+    return f'https://www.nflpenalties.com/team/{city_name}?year={year}&view=log'
+
+@profiled()
+def parse_penalties_page(key, html_source):
+    """
+    Parses the penalty log table of a team season page. key is the (city_name, year) of the page.
+    Returns the table headers and the rows with the team and year appended, or None if there is no table.
+    """
+    city_name, year = key
+    soup = BeautifulSoup(html_source, 'html.parser')
+    table = soup.find('table')
+    if not table:
+        return None
+
+    headers = [header.text for header in table.find_all('th')]
+    rows = []
+    for row in table.find_all('tr')[1:-1]:
+        cols = row.find_all('td')
+        row_data = [ele.text.strip() for ele in cols]
+        row_data.extend([city_name, year])  # Add city-name and year for reference
+        rows.append(row_data)
+    return headers, rows
+
+def rows_frame(headers, rows):
+    """
+    DataFrame of a parsed page, with the column types it gets when read back from CSV.
+    """
+    df = pd.DataFrame(rows, columns=headers + ['Team', 'Year'])
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)))
+
+def content_hash(df):
+    """
+    Hash of the rows of a partition.
+    """
+    return hashlib.sha256(df.to_csv(index=False).encode('utf-8')).hexdigest()[:16]
+
+def team_schedules():
+    """
+    For every (team_id, season) in games.csv, a hash of the played games, which changes whenever the team plays,
+    and whether the last game is long enough ago for nflpenalties.com to include it. Returns an empty dictionary
+    if games.csv has not been downloaded by missing.py yet.
+    """
+    if not os.path.exists(table_path('games', 'raw')):
+        return {}
+    games = read_table('games', 'raw', columns=['game_id', 'season', 'gameday', 'away_team', 'home_team',
+                                                  'home_score'])
+    games = games[games['home_score'].notna()]
+    teams = pd.concat([games.rename(columns={'away_team': 'team_id'}), games.rename(columns={'home_team': 'team_id'})])
+    settled_before = pd.Timestamp(datetime.datetime.now()) - SITE_LAG
+    return {
+        (team_id, season): (hashlib.sha256(','.join(sorted(group['game_id'])).encode('utf-8')).hexdigest()[:16],
+                            pd.to_datetime(group['gameday']).max() < settled_before)
+        for (team_id, season), group in teams.groupby(['team_id', 'season'])
+    }
+
+def schedule_of(schedules, team_id, year):
+    """
+    (hash, settled) of a team season's played games. Seasons without played games are settled, and without
+    games.csv the hash is None so every team season from the last stored season on is fetched.
+    """
+    if not schedules:
+        return None, False
+    return schedules.get((team_id, year), (NO_GAMES, True))
+
+def write_partition(label, df):
+    write_table(df, f'penalties/{label}', 'raw', csv=False)
 
+def read_partition(label):
+    return read_table(f'penalties/{label}', 'raw')
+
+def seed_partitions(teams_df, schedules, hashes):
+    """
+    Splits an existing penalties.csv into team season partitions on the first partitioned run. Seasons before the
+    last one in the file are complete, so they are recorded against the current schedule and not fetched again.
+    """
+    csv_file = table_path('penalties', 'raw')
+    if hashes['content'] or not os.path.exists(csv_file):
+        return
     start_year = get_start_year(csv_file)
-    data, headers = scrape_penalties_data(driver, teams_df, start_year, current_nfl_season() + 1)
-    update_penalties_csv(data, headers, csv_file, start_year)
-    driver.close()
-    print(f'Data saved to {csv_file}')
+    team_ids = dict(zip(teams_df.apply(team_city_name, axis=1), teams_df['team_id']))
+    existing_df = read_table('penalties', 'raw')
+    for (city_name, year), df in existing_df.groupby(['Team', 'Year'], sort=False):
+        label = partition_label(city_name, year)
+        df = df.reset_index(drop=True)
+        write_partition(label, df)
+        hashes['content'][label] = content_hash(df)
+        schedule, _ = schedule_of(schedules, team_ids.get(city_name), year)
+        if year < start_year and schedule is not None:
+            hashes['schedule'][label] = schedule
+    print(f"Split penalties.csv into {len(hashes['content'])} team season partitions.")
+
+@profiled()
+def assemble_penalties(labels, hashes):
+    """
+    Writes penalties.csv from the stored partitions, in season and team order. Partitions of teams that are no
+    longer in the teams table come last.
+    """
+    labels = [label for label in labels if label in hashes['content']]
+    labels += sorted(set(hashes['content']) - set(labels))
+    if labels:
+        write_table(pd.concat([read_partition(label) for label in labels], ignore_index=True), 'penalties', 'raw')
+
+def get_page_source(url, driver):
+    """Loads a page in the WebDriver and returns its source."""
+    driver.get(url)
+    time.sleep(2)  # Wait for the page to load
+    return driver.page_source
+
+def make_fetcher(backend):
+    """Returns the page fetcher for the given backend, 'http' or 'selenium'."""
+    if backend == 'http':
+        return HttpFetcher()
+    return SeleniumFetcher(webdriver.Chrome, get_page_source)
+
+def scrape_penalties_data(fetcher, bucket, team_seasons, hashes, schedules, workers, cache, base_url=None):
+    """
+    Scrapes the given team seasons, writing each page's partition as soon as it is parsed and recording it in the
+    manifest, so an interrupted crawl keeps every finished page. Returns the number of partitions that changed and
+    the number of pages that could not be fetched or processed. team_seasons maps partition labels to (city_name, year, team_id). base_url replaces the site's host.
+    """
+    urls = {label: team_season_url(city_name, year) for label, (city_name, year, _) in team_seasons.items()}
+    if base_url:
+        urls = {label: base_url.rstrip('/') + url[url.index('/team/'):] for label, url in urls.items()}
+
+    def store_page(label, html_source):
+        if html_source is None:
+            return None
+        city_name, year, _ = team_seasons[label]
+        cache.put(urls[label], html_source, key=[city_name, int(year)])
+        page = parse_penalties_page((city_name, year), html_source)
+        if page is None:
+            return 'no table'
+        df = rows_frame(*page)
+        digest = content_hash(df)
+        if digest != hashes['content'].get(label):
+            write_partition(label, df)
+        return digest
+
+    changed = failed = 0
+    for label, url, digest, error in fetch_pages(urls.items(), fetcher, bucket, store_page, workers):
+        if error is not None:
+            print(f"Failed to process URL: {url}, Error: {error}")
+            failed += 1
+            continue
+        if digest is None:
+            print(f"Failed to load URL: {url}")
+            failed += 1
+            continue
+
+        city_name, year, team_id = team_seasons[label]
+        schedule, settled = schedule_of(schedules, team_id, year)
+        if digest == 'no table':
+            print(f"Table not found in URL: {url}")
+            settled = settled and schedule == NO_GAMES
+        elif digest != hashes['content'].get(label):
+            hashes['content'][label] = digest
+            changed += 1
+
+        # Until the last game is settled the site may not include it yet, so the page is fetched again next run
+        if schedule is not None and settled:
+            hashes['schedule'][label] = schedule
+        save_manifest('penalties', {}, hashes, stage='raw')
+    return changed, failed
+
+@profiled()
+def reparse(teams_df, workers=None):
+    """
+    Rebuilds the partitions and penalties.csv from the cached pages, without any network access. An existing
+    penalties.csv is split into partitions first, so team seasons without a cached page are kept.
+    """
+    hashes = load_manifest('penalties', 'raw').get('inputs', {'schedule': {}, 'content': {}})
+    seed_partitions(teams_df, team_schedules(), hashes)
+    entries = PageCache(CACHE_SITE).entries().values()
+    pages = reparse_pages(CACHE_SITE, parse_penalties_page, workers)
+    for entry, page in zip(entries, pages):
+        if page:
+            label = partition_label(*entry['key'])
+            df = rows_frame(*page)
+            write_partition(label, df)
+            hashes['content'][label] = content_hash(df)
+    save_manifest('penalties', {}, hashes, stage='raw')
+    assemble_penalties(all_labels(teams_df), hashes)
+    print(f"Rebuilt penalties.csv from {len(hashes['content'])} team seasons.")
+
+def all_labels(teams_df):
+    """
+    Partition labels of every team season up to next season, in season and team order.
+    """
+    city_names = teams_df.apply(team_city_name, axis=1)
+    return [partition_label(city_name, year)
+            for year in range(FIRST_SEASON, current_nfl_season() + 2) for city_name in city_names]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape team penalty logs from nflpenalties.com.')
+    parser.add_argument('--backend', choices=['selenium', 'http'], default='selenium',
+                        help='fetch pages with a Chrome WebDriver or over plain HTTP')
+    parser.add_argument('--rate', type=float, default=30, help='maximum requests per minute')
+    parser.add_argument('--workers', type=int, default=4, help='pages fetched at the same time')
+    parser.add_argument('--base-url', help='fetch pages from this host instead, e.g. a local fake_server.py')
+    parser.add_argument('--refresh', action='store_true', help='fetch every team season, even unchanged ones')
+    parser.add_argument('--reparse', action='store_true',
+                        help='rebuild penalties.csv from the page cache in parallel, without fetching anything')
+    parser.add_argument('--processes', type=int, help='worker processes for --reparse, defaults to the CPU count')
+    args = parser.parse_args(argv)
+
+    teams_df = read_table('teams', 'processed', columns=['team_id', 'city', 'name'])
+    if args.reparse:
+        reparse(teams_df, args.processes)
+        return
+
+    csv_file = table_path('penalties', 'raw')
+    os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+
+    hashes = load_manifest('penalties', 'raw').get('inputs', {'schedule': {}, 'content': {}})
+    schedules = team_schedules()
+    seed_partitions(teams_df, schedules, hashes)
+    # Without games.csv nothing tells which seasons changed, so only the seasons from the last stored one are fetched
+    start_year = FIRST_SEASON if schedules else get_start_year(csv_file)
+
+    team_seasons = {}
+    for year in range(start_year, current_nfl_season() + 2):
+        for _, row in teams_df.iterrows():
+            city_name = team_city_name(row)
+            label = partition_label(city_name, year)
+            schedule, _ = schedule_of(schedules, row['team_id'], year)
+            if args.refresh or schedule is None or hashes['schedule'].get(label) != schedule:
+                team_seasons[label] = (city_name, year, row['team_id'])
+    print(f"Fetching {len(team_seasons)} team seasons, the others have not played since they were scraped.")
+
+    fetcher = make_fetcher(args.backend)
+    try:
+        changed, failed = scrape_penalties_data(fetcher, TokenBucket(args.rate), team_seasons, hashes, schedules,
+                                        args.workers, PageCache(CACHE_SITE), args.base_url)
+    finally:
+        fetcher.close()
+
+    if changed or not os.path.exists(csv_file):
+        assemble_penalties(all_labels(teams_df), hashes)
+    print(f'{changed} team seasons changed. Data saved to {csv_file}')
+    if failed:
+        print(f'{failed} team seasons could not be scraped and are fetched again next run.')
+        return 1
 
 if __name__ == "__main__":
-    main()
+    with profile_run('scrape_penalties'):
+        status = main()
+        if status:
+            sys.exit(status)
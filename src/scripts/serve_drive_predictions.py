@@ -0,0 +1,40 @@
+"""
+Drive Prediction Server
+
+Description: Serves drive outcome probabilities from the drive classifier saved by drives.ipynb, micro-batching
+concurrent requests (see models/drive_server.py). Prints the server metrics when stopped.
+
+Usage: python serve_drive_predictions.py [--port 8001] [--window-ms 5] [--max-batch 256], then e.g.
+curl -d '{"total_off_pen": 2, "total_def_pen": 1, "total_off_pen_yards": 15, "total_def_pen_yards": 10,
+"los": 50, "time_left_seconds": 900}' http://127.0.0.1:8001/predict
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.drive_server import MAX_BATCH, MODEL_NAME, WINDOW_SECONDS, serve_predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve drive outcome probabilities over HTTP.')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--window-ms', type=float, default=WINDOW_SECONDS * 1000,
+                        help='how long requests are collected into one batch')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='most drives scored in one batch')
+    parser.add_argument('--model', default=MODEL_NAME, help='name of the classifier in the model registry')
+    args = parser.parse_args()
+
+    with serve_predictions(args.port, args.window_ms / 1000, args.max_batch, args.model) as (base_url, metrics):
+        print(f'Serving {args.model} at {base_url}/predict, metrics at {base_url}/metrics, press Ctrl+C to stop')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(json.dumps(metrics.snapshot(), indent=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Drive Model Training
+
+Description: Fits the drive result classifier of drives.ipynb with the exact GradientBoostingClassifier, the
+histogram based HistGradientBoostingClassifier or both (models/drive_training.py) on the same train/test split, and
+prints their fit times and classification reports side by side. --save stores the model of the first estimator
+with its label encoder in the model registry, e.g. as drive_classifier for serve_drive_predictions.py. Models with
+--categorical features cannot be served and are not saved.
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.drive_training import ESTIMATORS, compare_estimators, drive_frame
+from models.registry import data_hash, save_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train and compare the drive result classifiers.')
+    parser.add_argument('--estimator', choices=ESTIMATORS, action='append',
+                        help='estimator to fit, repeat to fit several (default: all)')
+    parser.add_argument('--penalty-types', action='store_true', help='add the count of every penalty type')
+    parser.add_argument('--categorical', action='store_true', help='add team_id and quarter as categories')
+    parser.add_argument('--save', metavar='NAME', help='save the model of the first estimator in the registry')
+    args = parser.parse_args()
+    if args.save and args.categorical:
+        parser.error('--save cannot be combined with --categorical, the prediction server only takes numeric features')
+
+    kinds = args.estimator or ESTIMATORS
+    features, result = drive_frame(args.penalty_types, args.categorical)
+    print(f'{len(features)} drives, {features.shape[1]} features')
+    models, summary, reports = compare_estimators(features, result, kinds)
+
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(summary)
+        print(reports)
+
+    if args.save:
+        settings = {'estimator': kinds[0], 'penalty_types': args.penalty_types, 'categorical': args.categorical,
+                    **models[kinds[0]].get_params()}
+        save_model(args.save, {'model': models[kinds[0]], 'label_encoder': LabelEncoder().fit(result)},
+                   data_hash(features, result), settings, summary.loc[kinds[0], 'fit_seconds'])
+        print(f'Saved the {kinds[0]} model as {args.save}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Penalty Model Training
+
+Description: Trains the Negative Binomial model of every frequent penalty type (not only the top 5 of
+penalties.ipynb) in parallel worker processes with models/penalty_training.py, and saves the ensemble and its
+evaluation in the model registry as penalty_ensemble_all. Prints the fit time, alpha, MSE and R^2 of every model
+and the overall ensemble MSE and R^2 as in the notebook.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from models.penalty_training import fit_ensemble, penalty_count_frame
+from models.registry import data_hash, fit_or_load
+from utils.schemas import load_table
+
+MODEL_NAME = 'penalty_ensemble_all'
+
+
+def train(processes=None, min_count=50, estimate_alpha=False):
+    """
+    Fit the ensemble on the processed penalties, or load it from the registry if it was trained on the same data.
+    """
+    penalties = load_table('penalties', 'processed', columns=['game_id', 'team_id', 'opp_id', 'penalty', 'year',
+                                                              'week', 'ref_crew', 'home', 'postseason', 'phase'])
+    grouped = penalty_count_frame(penalties, min_count)
+
+    def fit():
+        start = time.perf_counter()
+        ensemble, report = fit_ensemble(grouped, alpha=None if estimate_alpha else 1.0, processes=processes)
+        elapsed = time.perf_counter() - start
+        print(f"Fitted {len(report)} models in {elapsed:.1f} s, {report['fit_seconds'].sum():.1f} s of model fits")
+        return {'ensemble': ensemble, 'report': report}
+
+    settings = {'min_count': min_count, 'alpha': 'estimated' if estimate_alpha else 1.0}
+    return fit_or_load(MODEL_NAME, data_hash(grouped), fit, settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the Negative Binomial model of every frequent penalty type.')
+    parser.add_argument('--processes', type=int, help='worker processes, defaults to the CPU count')
+    parser.add_argument('--min-count', type=int, default=50, help='minimum occurrences of a penalty type')
+    parser.add_argument('--estimate-alpha', action='store_true',
+                        help='estimate the dispersion of every penalty type instead of fixing alpha at 1.0')
+    args = parser.parse_args()
+
+    report = train(args.processes, args.min_count, args.estimate_alpha)['report']
+    print(report.to_string(index=False, float_format=lambda value: f'{value:.4f}'))
+    print(f"Overall Ensemble MSE: {report['mse'].mean()}")
+    print(f"Overall Ensemble R^2: {report['r2'].mean()}")
+
+
+if __name__ == '__main__':
+    main()
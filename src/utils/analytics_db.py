@@ -0,0 +1,216 @@
+"""
+Analytics Database Utilities
+
+Description: Local SQLite database of the processed tables for the EDA and report queries. build_database loads
+the games (game_detail), team performances, drives, penalties and penalty count tables through their schemas
+into data/processed/analytics.sqlite, with primary keys and indexes on game_id, (team_id, year) and ref_crew.
+The source files are recorded in the database, and open_database rebuilds it when any of them changed. query
+runs SQL into a DataFrame and run_report runs one of the standard REPORTS.
+"""
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from utils.penalty_counts import DRIVE_KEYS
+from utils.profiling import profiled
+from utils.schemas import load_table
+from utils.storage import DATA_DIR, table_path
+
+DB_PATH = os.path.join(DATA_DIR, 'processed', 'analytics.sqlite')
+
+# Table in the database -> source table and stage, primary key (None for a rowid) and indexes
+DB_TABLES = {
+    'games': {'source': ('game_detail', 'raw'), 'primary_key': ['game_id'],
+              'indexes': [['season', 'week'], ['Referee']]},
+    'team_performances': {'source': ('team_performances', 'processed'), 'primary_key': ['game_id', 'team_id'],
+                          'indexes': [['team_id', 'year'], ['ref_crew']]},
+    # Drives are numbered per team, so both teams of a game have a drive 1
+    'drives': {'source': ('drives', 'processed'), 'primary_key': DRIVE_KEYS,
+               'indexes': [['team_id']]},
+    # The penalty indexes also hold the columns the REPORTS read, so the reports never touch the table itself
+    'penalties': {'source': ('penalties', 'processed'), 'primary_key': None,
+                  'indexes': [['game_id'], ['team_id', 'year', 'penalty', 'phase', 'yardage'],
+                              ['ref_crew', 'game_id', 'penalty', 'phase'],
+                              ['penalty', 'phase', 'declined', 'offsetting', 'yardage'],
+                              ['opp_id', 'penalty', 'phase', 'yardage'], ['pos', 'penalty', 'phase'],
+                              ['time_left', 'penalty', 'phase']]},
+    'team_penalty_counts': {'source': ('team_penalty_counts', 'processed'),
+                            'primary_key': ['game_id', 'team_id', 'penalty'], 'indexes': [['penalty']]},
+    'drive_penalty_counts': {'source': ('drive_penalty_counts', 'processed'),
+                             'primary_key': DRIVE_KEYS + ['penalty'], 'indexes': [['penalty']]},
+}
+
+# Frequent (min_count+) penalties outside special teams, as filtered in penalties_eda.ipynb
+_FREQUENT = 'WITH frequent AS (SELECT penalty FROM penalties GROUP BY penalty HAVING COUNT(*) >= :min_count)'
+_FILTERED = "phase != 'ST' AND penalty IN (SELECT penalty FROM frequent)"
+
+REPORTS = {
+    # Occurrences of each penalty type in a phase
+    'penalty_counts': f'''{_FREQUENT}
+        SELECT penalty, COUNT(*) AS count FROM penalties WHERE {_FILTERED} AND phase = :phase
+        GROUP BY penalty ORDER BY count DESC, penalty''',
+    # Yards given up by each penalty type in a phase
+    'yards_by_penalty': f'''{_FREQUENT}
+        SELECT penalty, SUM(yardage) AS total_yards FROM penalties WHERE {_FILTERED} AND phase = :phase
+        GROUP BY penalty ORDER BY total_yards DESC, penalty''',
+    # Yards given up by each team
+    'yards_given_up_by_team': f'''{_FREQUENT}
+        SELECT team_id, SUM(yardage) AS total_yards_given_up FROM penalties WHERE {_FILTERED}
+        GROUP BY team_id ORDER BY total_yards_given_up DESC, team_id''',
+    # Yards gained by each team from its opponents' penalties
+    'yards_gained_by_team': f'''{_FREQUENT}
+        SELECT opp_id AS team_id, SUM(yardage) AS total_yards_gained FROM penalties WHERE {_FILTERED}
+        GROUP BY opp_id ORDER BY total_yards_gained DESC, opp_id''',
+    # Penalties by position
+    'penalties_by_position': f'''{_FREQUENT}
+        SELECT pos AS position, COUNT(*) AS penalty_count FROM penalties WHERE {_FILTERED} AND pos IS NOT NULL
+        GROUP BY pos ORDER BY penalty_count DESC, pos''',
+    # Average number of penalties per game called by each referee crew
+    'penalties_per_game_by_crew': f'''{_FREQUENT}
+        SELECT ref_crew, AVG(n) AS avg_penalties_per_game
+        FROM (SELECT ref_crew, game_id, COUNT(*) AS n FROM penalties WHERE {_FILTERED} AND ref_crew IS NOT NULL
+              GROUP BY ref_crew, game_id)
+        GROUP BY ref_crew ORDER BY avg_penalties_per_game DESC, ref_crew''',
+    # Penalties per minute into the game, regulation only (overtime times start with '-', which sorts before '0').
+    # Counted per time_left first, so only the distinct times are parsed
+    'penalties_by_minute': f'''{_FREQUENT},
+        times AS (SELECT time_left, COUNT(*) AS n FROM penalties
+                  WHERE {_FILTERED} AND time_left >= '0' GROUP BY time_left),
+        timed AS (SELECT CAST(substr(time_left, 1, 2) AS INTEGER) * 3600
+                         + CAST(substr(time_left, 4, 2) AS INTEGER) * 60
+                         + CAST(substr(time_left, 7, 2) AS INTEGER) AS seconds_left, n
+                  FROM times)
+        SELECT CAST(60 - seconds_left / 60.0 AS INTEGER) AS minutes_into_game, SUM(n) AS penalties
+        FROM timed GROUP BY minutes_into_game ORDER BY minutes_into_game''',
+    # Penalties of one team in one season, by type
+    'team_season_penalties': '''
+        SELECT penalty, COUNT(*) AS count, SUM(yardage) AS yards FROM penalties
+        WHERE team_id = :team_id AND year = :year GROUP BY penalty ORDER BY count DESC, penalty''',
+    # Occurrences of every penalty type and its usual yardage among accepted penalties, 'spot' when the
+    # yardage varies (sample standard deviation over 10), as written to outputs/penalty_list.csv. A missing
+    # declined or offsetting flag counts as No
+    'penalty_list': '''
+        WITH accepted AS (SELECT penalty, yardage, COUNT(*) AS n FROM penalties
+                          WHERE COALESCE(declined, 0) = 0 AND COALESCE(offsetting, 0) = 0
+                          GROUP BY penalty, yardage),
+        means AS (SELECT penalty, SUM(CASE WHEN yardage IS NOT NULL THEN n END) AS n,
+                         SUM(yardage * n) * 1.0 / SUM(CASE WHEN yardage IS NOT NULL THEN n END) AS mean
+                  FROM accepted GROUP BY penalty),
+        spread AS (SELECT penalty, SUM(accepted.n * (yardage - mean) * (yardage - mean)) / (means.n - 1) AS variance
+                   FROM accepted JOIN means USING (penalty) GROUP BY penalty),
+        modes AS (SELECT penalty, yardage, ROW_NUMBER() OVER (PARTITION BY penalty ORDER BY n DESC, yardage) AS rank
+                  FROM accepted WHERE yardage IS NOT NULL),
+        occurrences AS (SELECT penalty, COUNT(*) AS num_occ FROM penalties GROUP BY penalty)
+        SELECT spread.penalty,
+               CASE WHEN spread.variance > 100 THEN 'spot' ELSE COALESCE(modes.yardage, 'spot') END AS yards,
+               occurrences.num_occ
+        FROM spread
+        LEFT JOIN modes ON modes.penalty = spread.penalty AND modes.rank = 1
+        LEFT JOIN occurrences ON occurrences.penalty = spread.penalty
+        ORDER BY spread.penalty''',
+}
+
+REPORT_DEFAULTS = {'min_count': 50}
+
+
+def _source_path(spec):
+    source, stage = spec['source']
+    return table_path(source, stage)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _load_table(conn, name, spec):
+    """
+    Create a table from its source with the declared primary key and indexes. In a table with a primary key, rows
+    that are exact duplicates are stored once and rows that only share their key raise an IntegrityError. Tables
+    without one keep every row, since identical penalties are separate occurrences.
+    """
+    source, stage = spec['source']
+    df = load_table(source, stage)
+    if spec['primary_key']:
+        df = df.drop_duplicates()
+    columns = [f'{_quote(column)} {_sql_type(df[column].dtype)}' for column in df.columns]
+    if spec['primary_key']:
+        columns.append(f"PRIMARY KEY ({', '.join(map(_quote, spec['primary_key']))})")
+    conn.execute(f"CREATE TABLE {_quote(name)} ({', '.join(columns)})")
+
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f"INSERT INTO {_quote(name)} VALUES ({', '.join('?' * len(df.columns))})", rows)
+    for index in spec['indexes']:
+        conn.execute(f"CREATE INDEX {_quote(f'{name}_' + '_'.join(index))} ON {_quote(name)} "
+                     f"({', '.join(map(_quote, index))})")
+    conn.execute('INSERT INTO sources VALUES (?, ?, ?)',
+                 (name, os.path.getmtime(_source_path(spec)), os.path.getsize(_source_path(spec))))
+
+
+@profiled()
+def build_database(path=DB_PATH):
+    """
+    Build the database from every source table that exists, through a temporary file so a failed build leaves
+    the previous database in place.
+    """
+    temp_path = f'{path}.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    with closing(sqlite3.connect(temp_path)) as conn:
+        conn.execute('CREATE TABLE sources (name TEXT PRIMARY KEY, mtime REAL, size INTEGER)')
+        for name, spec in DB_TABLES.items():
+            if os.path.exists(_source_path(spec)):
+                _load_table(conn, name, spec)
+        conn.execute('ANALYZE')
+        conn.commit()
+    os.replace(temp_path, path)
+
+
+def is_current(path=DB_PATH):
+    """
+    True if the database exists and every source table is the same as when it was built.
+    """
+    if not os.path.exists(path):
+        return False
+    with closing(sqlite3.connect(path)) as conn:
+        recorded = {name: (mtime, size) for name, mtime, size in conn.execute('SELECT * FROM sources')}
+    for name, spec in DB_TABLES.items():
+        source_path = _source_path(spec)
+        current = (os.path.getmtime(source_path), os.path.getsize(source_path)) if os.path.exists(source_path) else None
+        if recorded.get(name) != current:
+            return False
+    return True
+
+
+def open_database(path=DB_PATH):
+    """
+    Connection to the database, rebuilding it first if it is missing or out of date.
+    """
+    if not is_current(path):
+        build_database(path)
+    return sqlite3.connect(path)
+
+
+def query(sql, params=(), path=DB_PATH):
+    """
+    Run a SQL query against the database and return the result as a DataFrame.
+    """
+    with closing(open_database(path)) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+@profiled()
+def run_report(name, path=DB_PATH, **params):
+    """
+    Run one of the standard REPORTS, e.g. run_report('yards_by_penalty', phase='Off').
+    """
+    return query(REPORTS[name], {**REPORT_DEFAULTS, **params}, path)
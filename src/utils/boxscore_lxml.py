@@ -0,0 +1,305 @@
+"""
+lxml Boxscore Parser
+
+Description: Same parse_* functions as utils/boxscore_soup.py, on a tree built once by lxml's C parser. Sections are
+located with XPath instead of repeated BeautifulSoup traversals, which makes bulk re-parsing of cached pages several
+times faster. Every function returns exactly what its BeautifulSoup counterpart returns; benchmark_parsing.py checks
+this on the cached pages.
+"""
+from datetime import datetime
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+from utils.profiling import profiled
+
+
+@profiled('load_page')
+def load(html_source):
+    """Parses the HTML source of a page into the tree the parse_* functions take."""
+    return lxml.html.document_fromstring(html_source)
+
+
+def _first(elements):
+    """First element of an XPath result, or None like BeautifulSoup's find."""
+    return elements[0] if elements else None
+
+
+def _has_class(class_name):
+    """XPath predicate matching one class of a multi-valued class attribute."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _text(element):
+    """Text of an element and its descendants, like BeautifulSoup's get_text."""
+    return str(element.text_content())
+
+
+@profiled()
+def parse_scorebox(root):
+    """Parses the scorebox section of the HTML page to extract team-related data, including the team records."""
+    scorebox = _first(root.xpath(f"//div[{_has_class('scorebox')}]"))
+    away_team_block, home_team_block = scorebox.xpath('./div')[:2]
+
+    def record(block):
+        scores = _first(block.xpath(f".//div[{_has_class('scores')}]"))
+        return _text(_first(scores.xpath('following-sibling::div[1]'))).strip()
+
+    def datapoint(block, class_name):
+        return _text(_first(block.xpath(f".//div[{_has_class(class_name)}]")))
+
+    return {
+        'home_points': datapoint(home_team_block, 'score'),
+        'away_points': datapoint(away_team_block, 'score'),
+        'home_coach': datapoint(home_team_block, 'datapoint').split(': ')[1],
+        'away_coach': datapoint(away_team_block, 'datapoint').split(': ')[1],
+        'home_record': record(home_team_block),
+        'away_record': record(away_team_block)
+    }
+
+
+def _parse_key_value_table(root, table_id, required_columns):
+    """
+    Reads the th/td rows of a two column table into a dictionary of the required columns, 'N/A' if missing.
+    """
+    data = {col: 'N/A' for col in required_columns}
+
+    table = _first(root.xpath('//table[@id=$id]', id=table_id))
+    if table is not None:
+        for row in table.iter('tr'):
+            th = _first(row.xpath('.//th'))
+            td = _first(row.xpath('.//td'))
+            if th is not None and td is not None:
+                key = _text(th).strip()
+                if key in required_columns:
+                    data[key] = _text(td).strip()
+
+    return data
+
+
+@profiled()
+def parse_game_info(root):
+    """
+    Parses the 'game_info' table and returns a dictionary with specific columns.
+    If a column doesn't exist, it assigns 'N/A' to that key.
+    """
+    required_columns = ['Won Toss', 'Roof', 'Surface', 'Duration',
+                        'Weather', 'Vegas Line', 'Over/Under', 'Won OT Toss']
+    return _parse_key_value_table(root, 'game_info', required_columns)
+
+
+@profiled()
+def parse_officials(root):
+    """
+    Parses the 'officials' table and returns a dictionary with specific columns.
+    If a column doesn't exist, it assigns 'N/A' to that key.
+    """
+    required_columns = ['Referee', 'Umpire', 'Head Linesman', 'Line Judge',
+                        'Back Judge', 'Side Judge', 'Field Judge', 'Down Judge']
+    return _parse_key_value_table(root, 'officials', required_columns)
+
+
+@profiled()
+def parse_meta_data(root):
+    """
+    Extracts and parses metadata from the game page.
+    Returns a dictionary of the parsed metadata.
+    """
+    meta_data = {
+        'weekday': 'N/A',
+        'season': 'N/A',
+        'date': 'N/A',
+        'start_time': 'N/A',
+        'stadium': 'N/A',
+        'attendance': 'N/A',
+        'time_of_game': 'N/A'
+    }
+
+    meta = _first(root.xpath(f"//div[{_has_class('scorebox_meta')}]"))
+    game_details = [_text(div).strip() for div in meta.iter('div') if div is not meta]
+    game_details = [detail for detail in game_details if detail]
+
+    for detail in game_details:
+        if 'Start Time:' in detail:
+            meta_data['start_time'] = detail.split('Start Time: ')[1]
+        elif 'Stadium:' in detail:
+            meta_data['stadium'] = detail.split('Stadium: ')[1]
+        elif 'Attendance:' in detail:
+            meta_data['attendance'] = detail.split('Attendance: ')[1]
+        elif 'Time of Game:' in detail:
+            meta_data['time_of_game'] = detail.split('Time of Game: ')[1]
+
+    if len(game_details) > 0:
+        try:
+            game_date = datetime.strptime(game_details[0], '%A %b %d, %Y')
+            meta_data['date'] = game_date.strftime('%Y-%m-%d')
+            meta_data['weekday'] = game_date.strftime('%A')
+            meta_data['season'] = game_date.year if game_date.month >= 8 else game_date.year - 1
+        except ValueError:
+            print("Date format is not recognized")
+
+    return meta_data
+
+
+@profiled()
+def parse_linescore(root, away_team_id, home_team_id):
+    """
+    Parses the linescore section to extract scores per quarter and final score, including overtime points.
+    Returns a dictionary with 'away_team_id' and 'home_team_id' as keys and their scores as values.
+    """
+    linescore_data = {}
+    linescore_table = _first(root.xpath(f"//table[{_has_class('linescore')}]"))
+
+    headers = [_text(th).strip() for th in _first(linescore_table.xpath('.//thead')).iter('th')]
+    has_ot = "OT" in headers
+    has_ot2 = "OT2" in headers
+
+    team_rows = list(linescore_table.iter('tr'))[1:]
+
+    for index, team_id in enumerate([away_team_id, home_team_id]):
+        row = team_rows[index]
+
+        scores = [_text(td).strip() for td in row.xpath('.//td')[2:2 + len(headers) - 2]]
+        scores.extend(['0'] * (5 - len(scores)))
+
+        q1pts, q2pts, q3pts, q4pts, *ot = scores
+        final_score = scores[-1]
+
+        if has_ot and has_ot2:
+            otpts = sum(map(int, ot[:2]))
+        elif has_ot:
+            otpts = int(ot[0]) if ot else 0
+        else:
+            otpts = 'N/A'
+
+        linescore_data[team_id] = {
+            'pts': final_score,
+            'q1pts': q1pts,
+            'q2pts': q2pts,
+            'q3pts': q3pts,
+            'q4pts': q4pts,
+            'otpts': otpts
+        }
+
+    return linescore_data
+
+
+@profiled()
+def parse_team_stats(root, home_team_id, away_team_id):
+    """
+    Parses the team stats section to extract various statistics.
+    Returns a dictionary with team IDs as keys and their statistics as values.
+    """
+    team_stats_data = {}
+    team_stats_table = _first(root.xpath('//table[@id=$id]', id='team_stats'))
+
+    for row in list(team_stats_table.iter('tr'))[1:]:
+        stat_name = _text(_first(row.xpath('.//th'))).strip().replace(' ', '_').lower()
+        vis_stat, home_stat = [_text(td).strip() for td in row.xpath('.//td')]
+
+        team_stats_data[away_team_id] = team_stats_data.get(away_team_id, {})
+        team_stats_data[home_team_id] = team_stats_data.get(home_team_id, {})
+
+        team_stats_data[away_team_id][stat_name] = vis_stat
+        team_stats_data[home_team_id][stat_name] = home_stat
+
+    return team_stats_data
+
+
+def _div_table(root, div_id):
+    """First table inside the div with the given id, None if the div has no table."""
+    div = _first(root.xpath('//div[@id=$id]', id=div_id))
+    return None if div is None else _first(div.xpath('.//table'))
+
+
+def _cell(row, tag, stat):
+    """First cell of a row with the given data-stat attribute."""
+    return _first(row.xpath(f'.//{tag}[@data-stat=$stat]', stat=stat))
+
+
+@profiled()
+def parse_starters(root, starter_div_id, team_id, game_id):
+    """
+    Parses the starters from a given division ID.
+    Returns a list of dictionaries containing starter data for each player.
+    """
+    starters_data = []
+    div = _first(root.xpath('//div[@id=$id]', id=starter_div_id))
+    starters_table = _first(div.xpath('.//table'))
+
+    for row in list(starters_table.iter('tr'))[1:]:
+        player_cell = _cell(row, 'th', 'player')
+        position_cell = _cell(row, 'td', 'pos')
+
+        if player_cell is not None and position_cell is not None:
+            starters_data.append({
+                'game_id': game_id,
+                'team_id': team_id,
+                'player': _text(player_cell).strip(),
+                'position': _text(position_cell).strip()
+            })
+
+    return starters_data
+
+
+@profiled()
+def parse_snap_counts(root, snap_count_div_id, team_id, game_id):
+    """
+    Parses the snap counts from a given division ID.
+    Returns a list of dictionaries containing snap count data for each player, or an empty list without a table.
+    """
+    snap_counts_data = []
+    snap_counts_table = _div_table(root, snap_count_div_id)
+
+    if snap_counts_table is not None:
+        for row in list(snap_counts_table.iter('tr'))[2:]:
+            player_cell = _cell(row, 'th', 'player')
+            cells = [_text(td).strip() for td in row.xpath('.//td')]
+
+            if player_cell is not None and len(cells) >= 6:
+                snap_counts_data.append({
+                    'game_id': game_id,
+                    'team_id': team_id,
+                    'player': _text(player_cell).strip(),
+                    'pos': cells[0],
+                    'off_num': cells[1],
+                    'off_pct': cells[2],
+                    'def_num': cells[3],
+                    'def_pct': cells[4],
+                    'st_num': cells[5],
+                    'st_pct': cells[6]
+                })
+
+    return snap_counts_data
+
+
+@profiled()
+def parse_drives(root, drive_div_id, team_id, game_id):
+    """
+    Parses the drive data for a team from a given division ID.
+    Returns a list of dictionaries containing drive data for each drive.
+    """
+    drives_data = []
+    div = _first(root.xpath('//div[@id=$id]', id=drive_div_id))
+    drives_table = _first(div.xpath('.//table'))
+
+    for row in list(drives_table.iter('tr'))[1:]:
+        cells = [_text(td).strip() for td in row.xpath('.//td')]
+        if cells:
+            drives_data.append({
+                'game_id': game_id,
+                'team_id': team_id,
+                'num': _text(_cell(row, 'th', 'drive_num')).strip(),
+                'quarter': cells[0],
+                'time': cells[1],
+                'los': cells[2],
+                'plays': cells[3],
+                'length': cells[4],
+                'net_yds': cells[5],
+                'result': cells[6]
+            })
+
+    return drives_data
@@ -0,0 +1,298 @@
+"""
+BeautifulSoup Boxscore Parser
+
+Description: Parses the sections of a pro-football-reference boxscore page from a BeautifulSoup tree built with
+Python's html.parser. This is the reference parsing backend of scrape_games.py; utils/boxscore_lxml.py implements
+the same functions on an lxml tree.
+"""
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from utils.profiling import profiled
+
+
+@profiled('load_page')
+def load(html_source):
+    """Parses the HTML source of a page into the tree the parse_* functions take."""
+    return BeautifulSoup(html_source, 'html.parser')
+
+
+@profiled()
+def parse_scorebox(soup):
+    """Parses the scorebox section of the HTML page to extract team-related data, including the team records."""
+    scorebox = soup.find('div', class_='scorebox')
+    team_blocks = scorebox.find_all('div', recursive=False)[:2]
+
+    away_team_block, home_team_block = team_blocks
+
+    away_record = away_team_block.find(
+        'div', class_='scores').find_next_sibling('div').get_text().strip()
+    home_record = home_team_block.find(
+        'div', class_='scores').find_next_sibling('div').get_text().strip()
+
+    return {
+        'home_points': home_team_block.find('div', class_='score').get_text(),
+        'away_points': away_team_block.find('div', class_='score').get_text(),
+        'home_coach': home_team_block.find('div', class_='datapoint').get_text().split(': ')[1],
+        'away_coach': away_team_block.find('div', class_='datapoint').get_text().split(': ')[1],
+        'home_record': home_record,
+        'away_record': away_record
+    }
+
+
+@profiled()
+def parse_game_info(soup):
+    """
+    Parses the 'game_info' table and returns a dictionary with specific columns.
+    If a column doesn't exist, it assigns 'N/A' to that key.
+    """
+    required_columns = ['Won Toss', 'Roof', 'Surface', 'Duration',
+                        'Weather', 'Vegas Line', 'Over/Under', 'Won OT Toss']
+    game_info_data = {col: 'N/A' for col in required_columns}
+
+    table = soup.find('table', id='game_info')
+    if table:
+        rows = table.find_all('tr')
+        for row in rows:
+            if row.find('th') and row.find('td'):
+                key = row.find('th').get_text().strip()
+                if key in required_columns:
+                    game_info_data[key] = row.find('td').get_text().strip()
+
+    return game_info_data
+
+
+@profiled()
+def parse_officials(soup):
+    """
+    Parses the 'officials' table and returns a dictionary with specific columns.
+    If a column doesn't exist, it assigns 'N/A' to that key.
+    """
+    required_columns = ['Referee', 'Umpire', 'Head Linesman', 'Line Judge',
+                        'Back Judge', 'Side Judge', 'Field Judge', 'Down Judge']
+    officials_data = {col: 'N/A' for col in required_columns}
+
+    table = soup.find('table', id='officials')
+    if table:
+        rows = table.find_all('tr')
+        for row in rows:
+            if row.find('th') and row.find('td'):
+                key = row.find('th').get_text().strip()
+                if key in required_columns:
+                    officials_data[key] = row.find('td').get_text().strip()
+
+    return officials_data
+
+
+@profiled()
+def parse_meta_data(soup):
+    """
+    Extracts and parses metadata from the game page.
+    Returns a dictionary of the parsed metadata.
+    """
+    meta_data = {
+        'weekday': 'N/A',
+        'season': 'N/A',
+        'date': 'N/A',
+        'start_time': 'N/A',
+        'stadium': 'N/A',
+        'attendance': 'N/A',
+        'time_of_game': 'N/A'
+    }
+
+    meta = soup.find('div', class_='scorebox_meta')
+    game_details = [div.get_text().strip()
+                    for div in meta.find_all('div') if div.get_text().strip()]
+
+    for detail in game_details:
+        if 'Start Time:' in detail:
+            meta_data['start_time'] = detail.split('Start Time: ')[1]
+        elif 'Stadium:' in detail:
+            meta_data['stadium'] = detail.split('Stadium: ')[1]
+        elif 'Attendance:' in detail:
+            meta_data['attendance'] = detail.split('Attendance: ')[1]
+        elif 'Time of Game:' in detail:
+            meta_data['time_of_game'] = detail.split('Time of Game: ')[1]
+
+    # Parsing the date and determining the season
+    if len(game_details) > 0:
+        game_date_str = game_details[0]  # Assuming the first item is the date
+        try:
+            game_date = datetime.strptime(game_date_str, '%A %b %d, %Y')
+            meta_data['date'] = game_date.strftime('%Y-%m-%d')
+            meta_data['weekday'] = game_date.strftime('%A')
+            meta_data['season'] = game_date.year if game_date.month >= 8 else game_date.year - 1
+        except ValueError:
+            print("Date format is not recognized")
+
+    return meta_data
+
+
+@profiled()
+def parse_linescore(soup, away_team_id, home_team_id):
+    """
+    Parses the linescore section to extract scores per quarter and final score, 
+    including overtime points calculation based on OT and OT2 columns.
+    Parameters:
+        soup: BeautifulSoup object of the parsed HTML page.
+        away_team_id: Identifier for the away team.
+        home_team_id: Identifier for the home team.
+    Returns a dictionary with 'away_team_id' and 'home_team_id' as keys and their scores as values, 
+    including pts, q1pts, q2pts, q3pts, q4pts, and otpts.
+    """
+    linescore_data = {}
+    linescore_table = soup.find('table', class_='linescore')
+
+    # Check the header for OT and OT2 columns
+    headers = [th.get_text().strip()
+               for th in linescore_table.find('thead').find_all('th')]
+    has_ot = "OT" in headers
+    has_ot2 = "OT2" in headers
+
+    team_rows = linescore_table.find_all('tr')[1:]
+
+    # Process scores for away and home teams
+    for index, team_id in enumerate([away_team_id, home_team_id]):
+        row = team_rows[index]
+
+        scores = [td.get_text().strip()
+                  for td in row.find_all('td')[2:2 + len(headers) - 2]]
+        # Ensure scores has enough elements
+        scores.extend(['0'] * (5 - len(scores)))
+
+        # Unpack scores
+        q1pts, q2pts, q3pts, q4pts, *ot = scores
+        final_score = scores[-1]
+
+        # Calculate OT points
+        if has_ot and has_ot2:  # Both OT and OT2 columns exist
+            otpts = sum(map(int, ot[:2]))
+        elif has_ot:  # Only OT column exists
+            otpts = int(ot[0]) if ot else 0
+        else:  # Neither OT nor OT2
+            otpts = 'N/A'
+
+        linescore_data[team_id] = {
+            'pts': final_score,
+            'q1pts': q1pts,
+            'q2pts': q2pts,
+            'q3pts': q3pts,
+            'q4pts': q4pts,
+            'otpts': otpts
+        }
+
+    return linescore_data
+
+
+
+@profiled()
+def parse_team_stats(soup, home_team_id, away_team_id):
+    """
+    Parses the team stats section to extract various statistics.
+    Returns a dictionary with team IDs as keys and their statistics as values.
+    """
+    team_stats_data = {}
+    team_stats_table = soup.find('table', id='team_stats')
+    stat_rows = team_stats_table.find_all('tr')[1:]
+
+    for row in stat_rows:
+        stat_name = row.find('th').get_text().strip().replace(' ', '_').lower()
+        vis_stat, home_stat = [td.get_text().strip()
+                               for td in row.find_all('td')]
+
+        team_stats_data[away_team_id] = team_stats_data.get(away_team_id, {})
+        team_stats_data[home_team_id] = team_stats_data.get(home_team_id, {})
+
+        team_stats_data[away_team_id][stat_name] = vis_stat
+        team_stats_data[home_team_id][stat_name] = home_stat
+
+    return team_stats_data
+
+
+@profiled()
+def parse_starters(soup, starter_div_id, team_id, game_id):
+    """
+    Parses the starters from a given division ID in the soup object.
+    Returns a list of dictionaries containing starter data for each player.
+    """
+    starters_data = []
+    starters_table = soup.find('div', id=starter_div_id).find('table')
+
+    for row in starters_table.find_all('tr')[1:]:  # Skipping the header row
+        player_cell = row.find('th', {'data-stat': 'player'})
+        position_cell = row.find('td', {'data-stat': 'pos'})
+
+        if player_cell and position_cell:
+            starters_data.append({
+                'game_id': game_id,
+                'team_id': team_id,
+                'player': player_cell.get_text().strip(),
+                'position': position_cell.get_text().strip()
+            })
+
+    return starters_data
+
+
+@profiled()
+def parse_snap_counts(soup, snap_count_div_id, team_id, game_id):
+    """
+    Parses the snap counts from a given division ID in the soup object.
+    Returns a list of dictionaries containing snap count data for each player.
+    If the snap count table is not found, returns an empty list.
+    """
+    snap_counts_data = []
+    snap_counts_div = soup.find('div', id=snap_count_div_id)
+
+    if snap_counts_div:
+        snap_counts_table = snap_counts_div.find('table')
+        if snap_counts_table:
+            # Skipping the header rows
+            for row in snap_counts_table.find_all('tr')[2:]:
+                player_cell = row.find('th', {'data-stat': 'player'})
+                cells = row.find_all('td')
+
+                # Ensuring all necessary cells are present
+                if player_cell and len(cells) >= 6:
+                    snap_counts_data.append({
+                        'game_id': game_id,
+                        'team_id': team_id,
+                        'player': player_cell.get_text().strip(),
+                        'pos': cells[0].get_text().strip(),
+                        'off_num': cells[1].get_text().strip(),
+                        'off_pct': cells[2].get_text().strip(),
+                        'def_num': cells[3].get_text().strip(),
+                        'def_pct': cells[4].get_text().strip(),
+                        'st_num': cells[5].get_text().strip(),
+                        'st_pct': cells[6].get_text().strip()
+                    })
+
+    return snap_counts_data
+
+
+@profiled()
+def parse_drives(soup, drive_div_id, team_id, game_id):
+    """
+    Parses the drive data for a team from a given division ID in the soup object.
+    Returns a list of dictionaries containing drive data for each drive.
+    """
+    drives_data = []
+    drives_table = soup.find('div', id=drive_div_id).find('table')
+
+    for row in drives_table.find_all('tr')[1:]:  # Skipping the header row
+        cells = row.find_all('td')
+        if cells:
+            drives_data.append({
+                'game_id': game_id,
+                'team_id': team_id,
+                'num': row.find('th', {'data-stat': 'drive_num'}).get_text().strip(),
+                'quarter': cells[0].get_text().strip(),
+                'time': cells[1].get_text().strip(),
+                'los': cells[2].get_text().strip(),
+                'plays': cells[3].get_text().strip(),
+                'length': cells[4].get_text().strip(),
+                'net_yds': cells[5].get_text().strip(),
+                'result': cells[6].get_text().strip()
+            })
+
+    return drives_data
@@ -0,0 +1,99 @@
+"""
+Checkpoint Utilities
+
+Description: Crash safe progress for long scraping runs. Rows are appended to the raw tables as they are scraped
+instead of being held in memory until the end, and a progress journal records which keys have been written, so
+a restarted run skips them. Rows of keys that were written but never journaled (a crash between the two) are
+removed before the run continues, so nothing is written twice.
+"""
+import json
+import os
+
+import pandas as pd
+
+from utils.storage import table_path
+
+
+class ProgressJournal:
+    """
+    Append-only journal of completed keys, one JSON line per key, synced to disk on every write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self):
+        """Set of keys journaled so far. A partially written last line is ignored."""
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)['key'])
+                    except (ValueError, KeyError):
+                        continue
+        return done
+
+    def mark(self, keys):
+        """Record keys as completed."""
+        if not keys:
+            return
+        with open(self.path, 'a') as f:
+            f.write(''.join(json.dumps({'key': key}) + '\n' for key in keys))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        """Remove the journal once the whole batch is done."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _read_csv_text(path, columns=None):
+    """Read a CSV with every value kept as its original text, so rewriting it leaves the other rows unchanged."""
+    return pd.read_csv(path, usecols=columns, dtype=str, keep_default_na=False)
+
+
+def _replace_csv(df, path):
+    """Rewrite a CSV through a temporary file, so a crash leaves either the old or the new file."""
+    temp_path = f'{path}.tmp'
+    df.to_csv(temp_path, index=False)
+    os.replace(temp_path, path)
+
+
+def append_rows(rows, name, stage='raw'):
+    """
+    Append rows (a list of dictionaries) to a table CSV. Rows missing some of the table's columns are padded.
+    If the rows bring new columns the table is rewritten with the union of the columns instead.
+    """
+    if not rows:
+        return
+    path = table_path(name, stage)
+    new_df = pd.DataFrame(rows)
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _replace_csv(new_df, path)
+        return
+
+    columns = pd.read_csv(path, nrows=0).columns
+    if new_df.columns.isin(columns).all():
+        with open(path, 'a', newline='') as f:
+            new_df.reindex(columns=columns).to_csv(f, header=False, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        _replace_csv(pd.concat([_read_csv_text(path), new_df], ignore_index=True), path)
+
+
+def discard_rows(name, keys, key_column='game_id', stage='raw'):
+    """
+    Remove the rows whose key_column is in keys from a table CSV, if there are any.
+    """
+    path = table_path(name, stage)
+    if not keys or not os.path.exists(path):
+        return
+    if not _read_csv_text(path, [key_column])[key_column].isin(keys).any():
+        return
+    df = _read_csv_text(path)
+    _replace_csv(df[~df[key_column].isin(keys)], path)
@@ -0,0 +1,100 @@
+"""
+Download Utilities
+
+Description: Refreshes the nflverse files used by missing.py. Every download is kept verbatim in data/raw/downloads/
+together with its ETag and Last-Modified headers, and later refreshes send conditional requests, so an unchanged
+file costs a 304 response instead of a full download, parse and rewrite. With a mirror directory the files are
+copied from there instead (CI and offline runs); the downloads directory itself can serve as a mirror.
+"""
+import hashlib
+import json
+import os
+from urllib.parse import urlparse
+
+from utils.fetching import pooled_session
+from utils.profiling import profiled
+from utils.storage import DATA_DIR
+
+DOWNLOAD_DIR = os.path.join(DATA_DIR, 'raw', 'downloads')
+
+
+def download_path(url):
+    """
+    Where the latest download of url is kept, e.g. data/raw/downloads/games.csv.
+    """
+    return os.path.join(DOWNLOAD_DIR, os.path.basename(urlparse(url).path))
+
+
+def _meta_path(path):
+    return f'{path}.meta.json'
+
+
+def read_meta(path):
+    """
+    Metadata stored with a download (url, etag, last_modified, sha256 and any extra fields), empty if there is none.
+    """
+    if not os.path.exists(path) or not os.path.exists(_meta_path(path)):
+        return {}
+    with open(_meta_path(path)) as f:
+        return json.load(f)
+
+
+def update_meta(path, **fields):
+    """
+    Add or replace fields of the metadata stored with a download.
+    """
+    meta = {**read_meta(path), **fields}
+    with open(f'{_meta_path(path)}.tmp', 'w') as f:
+        json.dump(meta, f, indent=1, sort_keys=True)
+    os.replace(f'{_meta_path(path)}.tmp', _meta_path(path))
+
+
+def _sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _store(path, content, **fields):
+    """
+    Write a download and its metadata. Returns False if the content is the same as the stored copy.
+    """
+    digest = _sha256(content)
+    if read_meta(path).get('sha256') == digest:
+        update_meta(path, **fields)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(f'{path}.tmp', path)
+    update_meta(path, sha256=digest, **fields)
+    return True
+
+
+@profiled()
+def refresh_download(url, session=None, mirror=None, base_url=None, timeout=30):
+    """
+    Bring the stored copy of url up to date. Sends a conditional GET with the stored validators on a pooled
+    session, or copies the file from a mirror directory. base_url replaces the host of url, e.g. to use a local
+    fake_server.py. Returns the path of the stored copy and whether it changed.
+    Raises requests.RequestException or OSError if the file cannot be fetched.
+    """
+    path = download_path(url)
+    if mirror:
+        with open(os.path.join(mirror, os.path.basename(path)), 'rb') as f:
+            return path, _store(path, f.read(), url=url)
+
+    fetch_url = base_url.rstrip('/') + urlparse(url).path if base_url else url
+    meta = read_meta(path)
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    session = session or pooled_session()
+    response = session.get(fetch_url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return path, False
+    response.raise_for_status()
+    changed = _store(path, response.content, url=url, etag=response.headers.get('ETag'),
+                     last_modified=response.headers.get('Last-Modified'))
+    return path, changed
@@ -0,0 +1,48 @@
+"""
+Drive Matching Utilities
+
+Description: Assigns each penalty to the drive it occurred in. A penalty belongs to the last drive (in the
+order of the drives dataframe) from the same game whose time left is at or above the penalty's time left.
+The assignment is done with one as-of join per game instead of masking every drive for every penalty.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.profiling import profiled
+
+
+@profiled()
+def assign_drives(drives_df, penalties_df):
+    """
+    Returns an array with the position of the matching drive for each penalty, or -1 if there is none.
+    Drives are sorted by game and time left, and the running maximum of their frame position is taken
+    from the end of each game, so the drive with the largest position among all drives at or above a
+    given time is found by a single forward merge_asof. This keeps the result identical to the loop even
+    when the frame order within a game is not monotonic in time (overtime strings, ties).
+    """
+    drives = pd.DataFrame({
+        'game_id': drives_df['game_id'].to_numpy(),
+        'time_left_timedelta': pd.to_timedelta(drives_df['time_left']).to_numpy(),
+        'drive_position': np.arange(len(drives_df), dtype=np.int64)
+    }).dropna(subset=['time_left_timedelta'])
+    drives = drives.sort_values(by=['game_id', 'time_left_timedelta'], kind='stable')
+
+    # Largest frame position among the drives at or after this one in ascending time order
+    drives['drive_position'] = drives.iloc[::-1].groupby('game_id', sort=False)['drive_position'].cummax()
+    drives = drives.drop_duplicates(subset=['game_id', 'time_left_timedelta'], keep='first')
+
+    penalties = pd.DataFrame({
+        'game_id': penalties_df['game_id'].to_numpy(),
+        'time_left_timedelta': pd.to_timedelta(penalties_df['time_left']).to_numpy(),
+        'penalty_position': np.arange(len(penalties_df), dtype=np.int64)
+    }).dropna(subset=['time_left_timedelta'])
+
+    matched = pd.merge_asof(
+        penalties.sort_values('time_left_timedelta', kind='stable'),
+        drives.sort_values('time_left_timedelta', kind='stable'),
+        on='time_left_timedelta', by='game_id', direction='forward')
+    matched = matched.dropna(subset=['drive_position'])
+
+    positions = np.full(len(penalties_df), -1, dtype=np.int64)
+    positions[matched['penalty_position'].to_numpy()] = matched['drive_position'].to_numpy(dtype=np.int64)
+    return positions
@@ -0,0 +1,117 @@
+"""
+Fake Page Server
+
+Description: Local stand-in for the scraped sites. Serves stored HTML pages from a directory, looked up by the last
+part of the requested path (e.g. /boxscores/200909100pit.htm serves <directory>/200909100pit.htm), and records the
+time of every request so runs of the scrapers can be checked against the rate limit without touching the network.
+Pages that differ by query string are stored with the query appended, e.g. /team/kansas-city-chiefs?year=2023&view=log
+serves <directory>/kansas-city-chiefs_year-2023_view-log.htm. Responses carry ETag and Last-Modified headers and
+conditional requests for unchanged files are answered with 304 Not Modified, like the nflverse downloads.
+
+Usage: python fake_server.py --pages <directory> [--port 8000], then run the scraper with --base-url http://127.0.0.1:8000
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def page_file(directory, path):
+    """
+    Stored page for a request path, with the query string in the file name if such a page exists.
+    """
+    url = urlparse(path)
+    name = os.path.basename(url.path)
+    if url.query:
+        query_name = f"{name}_{url.query.replace('=', '-').replace('&', '_')}.htm"
+        if os.path.isfile(os.path.join(directory, query_name)):
+            return os.path.join(directory, query_name)
+    return os.path.join(directory, name)
+
+
+def _make_handler(directory, request_log):
+    class PageHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            request_log.append((time.monotonic(), self.path))
+            page_path = page_file(directory, self.path)
+            if not os.path.isfile(page_path):
+                self.send_error(404)
+                return
+            with open(page_path, 'rb') as f:
+                body = f.read()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            modified = int(os.path.getmtime(page_path))
+            since = self.headers.get('If-Modified-Since')
+            if self.headers.get('If-None-Match') == etag or (
+                    since and 'If-None-Match' not in self.headers and parsedate_to_datetime(since).timestamp() >= modified):
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            content_type = 'text/csv' if page_path.endswith('.csv') else 'text/html; charset=utf-8'
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(modified, usegmt=True))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PageHandler
+
+
+@contextmanager
+def serve_pages(directory, port=0):
+    """
+    Serves the pages in directory on localhost in a background thread.
+    Yields the base URL and the list of (time, path) requests received so far.
+    """
+    request_log = []
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(directory, request_log))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}', request_log
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def max_requests_per_minute(request_log):
+    """
+    Largest number of requests received within any 60 second window.
+    """
+    times = sorted(t for t, _ in request_log)
+    most, start = 0, 0
+    for end, t in enumerate(times):
+        while t - times[start] >= 60:
+            start += 1
+        most = max(most, end - start + 1)
+    return most
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve stored pages and files in place of the scraped sites.')
+    parser.add_argument('--pages', required=True, help='directory with the stored .htm pages and .csv files')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    with serve_pages(args.pages, args.port) as (base_url, request_log):
+        print(f'Serving {args.pages} at {base_url}, press Ctrl+C to stop')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(f'{len(request_log)} requests, at most {max_requests_per_minute(request_log)} in one minute')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Fetch Scheduling Utilities
+
+Description: Rate limited page fetching for the scrapers. A token bucket keeps requests within the site's budget
+(pro-football-reference allows 20 requests per minute), and a small thread pool fetches and parses pages so the
+parsing of one page overlaps with the wait for the next request. Pages are fetched with a pluggable backend:
+plain HTTP with a pooled session, or Selenium for pages that need a browser.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.profiling import profiled
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Tokens refill at rate_per_minute and at most capacity requests can be made back to back.
+    """
+
+    def __init__(self, rate_per_minute=20, capacity=1):
+        self.interval = 60.0 / rate_per_minute
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @profiled()
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+def uncomment_html(html_source):
+    """
+    pro-football-reference ships most tables inside HTML comments and uncomments them with JavaScript.
+    Removing the comment markers gives the same tables a browser would render.
+    """
+    return html_source.replace('<!--', '').replace('-->', '')
+
+
+def pooled_session(pool_size=4):
+    """A requests session that keeps up to pool_size connections per host open between requests."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class HttpFetcher:
+    """Fetches pages with a pooled requests session. Returns None for failed requests."""
+
+    def __init__(self, timeout=12, pool_size=4):
+        self.timeout = timeout
+        self.session = pooled_session(pool_size)
+
+    @profiled()
+    def fetch(self, url):
+        """Returns the HTML source of url with commented out tables restored, or None."""
+        import requests
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Request Exception: {url}: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"HTTP {response.status_code}: {url}")
+            return None
+        return uncomment_html(response.text)
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetcher:
+    """
+    Fetches pages with one WebDriver per worker thread, as WebDrivers are not thread safe.
+    setup_driver() creates a driver and get_source(url, driver) returns the page source or None.
+    """
+
+    def __init__(self, setup_driver, get_source):
+        self.setup_driver = setup_driver
+        self.get_source = get_source
+        self.local = threading.local()
+        self.drivers = []
+        self.lock = threading.Lock()
+
+    @profiled()
+    def fetch(self, url):
+        """Returns the rendered HTML source of url, or None."""
+        if not hasattr(self.local, 'driver'):
+            self.local.driver = self.setup_driver()
+            with self.lock:
+                self.drivers.append(self.local.driver)
+        return self.get_source(url, self.local.driver)
+
+    def close(self):
+        for driver in self.drivers:
+            driver.close()
+
+
+def fetch_pages(items, fetcher, bucket, handle, workers=2):
+    """
+    Fetches every (key, url) in items under the rate limit of bucket, using workers threads, and calls
+    handle(key, html_source) in the same thread once a page is loaded. Yields (key, url, result, error) in the
+    order of items, where error is the exception raised while fetching or handling the page, if any.
+    Only a few pages per worker are in flight at a time, so memory does not grow with the number of items.
+    Closing the generator early cancels the pages that have not started yet.
+    """
+    def task(key, url):
+        bucket.acquire()
+        return handle(key, fetcher.fetch(url))
+
+    items = iter(items)
+    in_flight = deque()
+
+    def submit_next():
+        item = next(items, None)
+        if item is not None:
+            key, url = item
+            in_flight.append((key, url, executor.submit(task, key, url)))
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for _ in range(2 * workers):
+            submit_next()
+        while in_flight:
+            key, url, future = in_flight.popleft()
+            error = future.exception()
+            yield key, url, None if error else future.result(), error
+            submit_next()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,113 @@
+"""
+Normalization Utilities
+
+Description: Column-wise normalization of game IDs, team codes and start times, shared by missing.py and
+clean_penalties.py. Game IDs are split once into typed season, week and team columns. Team codes are remapped as a
+categorical recode, so every mapping is applied once per distinct value instead of once per row. The team name
+mappings that were spread over the scripts are kept here as the single source of truth.
+"""
+import numpy as np
+import pandas as pd
+
+# nflverse codes of relocated teams and the code used for them in this project
+TEAM_CODE_CHANGES = {'LA': 'LAR', 'SD': 'LAC', 'OAK': 'LV', 'STL': 'LAR'}
+
+# Team names in nflpenalties.com URLs and the Team column of penalties.csv
+PENALTY_TEAM_IDS = {
+    'arizona-cardinals': 'ARI', 'atlanta-falcons': 'ATL', 'baltimore-ravens': 'BAL',
+    'buffalo-bills': 'BUF', 'carolina-panthers': 'CAR', 'chicago-bears': 'CHI',
+    'cincinnati-bengals': 'CIN', 'cleveland-browns': 'CLE', 'dallas-cowboys': 'DAL',
+    'denver-broncos': 'DEN', 'detroit-lions': 'DET', 'green-bay-packers': 'GB',
+    'houston-texans': 'HOU', 'indianapolis-colts': 'IND', 'jacksonville-jaguars': 'JAX',
+    'kansas-city-chiefs': 'KC', 'las-vegas-raiders': 'LV', 'los-angeles-chargers': 'LAC',
+    'los-angeles-rams': 'LAR', 'miami-dolphins': 'MIA', 'minnesota-vikings': 'MIN',
+    'new-england-patriots': 'NE', 'new-orleans-saints': 'NO', 'new-york-giants': 'NYG',
+    'new-york-jets': 'NYJ', 'philadelphia-eagles': 'PHI', 'pittsburgh-steelers': 'PIT',
+    'san-francisco-49ers': 'SF', 'seattle-seahawks': 'SEA', 'tampa-bay-buccaneers': 'TB',
+    'tennessee-titans': 'TEN', 'washington-commanders': 'WAS'
+}
+
+# Opponent names in the Opp column of penalties.csv, including the cities of relocated teams
+PENALTY_OPPONENT_IDS = {
+    'San Francisco': 'SF', 'Jacksonville': 'JAX', 'Arizona': 'ARI', 'Indianapolis': 'IND',
+    'Houston': 'HOU', 'Seattle': 'SEA', 'N.Y. Giants': 'NYG', 'Carolina': 'CAR',
+    'Chicago': 'CHI', 'St. Louis': 'LAR', 'Tennessee': 'TEN', 'Minnesota': 'MIN',
+    'Detroit': 'DET', 'Green Bay': 'GB', 'New Orleans': 'NO', 'Miami': 'MIA',
+    'New England': 'NE', 'Dallas': 'DAL', 'Washington': 'WAS', 'Tampa Bay': 'TB',
+    'Philadelphia': 'PHI', 'N.Y. Jets': 'NYJ', 'Buffalo': 'BUF', 'Kansas City': 'KC',
+    'San Diego': 'LAC', 'Cleveland': 'CLE', 'Cincinnati': 'CIN', 'Denver': 'DEN',
+    'Pittsburgh': 'PIT', 'Oakland': 'LV', 'Atlanta': 'ATL', 'Baltimore': 'BAL',
+    'LA Rams': 'LAR', 'LA Chargers': 'LAC', 'Las Vegas': 'LV'
+}
+
+START_TIME_FORMATS = ['%H:%M:%S', '%I:%M%p']
+DEFAULT_START_TIME = '16:00:00'
+
+
+def recode(values, mapping, keep_unmapped=True, categorical=False):
+    """
+    Map every value of a Series through mapping, looking each distinct value up only once. Values missing from the
+    mapping are kept with keep_unmapped, otherwise they become NaN like Series.map. Returns a categorical Series
+    with categorical=True.
+    """
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([mapping.get(value, value if keep_unmapped else np.nan)
+                       for value in np.asarray(uniques, dtype=object)], dtype=object)
+    if categorical:
+        mapped = pd.Categorical(mapped)
+        recoded = pd.Categorical.from_codes(np.where(codes >= 0, mapped.codes[codes], -1), mapped.categories)
+        return pd.Series(recoded, index=values.index, name=values.name)
+    result = mapped[codes]
+    result[codes < 0] = np.nan
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def parse_game_ids(game_ids):
+    """
+    Split game IDs of the form season_week_away_home into a DataFrame of int season and week columns and
+    categorical away_team and home_team columns. Leading zeros of the week (nflverse's 2009_01_TEN_PIT) are dropped.
+    """
+    parts = game_ids.str.split('_', n=3, expand=True)
+    return pd.DataFrame({
+        'season': parts[0].astype(int),
+        'week': parts[1].astype(int),
+        'away_team': parts[2].astype('category'),
+        'home_team': parts[3].astype('category'),
+    }, index=game_ids.index)
+
+
+def format_game_ids(season, week, away_team, home_team):
+    """
+    Build game IDs of the form season_week_away_home from aligned columns.
+    """
+    return (season.astype(str) + '_' + week.astype(str) + '_' +
+            away_team.astype(str) + '_' + home_team.astype(str))
+
+
+def normalize_games(games_df):
+    """
+    Normalize the game_id, away_team and home_team of the nflverse games table: drop the leading zeros of the week
+    and replace the codes of relocated teams with the current ones.
+    """
+    parts = parse_game_ids(games_df['game_id'])
+    games_df['game_id'] = format_game_ids(parts['season'], parts['week'],
+                                          recode(parts['away_team'], TEAM_CODE_CHANGES, categorical=True),
+                                          recode(parts['home_team'], TEAM_CODE_CHANGES, categorical=True))
+    games_df['away_team'] = recode(games_df['away_team'], TEAM_CODE_CHANGES)
+    games_df['home_team'] = recode(games_df['home_team'], TEAM_CODE_CHANGES)
+    return games_df
+
+
+def parse_start_times(start_times):
+    """
+    Parse start times written as 24 hour (13:00:00) or 12 hour (1:00pm) times into time objects, with one
+    vectorized parse per format. Times in neither format default to 4 PM.
+    """
+    parsed = pd.Series(pd.NaT, index=start_times.index, dtype='datetime64[ns]')
+    for time_format in START_TIME_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(start_times[missing], format=time_format, errors='coerce')
+    parsed = parsed.fillna(pd.to_datetime(DEFAULT_START_TIME, format='%H:%M:%S'))
+    return parsed.dt.time
@@ -0,0 +1,101 @@
+"""
+HTML Page Cache
+
+Description: On-disk cache of the pages fetched by the scrapers, so parser fixes and new columns can be applied by
+re-parsing stored pages instead of re-scraping under the rate limit. Pages are stored gzip compressed under the
+SHA-256 of their content (data/html/<site>/objects/ab/abcd....html.gz), and an append-only index maps every URL to
+the hash of its latest page together with the key (game_id, team and year) it was scraped for.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+from utils.storage import DATA_DIR
+
+CACHE_DIR = os.path.join(DATA_DIR, 'html')
+
+
+class PageCache:
+    """
+    Content addressed page store for one site. Safe to write from several threads of one process.
+    """
+
+    def __init__(self, site):
+        self.directory = os.path.join(CACHE_DIR, site)
+        self.index_path = os.path.join(self.directory, 'index.jsonl')
+        self.lock = threading.Lock()
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], f'{digest}.html.gz')
+
+    def put(self, url, html_source, key=None):
+        """
+        Store a page and point url at it. Identical pages are only stored once.
+        """
+        data = html_source.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(gzip.compress(data, mtime=0))
+            os.replace(temp_path, path)
+
+        entry = {'url': url, 'key': key, 'sha256': digest, 'fetched': datetime.now().isoformat(timespec='seconds')}
+        with self.lock, open(self.index_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        return digest
+
+    def entries(self):
+        """
+        Latest index entry of every cached URL, in the order the URLs were first cached.
+        """
+        entries = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry['url']] = entry
+        return entries
+
+    def read(self, digest):
+        """
+        HTML source of the page stored under digest.
+        """
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def get(self, url):
+        """
+        Latest cached page of url, or None if it has not been cached.
+        """
+        entry = self.entries().get(url)
+        return self.read(entry['sha256']) if entry else None
+
+
+def _parse_cached(site, parse, key, digest):
+    try:
+        return parse(key, PageCache(site).read(digest))
+    except Exception as e:
+        print(f"Failed to parse cached page {key}: {e}")
+        return None
+
+
+def reparse_pages(site, parse, workers=None):
+    """
+    Call parse(key, html_source) on every cached page of a site in a pool of worker processes, without any
+    network access. parse has to be a module level function. Returns the results in index order, with None
+    for pages that failed to parse.
+    """
+    entries = list(PageCache(site).entries().values())
+    keys = [entry['key'] for entry in entries]
+    digests = [entry['sha256'] for entry in entries]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_parse_cached, repeat(site), repeat(parse), keys, digests, chunksize=16))
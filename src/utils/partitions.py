@@ -0,0 +1,181 @@
+"""
+Partition Utilities
+
+Description: Season (or season and week) partitions for the incremental cleaning runs. Every input table is
+hashed per partition and the hashes are kept in a manifest next to the processed table, so a later run only
+reprocesses the partitions whose inputs changed. Processed partitions are stored one file per partition in
+data/processed/<table>/ and concatenated in season/week order to rebuild the full table.
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.profiling import profiled
+from utils.schemas import save_table
+from utils.storage import DATA_DIR, read_table, table_path
+
+PARTITION_LEVELS = ['season', 'week']
+
+
+def partition_labels(season, week=None, by='season'):
+    """
+    Partition label for each row from aligned season and week Series, '2023' when partitioning by season
+    and '2023_5' by week.
+    """
+    season = pd.to_numeric(season, errors='coerce').astype('Int64').astype(str)
+    if by == 'season':
+        return season
+    return season + '_' + pd.to_numeric(week, errors='coerce').astype('Int64').astype(str)
+
+
+def game_id_partitions(game_ids, by='season'):
+    """
+    Partition label for each row from a game_id of the form season_week_away_home.
+    """
+    parts = game_ids.str.split('_', n=2, expand=True)
+    return partition_labels(parts[0], parts[1], by)
+
+
+def _label_key(label):
+    """
+    Sort key that orders labels by season and then week numerically.
+    """
+    return [int(part) if part.isdigit() else -1 for part in label.split('_')]
+
+
+@profiled()
+def hash_partitions(df, labels):
+    """
+    Content hash of the rows of each partition, independent of the row order within the partition.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    codes, uniques = pd.factorize(pd.Series(labels).to_numpy())
+    sums = np.zeros(len(uniques), dtype=np.uint64)
+    np.add.at(sums, codes, row_hashes)
+    counts = np.bincount(codes, minlength=len(uniques))
+    return {label: f'{count}-{total:016x}' for label, count, total in zip(uniques, counts, sums)}
+
+
+def manifest_path(name, stage='processed'):
+    """
+    Path of the manifest recording the input hashes of a processed table.
+    """
+    return table_path(name, stage, 'manifest.json')
+
+
+def load_manifest(name, stage='processed'):
+    """
+    Load the manifest of a processed table, or an empty manifest if it has not been built yet.
+    """
+    path = manifest_path(name, stage)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(name, settings, input_hashes, stage='processed'):
+    """
+    Save the settings and per partition input hashes used to build a processed table.
+    """
+    path = manifest_path(name, stage)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'settings': settings, 'inputs': input_hashes}, f, indent=1, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+
+
+def changed_partitions(manifest, settings, input_hashes):
+    """
+    Labels of the partitions that have to be rebuilt, or None if everything has to be rebuilt because there is
+    no manifest yet or a setting that applies to all partitions (partitioning, columns, penalty types) changed.
+    """
+    if not manifest or manifest.get('settings') != settings:
+        return None
+
+    changed = set()
+    for input_name, hashes in input_hashes.items():
+        old_hashes = manifest['inputs'].get(input_name, {})
+        changed |= {label for label in set(hashes) | set(old_hashes) if hashes.get(label) != old_hashes.get(label)}
+    return changed
+
+
+def partition_dir(name, stage='processed'):
+    """
+    Directory holding the partitions of a processed table.
+    """
+    return os.path.join(DATA_DIR, stage, name)
+
+
+def stored_partitions(name, stage='processed'):
+    """
+    Labels of the partitions stored for a processed table, in season/week order.
+    """
+    files = glob.glob(os.path.join(partition_dir(name, stage), '*.parquet'))
+    files += glob.glob(os.path.join(partition_dir(name, stage), '*.csv'))
+    labels = {os.path.splitext(os.path.basename(path))[0] for path in files}
+    return sorted(labels, key=_label_key)
+
+
+def _remove_partition(name, label, stage):
+    """
+    Delete the stored file of a partition.
+    """
+    for extension in ['parquet', 'csv']:
+        path = table_path(f'{name}/{label}', stage, extension)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_partitions(df, name, labels, changed=None, stage='processed'):
+    """
+    Write the rows of each changed partition to its own file, removing changed partitions that no longer
+    have rows. With changed=None every partition is rewritten and stale partitions are removed.
+    """
+    os.makedirs(partition_dir(name, stage), exist_ok=True)
+    labels = pd.Series(np.asarray(labels), index=df.index)
+    if changed is None:
+        changed = set(labels) | set(stored_partitions(name, stage))
+
+    for label in changed:
+        _remove_partition(name, label, stage)
+    for label, rows in df[labels.isin(changed)].groupby(labels[labels.isin(changed)], sort=False):
+        save_table(rows, f'{name}/{label}', stage, csv=False)
+
+
+def read_partitions(name, stage='processed'):
+    """
+    Concatenate the stored partitions of a processed table in season/week order.
+    """
+    frames = [read_table(f'{name}/{label}', stage) for label in stored_partitions(name, stage)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def select_partitions(name, settings, input_hashes, incremental):
+    """
+    Partitions to rebuild for a processed table: None for a full rebuild, otherwise the set of changed labels.
+    """
+    if not incremental:
+        return None
+    changed = changed_partitions(load_manifest(name), settings, input_hashes)
+    if changed is None:
+        print(f'No usable manifest for {name}, rebuilding every partition.')
+    else:
+        print(f'Reprocessing {len(changed)} changed {name} partitions: {sorted(changed, key=_label_key)}')
+    return changed
+
+
+@profiled()
+def save_partitioned_table(df, name, labels, changed, settings, input_hashes):
+    """
+    Store the rebuilt partitions of a processed table, rewrite the full table and record the manifest.
+    After an incremental run the full table is reassembled from the stored partitions.
+    """
+    write_partitions(df, name, labels, changed)
+    if changed is not None:
+        df = read_partitions(name)
+    save_table(df, name, 'processed')
+    save_manifest(name, settings, input_hashes)
+    return df
@@ -0,0 +1,70 @@
+"""
+Penalty Aggregation Utilities
+
+Description: Shared penalty columns for the cleaning scripts. Penalties are counted and their yards summed per key
+and phase in one grouped pass, then merged back onto the target table in a single merge. Used by clean_games.py
+(keyed by game and team) and clean_drives.py (keyed by drive). The counts of every penalty type are kept apart in
+the long tables of penalty_counts.py.
+"""
+import pandas as pd
+
+TOTAL_COLUMNS = ['total_off_pen', 'total_def_pen', 'total_off_pen_yards', 'total_def_pen_yards']
+
+
+def filter_frequent_penalties(penalties_df, min_count=50, penalty_types=None):
+    """
+    Filter penalties to only penalties that occur min_count+ times and are not special teams penalties.
+    If penalty_types is given, those types are kept instead, e.g. the frequent types over all seasons
+    when only some seasons are being reprocessed.
+    """
+    if penalty_types is None:
+        penalties_count = penalties_df['penalty'].value_counts()
+        penalty_types = penalties_count[penalties_count >= min_count].index.tolist()
+    return penalties_df[(penalties_df['phase'] != 'ST') & (penalties_df['penalty'].isin(penalty_types))].copy()
+
+
+def penalty_totals(penalties_df, keys):
+    """
+    Aggregate penalties to one row per key with the offensive and defensive penalty counts and yards.
+    A missing yardage leaves that key's total missing.
+    """
+    phases = penalties_df[penalties_df['phase'].isin(['Off', 'Def'])]
+    by = [phases[key] for key in keys + ['phase']]
+    totals = pd.DataFrame({
+        'pen': phases.groupby(by, observed=True).size(),
+        'pen_yards': phases['yardage'].groupby(by, observed=True).sum().mask(
+            phases['yardage'].isna().groupby(by, observed=True).any())
+    }).unstack('phase')
+    totals = totals.reindex(columns=pd.MultiIndex.from_product([['pen', 'pen_yards'], ['Off', 'Def']]))
+    totals.columns = TOTAL_COLUMNS
+
+    for column in ['total_off_pen', 'total_def_pen']:
+        totals[column] = totals[column].fillna(0)
+        totals[column + '_yards'] = totals[column + '_yards'].where(totals[column] > 0, 0)
+    return totals.reset_index()
+
+
+def _integer_if_lossless(values):
+    """
+    Mirrors pandas keeping an int64 column as int64 when only integral values are added to it.
+    """
+    if values.notna().all() and (values % 1 == 0).all():
+        return values.astype('int64')
+    return values
+
+
+def merge_penalty_totals(df, aggregated, keys):
+    """
+    Left merge aggregated penalty columns onto df, filling rows without penalties with zeros.
+    The index and row order of df are preserved.
+    """
+    merged = df.merge(aggregated, on=keys, how='left')
+    merged.index = df.index
+
+    matched = merged['total_off_pen'].notna()
+    for column in aggregated.columns.drop(keys):
+        if column.endswith('_yards'):
+            merged[column] = _integer_if_lossless(merged[column].where(matched, 0))
+        else:
+            merged[column] = merged[column].fillna(0).astype('int64')
+    return merged
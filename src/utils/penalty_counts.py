@@ -0,0 +1,131 @@
+"""
+Penalty Count Utilities
+
+Description: Long format store of the per penalty type counts of the processed tables. Instead of one mostly zero
+column per frequent penalty type, team_performances and drives keep only their penalty totals, and the counts are
+stored as one row per key and penalty type that occurred (team_penalty_counts and drive_penalty_counts, with the
+count and yards of every type). widen_counts and sparse_counts turn them back into a dense DataFrame or a
+scipy.sparse matrix aligned with the rows of a table, and load_wide_table rebuilds the old wide layout.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.partitions import load_manifest
+from utils.penalty_aggregation import TOTAL_COLUMNS
+from utils.schemas import load_table
+from utils.storage import table_path
+
+try:
+    from scipy import sparse
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+TEAM_KEYS = ['game_id', 'team_id']
+DRIVE_KEYS = ['game_id', 'team_id', 'num']
+
+# Processed table -> (its long penalty count table, the keys the counts are stored under)
+COUNT_TABLES = {
+    'team_performances': ('team_penalty_counts', TEAM_KEYS),
+    'drives': ('drive_penalty_counts', DRIVE_KEYS),
+}
+
+
+def count_penalties(penalties_df, keys, penalty_types):
+    """
+    Count every penalty type per key, with the summed yards, as rows of keys, penalty, count and yards sorted by
+    key and then penalty_types order. Penalties of other types are left out and a missing yardage leaves that
+    row's yards missing.
+    """
+    penalty = pd.Series(pd.Categorical(penalties_df['penalty'], categories=penalty_types),
+                        index=penalties_df.index, name='penalty')
+    by = [penalties_df[key] for key in keys] + [penalty]
+    yardage = penalties_df['yardage']
+    counts = pd.DataFrame({
+        'count': yardage.groupby(by, observed=True).size(),
+        'yards': yardage.groupby(by, observed=True).sum().mask(yardage.isna().groupby(by, observed=True).any())
+    }).reset_index()
+    counts['penalty'] = counts['penalty'].astype(object)
+    return counts
+
+
+def stored_penalty_types(name, counts=None):
+    """
+    Penalty types of a processed table in their column order, as recorded in its manifest. Without a manifest the
+    types are taken from the counts in order of appearance.
+    """
+    types = load_manifest(name).get('settings', {}).get('penalty_types')
+    if types is None and counts is not None:
+        types = pd.unique(counts['penalty'].astype(object)).tolist()
+    return types
+
+
+def _positions(df, counts, keys, penalty_types):
+    """
+    Index of every row of df in the unique keys of df, and the unique key and penalty type index of every count
+    row (-1 where the key is not in df or the type is not in penalty_types).
+    """
+    row_keys = pd.MultiIndex.from_frame(df[keys].astype(object))
+    unique_keys = row_keys.unique()
+    rows = unique_keys.get_indexer(row_keys)
+    count_rows = unique_keys.get_indexer(pd.MultiIndex.from_frame(counts[keys].astype(object)))
+    count_columns = pd.Index(penalty_types).get_indexer(counts['penalty'].astype(object))
+    return rows, len(unique_keys), count_rows, count_columns
+
+
+def widen_counts(df, counts, keys, penalty_types, value='count'):
+    """
+    Dense DataFrame aligned with df with one column per penalty type, holding the value ('count' or 'yards') of
+    the key of each row and zero where no penalty of the type was recorded.
+    """
+    rows, n_keys, count_rows, count_columns = _positions(df, counts, keys, penalty_types)
+    values = counts[value].to_numpy()
+    found = (count_rows >= 0) & (count_columns >= 0)
+    dense = np.zeros((n_keys, len(penalty_types)), dtype=values.dtype)
+    dense[count_rows[found], count_columns[found]] = values[found]
+    return pd.DataFrame(dense[rows], index=df.index, columns=list(penalty_types))
+
+
+def sparse_counts(df, counts, keys, penalty_types, value='count'):
+    """
+    Same as widen_counts as a scipy.sparse CSR matrix, with the columns in penalty_types order.
+    Raises ImportError if scipy is not installed.
+    """
+    if not HAS_SCIPY:
+        raise ImportError('sparse_counts needs scipy, install it with pip install scipy')
+    rows, n_keys, count_rows, count_columns = _positions(df, counts, keys, penalty_types)
+    found = (count_rows >= 0) & (count_columns >= 0)
+    matrix = sparse.csr_matrix((counts[value].to_numpy()[found], (count_rows[found], count_columns[found])),
+                               shape=(n_keys, len(penalty_types)))
+    return matrix[rows]
+
+
+def with_penalty_columns(df, counts, keys, penalty_types):
+    """
+    df with a count column for every penalty type inserted before its penalty totals, the layout the processed
+    tables had before the counts were stored in long format.
+    """
+    wide = widen_counts(df, counts, keys, penalty_types)
+    position = df.columns.get_loc(TOTAL_COLUMNS[0]) if TOTAL_COLUMNS[0] in df.columns else len(df.columns)
+    return pd.concat([df.iloc[:, :position], wide, df.iloc[:, position:]], axis=1)
+
+
+def load_penalty_counts(name, typed=True):
+    """
+    The long penalty counts of a processed table, e.g. load_penalty_counts('drives').
+    """
+    return load_table(COUNT_TABLES[name][0], 'processed', typed=typed)
+
+
+def load_wide_table(name, typed=True):
+    """
+    Load team_performances or drives with a count column for every penalty type, widened from the long counts.
+    Tables built before the counts were stored in long format still hold the count columns and are returned as is.
+    """
+    df = load_table(name, 'processed', typed=typed)
+    if not os.path.exists(table_path(COUNT_TABLES[name][0], 'processed')):
+        return df
+    counts = load_penalty_counts(name, typed)
+    return with_penalty_columns(df, counts, COUNT_TABLES[name][1], stored_penalty_types(name, counts))
@@ -0,0 +1,221 @@
+"""
+Pipeline Utilities
+
+Description: Runs the pipeline scripts as one dependency graph. Every PipelineStage declares the tables it reads
+and writes, and a stage depends on the stages that write its inputs. Like make, a stage is skipped when its inputs,
+its outputs and its arguments are the same as when it last ran; the content hashes of those files are kept in
+data/processed/pipeline.manifest.json and only recomputed for files whose size or modification time changed.
+Stages whose dependencies are done run in parallel threads of one process, and tables read by several stages are
+kept in memory by storage.shared_tables, so each is parsed once per run. External stages fetch from the web and
+always run, since their inputs are not files.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.profiling import PROFILER
+from utils.storage import DATA_DIR, drop_shared_table, shared_tables, table_path
+
+STATE_PATH = table_path('pipeline', 'processed', 'manifest.json')
+PROJECT_DIR = os.path.dirname(DATA_DIR)
+
+
+class PipelineStage:
+    """
+    A step of the pipeline. run is called with the list of command line arguments of the stage. inputs and outputs
+    are (name, stage) tables of the data directory or paths of other files.
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), external=False):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.external = external
+
+
+def file_path(entry):
+    """Path of a declared input or output."""
+    return table_path(*entry) if isinstance(entry, tuple) else entry
+
+
+def file_key(entry):
+    """Name of a declared file in the manifest, relative to the project directory."""
+    return os.path.relpath(file_path(entry), PROJECT_DIR)
+
+
+def file_digest(path, known=None):
+    """
+    [size, mtime_ns, sha256] of a file, or None if it does not exist. The hash of known, an earlier result for
+    the same file, is reused when the size and modification time are unchanged.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return known
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(chunk)
+    return [stat.st_size, stat.st_mtime_ns, digest.hexdigest()[:16]]
+
+
+def dependencies(stages):
+    """
+    For every stage the names of the earlier stages that write one of its inputs. Raises ValueError if an input
+    is only written by a later stage, since the stages have to be listed in an order they can run in.
+    """
+    writers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            writers.setdefault(file_key(output), []).append(stage.name)
+
+    order = {stage.name: i for i, stage in enumerate(stages)}
+    depends = {}
+    for stage in stages:
+        names = {writer for entry in stage.inputs for writer in writers.get(file_key(entry), [])} - {stage.name}
+        later = [name for name in names if order[name] > order[stage.name]]
+        if later:
+            raise ValueError(f'{stage.name} reads the output of {", ".join(later)}, which comes after it')
+        depends[stage.name] = names
+    return depends
+
+
+class Pipeline:
+    """
+    Runs a list of stages, given in an order they can run in, with the state of their last runs.
+    """
+
+    def __init__(self, stages, state_path=STATE_PATH):
+        self.stages = {stage.name: stage for stage in stages}
+        self.depends = dependencies(stages)
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.state = {'stages': {}, 'files': {}}
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                self.state = json.load(f)
+
+    def save_state(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(f'{self.state_path}.tmp', 'w') as f:
+                json.dump(self.state, f, indent=1, sort_keys=True)
+            os.replace(f'{self.state_path}.tmp', self.state_path)
+
+    def digests(self, entries):
+        """Content hash (or None) of every declared file, reusing the hashes of unchanged files."""
+        hashes = {}
+        for entry in entries:
+            key = file_key(entry)
+            with self.lock:
+                known = self.state['files'].get(key)
+            digest = file_digest(file_path(entry), known)
+            with self.lock:
+                self.state['files'][key] = digest
+            hashes[key] = digest[2] if digest else None
+        return hashes
+
+    def is_current(self, stage, argv):
+        """
+        True if the stage ran with the same arguments, inputs and outputs before and every output still exists.
+        """
+        last = self.state['stages'].get(stage.name)
+        if stage.external or not last or last['argv'] != argv:
+            return False
+        outputs = self.digests(stage.outputs)
+        return (None not in outputs.values() and last['outputs'] == outputs and
+                last['inputs'] == self.digests(stage.inputs))
+
+    def run_stage(self, stage, argv, force):
+        """
+        Run one stage unless it is current, and record its inputs and outputs. Returns its status: 'ran',
+        'current' or 'failed'. A stage fails if it raises, returns a non-zero status like a script's exit code or
+        leaves one of its outputs missing; a failed stage is not recorded, so it runs again next time.
+        """
+        if not force and self.is_current(stage, argv):
+            print(f'[{stage.name}] inputs unchanged, skipped')
+            return 'current'
+
+        print(f"[{stage.name}] running {' '.join(argv)}".rstrip())
+        inputs = self.digests(stage.inputs)
+        try:
+            with PROFILER.stage(f'stage:{stage.name}'):
+                status = stage.run(argv)
+        except (Exception, SystemExit):
+            # argparse exits on bad arguments, which should not end the other stages
+            print(f'[{stage.name}] failed:\n{traceback.format_exc()}')
+            return 'failed'
+        if status:
+            print(f'[{stage.name}] failed with status {status}')
+            return 'failed'
+
+        outputs = self.digests(stage.outputs)
+        missing = [key for key, digest in outputs.items() if digest is None]
+        if missing:
+            print(f"[{stage.name}] failed, did not write {', '.join(missing)}")
+            return 'failed'
+        with self.lock:
+            self.state['stages'][stage.name] = {'argv': argv, 'inputs': inputs, 'outputs': outputs,
+                                                'finished': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.save_state()
+        return 'ran'
+
+    def run(self, names=None, argvs=None, jobs=2, force=False, offline=False):
+        """
+        Run the named stages (all by default) in dependency order, up to jobs at a time. Dependencies that are not
+        named are taken as they are on disk. argvs maps stage names to their arguments. force runs every stage,
+        offline none of the external ones. Returns the status and seconds of every named stage.
+        """
+        names = [name for name in self.stages if names is None or name in names]
+        argvs = argvs or {}
+        results = {}
+
+        # Tables read by several stages are parsed once and released after their last reader
+        readers = {}
+        for name in names:
+            for entry in self.stages[name].inputs:
+                if isinstance(entry, tuple):
+                    readers[entry] = readers.get(entry, 0) + 1
+        shared = [entry for entry, count in readers.items() if count > 1]
+
+        def finish(name, result):
+            results[name] = result
+            for entry in self.stages[name].inputs:
+                if entry in readers:
+                    readers[entry] -= 1
+                    if readers[entry] == 0:
+                        drop_shared_table(*entry)
+
+        def execute(name):
+            start = time.perf_counter()
+            status = self.run_stage(self.stages[name], argvs.get(name, []), force)
+            return status, time.perf_counter() - start
+
+        pending = list(names)
+        running = {}
+        with shared_tables(shared), ThreadPoolExecutor(max_workers=jobs) as executor:
+            while pending or running:
+                for name in list(pending):
+                    blockers = self.depends[name] & set(names)
+                    if any(results.get(blocker, ('',))[0] in ['failed', 'blocked'] for blocker in blockers):
+                        finish(name, ('blocked', 0.0))
+                    elif offline and self.stages[name].external:
+                        finish(name, ('offline', 0.0))
+                    elif all(blocker in results for blocker in blockers):
+                        running[executor.submit(execute, name)] = name
+                    else:
+                        continue
+                    pending.remove(name)
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(running.pop(future), future.result())
+        return {name: results[name] for name in names}
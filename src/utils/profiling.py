@@ -0,0 +1,178 @@
+"""
+Profiling Utilities
+
+Description: Lightweight timing of the pipeline stages. Functions decorated with profiled and blocks run under
+PROFILER.stage add their wall time, the rows they return and the peak RSS of the process to per stage totals.
+profile_run wraps the main of a script and writes the totals of the run to data/profiles/: a JSON report per run and
+one row per stage appended to <script>.csv, so runs can be compared over time (see compare_profiles.py).
+Stages are collected per process, so the parsing done in the worker processes of --reparse is not included.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.storage import DATA_DIR
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILES_DIR = os.path.join(DATA_DIR, 'profiles')
+HISTORY_COLUMNS = ['run', 'script', 'stage', 'calls', 'seconds', 'mean_ms', 'max_ms', 'rows', 'peak_rss_mb']
+
+
+def peak_rss_mb():
+    """
+    Highest resident set size of the process so far in MB, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def row_count(result):
+    """
+    Rows of a stage's result: the length of a DataFrame, Series, array or list, or of the first DataFrame of a
+    tuple. None for other results.
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray, list)):
+        return len(result)
+    if isinstance(result, tuple):
+        return next((len(item) for item in result if isinstance(item, pd.DataFrame)), None)
+    return None
+
+
+class Stage:
+    """
+    A running stage. Set rows to record how many rows it produced.
+    """
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+
+class Profiler:
+    """
+    Thread safe totals of every stage: calls, wall time, longest call, rows and the peak RSS when it last ended.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    def record(self, name, seconds, rows=None):
+        peak = peak_rss_mb()
+        with self.lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': None,
+                                                  'peak_rss_mb': None})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if rows is not None:
+                stats['rows'] = (stats['rows'] or 0) + rows
+            stats['peak_rss_mb'] = peak
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the block as a call of the named stage. Yields a Stage whose rows can be set in the block."""
+        stage = Stage(name, rows)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            self.record(name, time.perf_counter() - start, stage.rows)
+
+    def report(self):
+        """One dict per stage in the order the stages first ended."""
+        with self.lock:
+            return [{'stage': name, 'calls': stats['calls'], 'seconds': stats['seconds'],
+                     'mean_ms': 1000 * stats['seconds'] / stats['calls'], 'max_ms': 1000 * stats['max_seconds'],
+                     'rows': stats['rows'], 'peak_rss_mb': stats['peak_rss_mb']}
+                    for name, stats in self.stages.items()]
+
+
+PROFILER = Profiler()
+
+
+def profiled(name=None):
+    """
+    Decorator recording every call of a function as a stage, named after the function unless name is given, with
+    the rows of its result.
+    """
+    def decorator(function):
+        stage_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            PROFILER.record(stage_name, time.perf_counter() - start, row_count(result))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def write_report(script, report, directory=PROFILES_DIR):
+    """
+    Write the report of a run to <directory>/<script>_<run>.json and append its stages to <directory>/<script>.csv.
+    Returns the path of the JSON report.
+    """
+    os.makedirs(directory, exist_ok=True)
+    run = report['run']
+    json_path = os.path.join(directory, f"{script}_{run.replace(':', '').replace('-', '')}.json")
+    with open(json_path, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    total = {'stage': '(total)', 'calls': 1, 'seconds': report['seconds'], 'mean_ms': 1000 * report['seconds'],
+             'max_ms': 1000 * report['seconds'], 'rows': None, 'peak_rss_mb': report['peak_rss_mb']}
+    history = pd.DataFrame([{'run': run, 'script': script, **stage} for stage in report['stages'] + [total]],
+                           columns=HISTORY_COLUMNS)
+    csv_path = os.path.join(directory, f'{script}.csv')
+    history.to_csv(csv_path, mode='a', header=not os.path.exists(csv_path), index=False)
+    return json_path
+
+
+def load_history(script, directory=PROFILES_DIR):
+    """
+    Stage timings of every recorded run of a script, oldest first.
+    """
+    return pd.read_csv(os.path.join(directory, f'{script}.csv'))
+
+
+@contextmanager
+def profile_run(script, directory=PROFILES_DIR):
+    """
+    Profile the run of a script: clears the stage totals, and when the block ends (also by an exception) writes the
+    report with the run time, command line arguments, total wall time, peak RSS and stages. Yields PROFILER.
+    """
+    PROFILER.reset()
+    # Microseconds keep the reports of runs started in the same second apart
+    run = datetime.now().isoformat(timespec='microseconds')
+    start = time.perf_counter()
+    status = 'failed'
+    try:
+        yield PROFILER
+        status = 'completed'
+    finally:
+        report = {'run': run, 'script': script, 'status': status, 'argv': sys.argv[1:],
+                  'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb(), 'stages': PROFILER.report()}
+        path = write_report(script, report, directory)
+        print(f"Profile of {script} ({report['seconds']:.1f} s) written to {path}")
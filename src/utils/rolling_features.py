@@ -0,0 +1,115 @@
+"""
+Rolling Feature Store
+
+Description: Lagged rolling means of the penalty columns for the models, e.g. the average count of a penalty type
+over a team's previous three games of the season. lagged_rolling_means computes every column and window in one
+vectorized pass over the groups. rolling_features caches the result in data/processed/features/ with a manifest of
+per group hashes (one group per team season), so appending a week only recomputes the team seasons it touches.
+"""
+import os
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from utils.partitions import changed_partitions, hash_partitions, load_manifest, save_manifest
+from utils.storage import HAS_PARQUET, read_table, table_path, write_table
+
+FEATURE_STAGE = os.path.join('processed', 'features')
+GROUP_KEYS = ['team_id', 'year']
+DEFAULT_WINDOWS = [3]
+
+
+def feature_name(column, window):
+    """
+    Name of the rolling mean feature of a column, e.g. rolling_avg_3_Holding.
+    """
+    return f'rolling_avg_{window}_{column}'
+
+
+def group_labels(df, keys=GROUP_KEYS):
+    """
+    Group label of every row, the key values joined with '_', e.g. 'buf_2019'.
+    """
+    return reduce(lambda left, right: left + '_' + right, [df[key].astype(str) for key in keys]).to_numpy()
+
+
+def group_positions(df, keys=GROUP_KEYS):
+    """
+    Position of every row within its group, in row order.
+    """
+    return df.groupby(keys, observed=True, sort=False, dropna=False).cumcount().to_numpy()
+
+
+def lagged_rolling_means(df, columns, keys=GROUP_KEYS, windows=DEFAULT_WINDOWS):
+    """
+    Mean of every column over the previous `window` rows of the same group (in row order) for every window, the
+    same as groupby(keys)[column].transform(lambda x: x.shift(1).rolling(window, min_periods=1).mean()).
+    Missing values are skipped and the first row of every group is NaN.
+    """
+    codes = df.groupby(keys, observed=True, sort=False, dropna=False).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    values = df[columns].to_numpy(dtype=float)[order]
+    valid = ~np.isnan(values)
+
+    # Cumulative sums and counts with a leading zero row, so rows [lo, hi) sum to sums[hi] - sums[lo]
+    zeros = np.zeros((1, len(columns)))
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+
+    row = np.arange(len(df))
+    is_start = np.r_[True, codes[order][1:] != codes[order][:-1]] if len(df) else np.zeros(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(is_start, row, 0))
+
+    features = {}
+    for window in windows:
+        lo = np.maximum(row - window, group_start)
+        window_sums = sums[row] - sums[lo]
+        window_counts = counts[row] - counts[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(window_counts > 0, window_sums / window_counts, np.nan)
+        unsorted = np.empty_like(means)
+        unsorted[order] = means
+        for i, column in enumerate(columns):
+            features[feature_name(column, window)] = unsorted[:, i]
+    return pd.DataFrame(features, index=df.index)
+
+
+def _cache_exists(name, stage):
+    return os.path.exists(table_path(name, stage, 'parquet' if HAS_PARQUET else 'csv'))
+
+
+def rolling_features(df, columns, name, keys=GROUP_KEYS, windows=DEFAULT_WINDOWS, stage=FEATURE_STAGE):
+    """
+    lagged_rolling_means of df cached as data/<stage>/<name>. Groups whose rows are unchanged since the cache was
+    written are read from it and only the other groups are recomputed, then the cache is updated.
+    """
+    labels = group_labels(df, keys)
+    positions = group_positions(df, keys)
+    settings = {'keys': list(keys), 'columns': list(columns), 'windows': list(windows)}
+    input_hashes = {'input': hash_partitions(df[columns].assign(_position=positions), labels)}
+    names = [feature_name(column, window) for window in windows for column in columns]
+
+    changed = changed_partitions(load_manifest(name, stage), settings, input_hashes)
+    if changed is None or not _cache_exists(name, stage):
+        recompute = np.ones(len(df), dtype=bool)
+    else:
+        recompute = np.isin(labels, list(changed))
+    values = np.empty((len(df), len(names)))
+    if not recompute.all():
+        cached = read_table(name, stage)
+        rows = pd.MultiIndex.from_arrays([cached['group'].astype(str), cached['position']]).get_indexer(
+            pd.MultiIndex.from_arrays([labels[~recompute], positions[~recompute]]))
+        values[~recompute] = cached[names].to_numpy()[rows]
+    if not recompute.any():
+        return pd.DataFrame(values, index=df.index, columns=names)
+
+    print(f'Computing rolling features for {len(np.unique(labels[recompute]))} of {len(np.unique(labels))} groups.')
+    values[recompute] = lagged_rolling_means(df[recompute], columns, keys, windows)[names].to_numpy()
+
+    features = pd.DataFrame(values, index=df.index, columns=names)
+    store = pd.concat([pd.DataFrame({'group': labels, 'position': positions}), features.reset_index(drop=True)],
+                      axis=1)
+    write_table(store, name, stage, csv=False)
+    save_manifest(name, settings, input_hashes, stage)
+    return features
@@ -0,0 +1,157 @@
+"""
+Table Schema Utilities
+
+Description: Registry of the compact dtypes of the processed tables. Repeated strings (team IDs, penalty names,
+positions, referee crews) load as categoricals, Yes/No columns as booleans and integer columns in the smallest
+integer type that holds their values (uint8 for the penalty counts). load_table and save_table wrap read_table
+and write_table: tables without a schema are passed through unchanged, and save_table checks a table against its
+schema and writes the booleans back as Yes/No, so the stored CSV and Parquet files keep their format.
+"""
+import pandas as pd
+
+from utils.storage import read_table, write_table
+
+FLAG_VALUES = {'Yes': True, 'No': False, True: True, False: False}
+
+SCHEMAS = {
+    ('penalties', 'processed'): {
+        'category': ['team_id', 'opp_id', 'penalty', 'pos', 'ref_crew', 'phase'],
+        'flag': ['declined', 'offsetting', 'home', 'postseason'],
+        'int': ['year', 'week', 'quarter', 'down', 'dist', 'yardage'],
+    },
+    ('team_performances', 'processed'): {
+        'category': ['team_id', 'opp_team_id', 'coach', 'opp_coach', 'ref_crew'],
+        'flag': ['home', 'postseason'],
+        # The penalty count columns depend on the data, so every other integer column is compacted too
+        'int': 'other',
+    },
+    ('team_penalty_counts', 'processed'): {
+        'category': ['team_id', 'penalty'],
+        'flag': [],
+        'int': ['count', 'yards'],
+    },
+    ('drive_penalty_counts', 'processed'): {
+        'category': ['team_id', 'penalty'],
+        'flag': [],
+        'int': ['num', 'count', 'yards'],
+    },
+}
+
+
+def get_schema(name, stage='processed'):
+    """
+    Schema of a table, or None if it has none. Partitions ('penalties/2023') share the schema of their table.
+    """
+    return SCHEMAS.get((name.split('/')[0], stage))
+
+
+def _int_columns(df, schema):
+    """
+    Columns of df that the schema stores as integers.
+    """
+    if schema['int'] != 'other':
+        return [column for column in schema['int'] if column in df.columns]
+    typed = set(schema['category']) | set(schema['flag'])
+    return [column for column in df.columns
+            if column not in typed and not pd.api.types.is_bool_dtype(df[column])
+            and (pd.api.types.is_numeric_dtype(df[column]) or df[column].dtype == object and _is_integral(df[column]))]
+
+
+def _is_integral(values):
+    """
+    True if every value that is present is a whole number, or text of one (written to CSV, it reads back as one).
+    """
+    if pd.api.types.is_integer_dtype(values):
+        return True
+    numbers = pd.to_numeric(values.dropna(), errors='coerce')
+    return bool(numbers.notna().all() and (numbers % 1 == 0).all())
+
+
+def smallest_int(values):
+    """
+    Cast a column of whole numbers (or their text) to the narrowest integer type that holds them, unsigned if none
+    is negative. Columns with missing values stay as they are, since the numpy integer types cannot hold NaN.
+    """
+    if values.isna().any() or not _is_integral(values):
+        return values
+    numbers = pd.to_numeric(values).astype('int64')
+    downcast = 'unsigned' if len(numbers) == 0 or numbers.min() >= 0 else 'integer'
+    return pd.to_numeric(numbers, downcast=downcast)
+
+
+def parse_flags(values, column):
+    """
+    Yes/No (or already boolean) values as booleans. Nullable booleans are used if values are missing.
+    Raises ValueError on any other value.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values
+    flags = values.map(FLAG_VALUES)
+    invalid = values.notna() & flags.isna()
+    if invalid.any():
+        raise ValueError(f'{column} must only hold Yes or No, found {sorted(set(values[invalid].astype(str)))[:5]}')
+    return flags.astype('boolean' if flags.isna().any() else bool)
+
+
+def apply_schema(df, name, stage='processed'):
+    """
+    Cast the columns of a table to the dtypes of its schema. Columns missing from df are skipped.
+    """
+    schema = get_schema(name, stage)
+    if schema is None:
+        return df
+    df = df.copy()
+    for column in schema['category']:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in schema['flag']:
+        if column in df.columns:
+            df[column] = parse_flags(df[column], column)
+    for column in _int_columns(df, schema):
+        df[column] = smallest_int(df[column])
+    return df
+
+
+def to_storage(df, name, stage='processed'):
+    """
+    Check a table against its schema and convert it to the stored format, with the flags written as Yes/No.
+    Raises ValueError if a flag is not Yes/No or an integer column holds fractional values.
+    """
+    schema = get_schema(name, stage)
+    if schema is None:
+        return df
+    for column in _int_columns(df, schema):
+        if not _is_integral(df[column]):
+            raise ValueError(f'{column} of {name} must only hold whole numbers')
+
+    flag_columns = [column for column in schema['flag'] if column in df.columns]
+    if not flag_columns:
+        return df
+    df = df.copy()
+    for column in flag_columns:
+        flags = parse_flags(df[column], column)
+        df[column] = flags.map({True: 'Yes', False: 'No'}).astype(object)
+    return df
+
+
+def load_table(name, stage='raw', columns=None, typed=True):
+    """
+    Read a table with read_table and cast it to its schema. typed=False returns the columns as read_table does.
+    """
+    df = read_table(name, stage, columns)
+    return apply_schema(df, name, stage) if typed else df
+
+
+def save_table(df, name, stage='processed', csv=True):
+    """
+    Write a table with write_table after checking it against its schema.
+    """
+    write_table(to_storage(df, name, stage), name, stage, csv)
+
+
+def memory_usage(name, stage='processed'):
+    """
+    Deep memory usage in bytes of a table as read by read_table and as loaded with its schema.
+    """
+    df = read_table(name, stage)
+    return df.memory_usage(deep=True).sum(), apply_schema(df, name, stage).memory_usage(deep=True).sum()
@@ -0,0 +1,165 @@
+"""
+Table Storage Utilities
+
+Description: Shared reading and writing of the tables in data/raw and data/processed. The CSV files stay the
+source of truth for compatibility, and every table gets a compressed Parquet copy next to it. Reads come from
+the Parquet copy when it is at least as new as the CSV, so only the requested columns are loaded. When pyarrow
+is not installed everything falls back to reading and writing CSV.
+"""
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# NFL_PENALTY_DATA_DIR points the scripts at another data directory, e.g. the synthetic data of benchmark_pipeline.py
+DATA_DIR = os.environ.get('NFL_PENALTY_DATA_DIR') or \
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data'))
+# Next to the data directory, so synthetic data directories get their own outputs
+OUTPUTS_DIR = os.path.join(os.path.dirname(DATA_DIR), 'outputs')
+PARQUET_COMPRESSION = 'zstd'
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# (name, stage) of the tables kept in memory by shared_tables -> [lock, file version, DataFrame or None]
+_shared = {}
+
+
+def table_path(name, stage='raw', extension='csv'):
+    """
+    Path of a table in the data directory, e.g. table_path('penalties', 'processed').
+    """
+    return os.path.join(DATA_DIR, stage, f'{name}.{extension}')
+
+
+def _parquet_is_current(name, stage):
+    """
+    True if the Parquet copy of a table exists and is not older than its CSV.
+    """
+    parquet_path = table_path(name, stage, 'parquet')
+    csv_path = table_path(name, stage)
+    if not os.path.exists(parquet_path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+
+
+def _as_read_from_csv(df):
+    """
+    Give columns the dtypes pd.read_csv would give them, so Parquet and CSV reads return the same frame.
+    Columns that are already plain numbers or strings are left alone; the rest go through a CSV round trip.
+    """
+    round_trip = []
+    for column in df.columns:
+        inferred = pd.api.types.infer_dtype(df[column], skipna=True)
+        if df[column].dtype == object and inferred in ['string', 'empty']:
+            continue
+        if df[column].dtype.kind in 'biuf' and not isinstance(df[column].dtype, pd.api.extensions.ExtensionDtype):
+            continue
+        round_trip.append(column)
+
+    if round_trip:
+        df = df.copy()
+        parsed = pd.read_csv(io.StringIO(df[round_trip].to_csv(index=False)))
+        for column in round_trip:
+            df[column] = parsed[column].to_numpy()
+    return df
+
+
+def _write_parquet(df, name, stage):
+    """
+    Write the Parquet copy of a table.
+    """
+    df = _as_read_from_csv(df.reset_index(drop=True))
+    df.to_parquet(table_path(name, stage, 'parquet'), compression=PARQUET_COMPRESSION, index=False)
+
+
+def _file_version(name, stage):
+    """
+    Modification time and size of the CSV of a table, which change whenever it is written.
+    """
+    path = table_path(name, stage)
+    return (os.path.getmtime(path), os.path.getsize(path)) if os.path.exists(path) else None
+
+
+@contextmanager
+def shared_tables(tables):
+    """
+    Keep the given (name, stage) tables in memory while the block runs: the first read_table of a table loads it
+    whole, and later reads, also from other threads, get a copy of the requested columns instead of parsing the
+    file again. A table is read from disk again once it has been written.
+    """
+    for key in tables:
+        _shared[key] = [threading.Lock(), None, None]
+    try:
+        yield
+    finally:
+        for key in tables:
+            _shared.pop(key, None)
+
+
+def drop_shared_table(name, stage):
+    """
+    Stop keeping a table of shared_tables in memory, once nothing reads it anymore.
+    """
+    _shared.pop((name, stage), None)
+
+
+def _read_shared(name, stage, columns):
+    """
+    read_table from the shared copy of a table, loading it first if it is not loaded or out of date.
+    """
+    entry = _shared[(name, stage)]
+    # Threads reading the same table wait for the first one to load it
+    with entry[0]:
+        version = _file_version(name, stage)
+        if entry[2] is None or entry[1] != version:
+            entry[1], entry[2] = version, _read_table(name, stage)
+        df = entry[2]
+    return df[columns].copy() if columns is not None else df.copy()
+
+
+def read_table(name, stage='raw', columns=None):
+    """
+    Read a table, optionally only some of its columns. Uses the Parquet copy if it is current, otherwise
+    parses the CSV and refreshes the Parquet copy for the next read.
+    """
+    if (name, stage) in _shared:
+        return _read_shared(name, stage, columns)
+    return _read_table(name, stage, columns)
+
+
+def _read_table(name, stage, columns=None):
+    """
+    read_table from disk.
+    """
+    if not HAS_PARQUET:
+        df = pd.read_csv(table_path(name, stage), usecols=columns)
+        return df[columns] if columns is not None else df
+
+    if _parquet_is_current(name, stage):
+        df = pd.read_parquet(table_path(name, stage, 'parquet'), columns=columns)
+        # Parquet gives None for missing strings where read_csv gives NaN
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].where(df[column].notna(), np.nan)
+        return df
+
+    df = pd.read_csv(table_path(name, stage))
+    _write_parquet(df, name, stage)
+    return df[columns] if columns is not None else df
+
+
+def write_table(df, name, stage='processed', csv=True):
+    """
+    Write a table as CSV and as Parquet. With csv=False only the Parquet copy is written, unless pyarrow is missing.
+    """
+    os.makedirs(os.path.dirname(table_path(name, stage)), exist_ok=True)
+    if csv or not HAS_PARQUET:
+        df.to_csv(table_path(name, stage), index=False)
+    if HAS_PARQUET:
+        _write_parquet(df, name, stage)
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'tests', 'fixtures')
+
+# The scripts import each other and the utils package as top-level modules
+sys.path[:0] = [os.path.join(ROOT, 'src'), os.path.join(ROOT, 'src', 'scripts')]
+# Never let a test touch the project data directory, even one that forgets the data_dir fixture
+os.environ['NFL_PENALTY_DATA_DIR'] = os.path.join(tempfile.mkdtemp(prefix='nfl_penalties_tests_'), 'data')
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    An empty data directory for one test. The path constants the modules computed at import are pointed at it.
+    """
+    from utils import downloads, page_cache, storage
+
+    directory = tmp_path / 'data'
+    for stage in ['raw', 'processed']:
+        (directory / stage).mkdir(parents=True)
+    monkeypatch.setattr(storage, 'DATA_DIR', str(directory))
+    monkeypatch.setattr(page_cache, 'CACHE_DIR', str(directory / 'html'))
+    monkeypatch.setattr(downloads, 'DOWNLOAD_DIR', str(directory / 'raw' / 'downloads'))
+    return directory
@@ -0,0 +1,63 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from utils.analytics_db import build_database, run_report
+from utils.schemas import save_table
+
+
+def test_drives_numbered_per_team_are_all_stored(data_dir):
+    # As on pro-football-reference, each team's drives are numbered from 1
+    save_table(pd.DataFrame({
+        'game_id': ['2012_1_DAL_NYG'] * 4,
+        'team_id': ['DAL', 'NYG', 'DAL', 'NYG'],
+        'num': [1, 1, 2, 2],
+        'result': ['Punt', 'Touchdown', 'Field Goal', 'Punt'],
+    }), 'drives', 'processed')
+    save_table(pd.DataFrame({
+        'game_id': ['2012_1_DAL_NYG'] * 2,
+        'team_id': ['DAL', 'NYG'],
+        'num': [1, 1],
+        'penalty': ['Offensive Holding'] * 2,
+        'count': [1, 1],
+        'yards': [10, 10],
+    }), 'drive_penalty_counts', 'processed')
+
+    path = str(data_dir / 'processed' / 'analytics.sqlite')
+    build_database(path)
+
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM drives').fetchone() == (4,)
+        assert conn.execute('SELECT COUNT(*) FROM drive_penalty_counts').fetchone() == (2,)
+
+
+def test_penalty_list_keeps_penalties_with_missing_flags(data_dir):
+    save_table(pd.DataFrame({
+        'game_id': ['2012_1_DAL_NYG'] * 4,
+        'penalty': ['False Start'] * 4,
+        'yardage': [5, 5, 5, 10],
+        'declined': ['No', None, None, 'Yes'],
+        'offsetting': ['No', 'No', None, 'No'],
+    }), 'penalties', 'processed')
+
+    report = run_report('penalty_list', path=str(data_dir / 'processed' / 'analytics.sqlite'))
+
+    # The declined penalty is left out of the yards, but the penalties missing a flag are not
+    assert report.to_dict('records') == [{'penalty': 'False Start', 'yards': 5, 'num_occ': 4}]
+
+
+def test_identical_penalties_are_all_counted(data_dir):
+    # Two false starts by the same team in the same game with the same yardage are still two penalties
+    save_table(pd.DataFrame({
+        'game_id': ['2012_1_DAL_NYG'] * 3,
+        'team_id': ['DAL'] * 3,
+        'penalty': ['False Start'] * 3,
+        'yardage': [5, 5, 10],
+        'declined': ['No'] * 3,
+        'offsetting': ['No'] * 3,
+    }), 'penalties', 'processed')
+
+    report = run_report('penalty_list', path=str(data_dir / 'processed' / 'analytics.sqlite'))
+
+    assert report.to_dict('records') == [{'penalty': 'False Start', 'yards': 5, 'num_occ': 3}]
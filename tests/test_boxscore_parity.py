@@ -0,0 +1,90 @@
+import glob
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from utils import boxscore_lxml, boxscore_soup
+from utils.fetching import uncomment_html
+
+pytestmark = pytest.mark.skipif(not boxscore_lxml.HAS_LXML, reason='lxml is not installed')
+
+# Fixture page -> game ID: an overtime game before snap counts were listed, a regulation game with snap counts and
+# a down judge, and a double overtime playoff game without a game info table
+PAGES = {
+    '200909100pit.htm': '2009_1_TEN_PIT',
+    '201209050nyg.htm': '2012_1_DAL_NYG',
+    '201301120den.htm': '2012_19_BAL_DEN',
+}
+
+
+def sections(game_id):
+    """(name, call) of every parse_* function, called with the arguments scrape_games.parse_game uses."""
+    _, _, away_team_id, home_team_id = game_id.split('_')
+    calls = [
+        ('scorebox', lambda b, page: b.parse_scorebox(page)),
+        ('meta_data', lambda b, page: b.parse_meta_data(page)),
+        ('game_info', lambda b, page: b.parse_game_info(page)),
+        ('officials', lambda b, page: b.parse_officials(page)),
+        ('linescore', lambda b, page: b.parse_linescore(page, away_team_id, home_team_id)),
+        ('team_stats', lambda b, page: b.parse_team_stats(page, home_team_id, away_team_id)),
+    ]
+    for side, team_id in [('home', home_team_id), ('vis', away_team_id)]:
+        calls += [
+            (f'{side}_drives', lambda b, page, d=f'div_{side}_drives', t=team_id: b.parse_drives(page, d, t, game_id)),
+            (f'{side}_starters',
+             lambda b, page, d=f'div_{side}_starters', t=team_id: b.parse_starters(page, d, t, game_id)),
+            (f'{side}_snap_counts',
+             lambda b, page, d=f'div_{side}_snap_counts', t=team_id: b.parse_snap_counts(page, d, t, game_id)),
+        ]
+    return calls
+
+
+@pytest.fixture(scope='module', params=sorted(PAGES))
+def page(request):
+    with open(os.path.join(FIXTURES_DIR, 'boxscores', request.param), encoding='utf-8') as f:
+        html_source = uncomment_html(f.read())
+    game_id = PAGES[request.param]
+    return game_id, boxscore_soup.load(html_source), boxscore_lxml.load(html_source)
+
+
+def test_fixture_pages_are_listed():
+    assert sorted(map(os.path.basename, glob.glob(os.path.join(FIXTURES_DIR, 'boxscores', '*.htm')))) == sorted(PAGES)
+
+
+def test_every_section_matches(page):
+    game_id, soup_page, lxml_page = page
+    for name, call in sections(game_id):
+        assert call(boxscore_lxml, lxml_page) == call(boxscore_soup, soup_page), name
+
+
+def test_every_parse_function_is_compared():
+    def parse_functions(module):
+        return {name for name in dir(module) if name.startswith('parse_')}
+
+    compared = {'parse_' + name.removeprefix('home_').removeprefix('vis_') for name, _ in sections('0_0_AWAY_HOME')}
+    assert parse_functions(boxscore_lxml) == parse_functions(boxscore_soup) == compared
+
+
+def test_overtime_points():
+    results = {}
+    for file_name, game_id in PAGES.items():
+        with open(os.path.join(FIXTURES_DIR, 'boxscores', file_name), encoding='utf-8') as f:
+            root = boxscore_lxml.load(uncomment_html(f.read()))
+        _, _, away_team_id, home_team_id = game_id.split('_')
+        linescore = boxscore_lxml.parse_linescore(root, away_team_id, home_team_id)
+        results[game_id] = (linescore[away_team_id]['otpts'], linescore[home_team_id]['otpts'])
+
+    assert results == {'2009_1_TEN_PIT': (0, 3), '2012_1_DAL_NYG': ('N/A', 'N/A'), '2012_19_BAL_DEN': (3, 0)}
+
+
+def test_missing_sections(page):
+    game_id, soup_page, lxml_page = page
+    for backend, root in [(boxscore_soup, soup_page), (boxscore_lxml, lxml_page)]:
+        game_info = backend.parse_game_info(root)
+        snap_counts = backend.parse_snap_counts(root, 'div_home_snap_counts', 'HOME', game_id)
+        if game_id == '2012_19_BAL_DEN':
+            assert set(game_info.values()) == {'N/A'}
+        else:
+            assert game_info['Won Toss'] != 'N/A'
+        assert (snap_counts == []) == (game_id == '2009_1_TEN_PIT')
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from clean_penalties import apply_adjustments, apply_adjustments_rowwise, compute_time_left, compute_time_left_rowwise
+
+VALID_GAME_IDS = {'2012_1_DAL_NYG', '2012_18_BAL_DEN', '2012_21_SF_BAL', '2022_19_CIN_KC'}
+
+
+def penalties_frame():
+    """Penalties as preprocess_data leaves them, with the week as scraped from nflpenalties.com."""
+    return pd.DataFrame({
+        'year': [2012, 2012, 2012, 2012, 2012, 2022, 2012],
+        'week': ['1', '1', 'Wildcard Weekend', 'Super Bowl', 'Super Bowl', 'Wildcard Weekend', '2'],
+        'team_id': ['NYG', 'DAL', 'DEN', 'SF', 'BAL', 'KC', 'DAL'],
+        'opp_id': ['DAL', 'NYG', 'BAL', 'BAL', 'SF', 'CIN', 'NYG'],
+        # The Super Bowl lists the wrong home team, so both of its game_ids come out swapped, and the week 2
+        # game exists in neither order
+        'home': ['Yes', 'No', 'Yes', 'Yes', 'No', 'Yes', 'No'],
+        'quarter': [1, 4, 2, 3, 5, 5, 4],
+        'time': ['15:00', '0:07', '2:00', '9:59', '10:00', '0:01', '12:30'],
+    })
+
+
+def test_apply_adjustments_matches_the_rowwise_version():
+    rowwise = apply_adjustments_rowwise(penalties_frame(), VALID_GAME_IDS)
+    columnar = apply_adjustments(penalties_frame(), VALID_GAME_IDS)
+
+    assert columnar.to_csv(index=False) == rowwise.to_csv(index=False)
+    assert columnar['game_id'].tolist() == ['2012_1_DAL_NYG', '2012_1_DAL_NYG', '2012_18_BAL_DEN', '2012_21_SF_BAL',
+                                            '2012_21_SF_BAL', '2022_19_CIN_KC', '2012_2_DAL_NYG']
+    assert columnar['home'].tolist() == ['Yes', 'No', 'Yes', 'No', 'Yes', 'Yes', 'No']
+    assert columnar['postseason'].tolist() == ['No', 'No', 'Yes', 'Yes', 'Yes', 'Yes', 'No']
+
+
+def test_compute_time_left_matches_the_rowwise_version():
+    rowwise = compute_time_left_rowwise(penalties_frame())
+    columnar = compute_time_left(penalties_frame())
+
+    assert columnar.to_csv(index=False) == rowwise.to_csv(index=False)
+    # Overtime counts down below zero, with the hours floored as divmod does
+    assert columnar['time_left'].tolist() == ['01:00:00', '00:00:07', '00:32:00', '00:24:59', '-1:55:00',
+                                              '-1:45:01', '00:12:30']
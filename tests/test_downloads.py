@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import missing
+from conftest import FIXTURES_DIR
+from utils.downloads import read_meta, refresh_download
+from utils.fake_server import serve_pages
+from utils.fetching import pooled_session
+from utils.storage import read_table, write_table
+
+GAMES_URL = 'https://raw.githubusercontent.com/nflverse/nfldata/master/data/games.csv'
+STANDINGS_URL = 'https://raw.githubusercontent.com/nflverse/nfldata/master/data/standings.csv'
+
+
+@pytest.fixture
+def served(tmp_path):
+    """A copy of the nflverse fixtures served by the fake server, with the status codes of every response."""
+    directory = tmp_path / 'served'
+    shutil.copytree(os.path.join(FIXTURES_DIR, 'nflverse'), directory)
+    statuses = []
+    session = pooled_session(pool_size=1)
+    session.hooks['response'].append(lambda response, *args, **kwargs: statuses.append(response.status_code))
+    with serve_pages(str(directory)) as (base_url, request_log):
+        yield directory, base_url, session, statuses
+    session.close()
+
+
+def test_first_download_is_stored_with_validators(data_dir, served):
+    directory, base_url, session, statuses = served
+    path, changed = refresh_download(GAMES_URL, session, base_url=base_url)
+
+    assert changed and statuses == [200]
+    assert path == str(data_dir / 'raw' / 'downloads' / 'games.csv')
+    with open(path, 'rb') as stored, open(directory / 'games.csv', 'rb') as original:
+        assert stored.read() == original.read()
+    meta = read_meta(path)
+    assert meta['url'] == GAMES_URL and meta['etag'] and meta['last_modified'] and meta['sha256']
+
+
+def test_unchanged_download_gets_304(data_dir, served):
+    directory, base_url, session, statuses = served
+    path, _ = refresh_download(GAMES_URL, session, base_url=base_url)
+    modified = os.path.getmtime(path)
+
+    assert refresh_download(GAMES_URL, session, base_url=base_url) == (path, False)
+    assert statuses == [200, 304]
+    assert os.path.getmtime(path) == modified
+
+
+def test_changed_download_replaces_the_stored_copy(data_dir, served):
+    directory, base_url, session, statuses = served
+    path, _ = refresh_download(GAMES_URL, session, base_url=base_url)
+    etag = read_meta(path)['etag']
+    with open(directory / 'games.csv', 'a') as f:
+        f.write('2099_02_BAL_KC,2099,REG,2,2099-09-17,Sunday,13:00,BAL,,KC,,Home,209909170kan\n')
+
+    assert refresh_download(GAMES_URL, session, base_url=base_url) == (path, True)
+    assert statuses == [200, 200]
+    assert read_meta(path)['etag'] != etag
+    assert len(pd.read_csv(path)) == 6
+
+
+def test_mirror_copies_without_requests(data_dir, served):
+    directory, base_url, session, statuses = served
+    mirror = os.path.join(FIXTURES_DIR, 'nflverse')
+    path, changed = refresh_download(STANDINGS_URL, mirror=mirror)
+
+    assert changed and statuses == []
+    assert pd.read_csv(path).equals(pd.read_csv(os.path.join(mirror, 'standings.csv')))
+    assert refresh_download(STANDINGS_URL, mirror=mirror) == (path, False)
+
+
+def test_refresh_games_skips_the_parse_when_unchanged(data_dir, served, monkeypatch):
+    _, base_url, session, _ = served
+    games_path, changed = refresh_download(GAMES_URL, session, base_url=base_url)
+    games_df = missing.refresh_games(changed, games_path)
+    assert sorted(games_df['game_id']) == ['2009_1_LAC_LV', '2009_1_TEN_PIT', '2012_19_BAL_DEN', '2012_1_DAL_NYG']
+    assert read_meta(games_path)['next_gameday'].startswith('2099-09-10')
+
+    parsed = []
+    monkeypatch.setattr(missing, 'normalize_games', lambda df: parsed.append(df) or df)
+    _, changed = refresh_download(GAMES_URL, session, base_url=base_url)
+    stored = missing.refresh_games(changed, games_path)
+    assert not changed and parsed == []
+    assert stored.equals(read_table('games', 'raw'))
+
+    # A game played since the last run makes the stored table stale even if the download did not change
+    missing.update_meta(games_path, next_gameday='2009-09-10T00:00:00')
+    missing.refresh_games(False, games_path)
+    assert len(parsed) == 1
+
+
+def test_missing_lists_the_games_without_details(data_dir, served):
+    _, base_url, _, _ = served
+    write_table(pd.DataFrame({'game_id': ['2009_1_TEN_PIT'], 'date': ['2009-09-10'], 'start_time': ['8:41pm']}),
+                'game_detail', 'raw')
+    missing.main(['--base-url', base_url])
+
+    missing_df = read_table('missing', 'raw')
+    assert sorted(missing_df['game_id']) == ['2009_1_LAC_LV', '2012_19_BAL_DEN', '2012_1_DAL_NYG']
+    assert set(missing_df['url']) == {f'https://www.pro-football-reference.com/boxscores/{pfr}.htm'
+                                      for pfr in ['200909140rai', '201301120den', '201209050nyg']}
+    assert len(read_table('standings', 'raw')) == 4
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from clean_drives import add_penalties, add_penalties_loop
+from utils.drive_matching import assign_drives
+
+PENALTY_TYPES = ['Off_False_Start', 'Def_Offside', 'ST_Holding']
+
+
+def drives_frame():
+    """Drives of one game, as preprocess_drives leaves them: sorted by date, game and time left (as text)."""
+    drives = pd.DataFrame({
+        'game_id': ['2012_1_DAL_NYG'] * 6,
+        'team_id': ['DAL', 'NYG', 'DAL', 'NYG', 'DAL', 'NYG'],
+        'num': [1, 1, 2, 2, 3, 3],
+        'time_left': ['00:59:50', '00:52:10', '00:45:00', '00:31:40', '00:02:05', '-1:55:00'],
+        'date': ['2012-09-05'] * 6,
+    })
+    return drives.sort_values(by=['date', 'game_id', 'time_left'], ascending=[True, True, False])
+
+
+def penalties_frame():
+    return pd.DataFrame({
+        'game_id': ['2012_1_DAL_NYG'] * 6 + ['2012_1_NYG_DAL'],
+        'penalty': ['ST_Holding', 'Off_False_Start', 'Def_Offside', 'Off_False_Start', 'Def_Offside',
+                    'Off_False_Start', 'Def_Offside'],
+        'phase': ['ST', 'Off', 'Def', 'Off', 'Def', 'Off', 'Def'],
+        'yardage': [10, 5, 5, 5, 5, 5, 5],
+        # Before the first drive, exactly at a drive start, within drives, in overtime, and a game_id with the
+        # home and away teams swapped, which matches no drive
+        'time_left': ['01:00:00', '00:45:00', '00:40:12', '00:02:00', '-1:58:00', '-1:50:00', '00:30:00'],
+    })
+
+
+def test_assign_drives_positions():
+    positions = assign_drives(drives_frame(), penalties_frame())
+
+    # Drive positions in frame order: 59:50, 52:10, 45:00, 31:40, 02:05 and then the overtime drive
+    assert positions.tolist() == [-1, 2, 2, 4, 5, 4, -1]
+
+
+def test_add_penalties_matches_the_loop():
+    joined, joined_counts = add_penalties(drives_frame(), penalties_frame(), PENALTY_TYPES)
+    looped, looped_counts = add_penalties_loop(drives_frame(), penalties_frame(), PENALTY_TYPES)
+
+    pd.testing.assert_frame_equal(joined, looped)
+    pd.testing.assert_frame_equal(joined_counts, looped_counts)
+    assert joined.to_csv(index=False) == looped.to_csv(index=False)
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+from models.drive_server import MicroBatcher, drive_rows
+
+FEATURES = ['los', 'time_left_seconds']
+
+
+def predict(rows):
+    """Stand-in for predict_proba, which refuses NaN like the exact GradientBoostingClassifier."""
+    if np.isnan(rows).any():
+        raise ValueError('Input X contains NaN.')
+    return np.column_stack([rows[:, 0] / 100, 1 - rows[:, 0] / 100])
+
+
+def test_drive_rows_of_one_drive_and_of_several():
+    assert drive_rows({'los': 50, 'time_left_seconds': 900}, FEATURES).tolist() == [[50.0, 900.0]]
+    rows = drive_rows({'drives': [{'time_left_seconds': 60, 'los': 20}, {'los': 75, 'time_left_seconds': 0}]},
+                      FEATURES)
+    assert rows.tolist() == [[20.0, 60.0], [75.0, 0.0]]
+
+
+@pytest.mark.parametrize('body, message', [
+    ('[]', 'Expected a drive object'),
+    ('{"drives": []}', 'Expected a drive object'),
+    ('{"los": 50}', 'Missing features: time_left_seconds'),
+    ('{"los": "midfield", "time_left_seconds": 900}', 'Features must be numbers'),
+    ('{"los": NaN, "time_left_seconds": 900}', 'Features must be finite numbers'),
+    ('{"drives": [{"los": 50, "time_left_seconds": 900}, {"los": 50, "time_left_seconds": -Infinity}]}',
+     'Features must be finite numbers'),
+])
+def test_drive_rows_rejects_bad_payloads(body, message):
+    with pytest.raises(ValueError, match=message):
+        drive_rows(json.loads(body), FEATURES)
+
+
+def test_micro_batcher_scores_concurrent_requests_together():
+    batcher = MicroBatcher(predict, window=0.2)
+    try:
+        futures = [batcher.submit(np.array([[los, 900.0]])) for los in [10, 20, 30]]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+
+    assert [result.tolist() for result in results] == [[[0.1, 0.9]], [[0.2, 0.8]], [[0.3, 0.7]]]
+    assert batcher.metrics.batches == 1 and batcher.metrics.drives == 3
+
+
+def test_micro_batcher_keeps_an_error_with_its_request():
+    batcher = MicroBatcher(predict, window=0.2)
+    try:
+        clean = batcher.submit(np.array([[50.0, 900.0]]))
+        bad = batcher.submit(np.array([[np.nan, 900.0]]))
+        assert clean.result(timeout=5).tolist() == [[0.5, 0.5]]
+        with pytest.raises(ValueError, match='NaN'):
+            bad.result(timeout=5)
+    finally:
+        batcher.close()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models import network_inputs
+from utils.rolling_features import lagged_rolling_means
+from utils.storage import write_table
+
+
+def wide_team_performances(seasons=(2009, 2010), weeks=4):
+    """Team games in the layout of the committed data/processed/team_performances.csv, without partitions."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for year in seasons:
+        for week in range(1, weeks + 1):
+            for team, opp, home in [('pit', 'ten', True), ('ten', 'pit', False), ('dal', 'nyg', False),
+                                    ('nyg', 'dal', True)]:
+                rows.append({'game_id': f'{year}_{week}_{team}', 'team_id': team, 'opp_team_id': opp,
+                             'coach': f'{team} coach', 'opp_coach': f'{opp} coach', 'home': home,
+                             'postseason': False, 'year': year, 'week': week, 'ref_crew': f'crew {week % 3}'})
+    df = pd.DataFrame(rows)
+    df['Off_Holding'] = rng.integers(0, 4, len(df))
+    df['Def_Offside'] = rng.integers(0, 3, len(df))
+    df['total_off_pen'] = df['Off_Holding'] + rng.integers(0, 3, len(df))
+    df['total_def_pen'] = df['Def_Offside'] + rng.integers(0, 3, len(df))
+    df['total_off_pen_yards'] = 10 * df['total_off_pen']
+    df['total_def_pen_yards'] = 5 * df['total_def_pen']
+    return df
+
+
+def test_missing_table_asks_for_the_cleaning_script(data_dir):
+    with pytest.raises(FileNotFoundError, match='run clean_games.py first'):
+        network_inputs.fit_inputs()
+
+
+def test_unpartitioned_table_is_read_by_season(data_dir, tmp_path):
+    df = wide_team_performances()
+    write_table(df, 'team_performances', 'processed')
+
+    seasons = list(network_inputs.iter_seasons())
+    assert [season for season, _ in seasons] == ['2009', '2010']
+    assert all(len(season_df) == 16 for _, season_df in seasons)
+
+    inputs = network_inputs.fit_inputs(window=2)
+    assert inputs.targets == ['Off_Holding', 'Def_Offside'] + network_inputs.TOTAL_COLUMNS
+    assert inputs.vocabularies['team_id'] == ['dal', 'nyg', 'pit', 'ten']
+
+    network_inputs.write_examples(inputs, directory=str(tmp_path / 'examples'))
+    examples = network_inputs.load_examples(str(tmp_path / 'examples'))
+    assert examples['ids'].shape == (len(df), len(network_inputs.CATEGORICAL_COLUMNS))
+    assert examples['targets'].min() >= 0 and examples['targets'].max() <= 1
+
+
+def test_rolling_means_come_from_the_feature_store(data_dir):
+    write_table(wide_team_performances(), 'team_performances', 'processed')
+    season, df = next(network_inputs.iter_seasons())
+    targets = ['Off_Holding', 'Def_Offside']
+    cache_name = network_inputs.rolling_cache_name('team_performances', season)
+
+    numeric = network_inputs.raw_numeric(df, targets, 2, cache_name)
+    expected = np.nan_to_num(lagged_rolling_means(df, targets, windows=[2]).to_numpy())
+    np.testing.assert_allclose(numeric[:, len(network_inputs.FLAG_COLUMNS):], expected)
+    assert (data_dir / 'processed' / 'features' / 'team_performances_nn' / f'{season}.manifest.json').exists()
@@ -0,0 +1,34 @@
+from utils.pipeline import Pipeline, PipelineStage
+
+
+def write_output(path):
+    def run(argv):
+        with open(path, 'w') as f:
+            f.write('done\n')
+    return run
+
+
+def test_a_stage_fails_on_a_non_zero_status(tmp_path):
+    output = tmp_path / 'output.csv'
+    output.write_text('from an earlier run\n')
+    pipeline = Pipeline([PipelineStage('stage', lambda argv: 1, outputs=[str(output)])],
+                        state_path=str(tmp_path / 'state.json'))
+
+    assert pipeline.run()['stage'][0] == 'failed'
+    assert 'stage' not in pipeline.state['stages']
+
+
+def test_a_stage_fails_when_an_output_is_missing(tmp_path):
+    written, missing = tmp_path / 'written.csv', tmp_path / 'missing.csv'
+    pipeline = Pipeline([PipelineStage('stage', write_output(written), outputs=[str(written), str(missing)])],
+                        state_path=str(tmp_path / 'state.json'))
+
+    assert pipeline.run()['stage'][0] == 'failed'
+
+
+def test_a_finished_stage_is_current_next_time(tmp_path):
+    output = tmp_path / 'output.csv'
+    stages = [PipelineStage('stage', write_output(output), outputs=[str(output)])]
+
+    assert Pipeline(stages, state_path=str(tmp_path / 'state.json')).run()['stage'][0] == 'ran'
+    assert Pipeline(stages, state_path=str(tmp_path / 'state.json')).run()['stage'][0] == 'current'
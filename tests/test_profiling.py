@@ -0,0 +1,10 @@
+from utils.profiling import load_history, profile_run
+
+
+def test_runs_in_the_same_second_keep_their_own_reports(tmp_path):
+    for _ in range(2):
+        with profile_run('script', str(tmp_path)):
+            pass
+
+    assert len(list(tmp_path.glob('script_*.json'))) == 2
+    assert load_history('script', str(tmp_path))['run'].nunique() == 2
@@ -0,0 +1,171 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import scrape_games
+from conftest import FIXTURES_DIR
+from utils.checkpoint import ProgressJournal
+from utils.fake_server import max_requests_per_minute, serve_pages
+from utils.fetching import HttpFetcher, TokenBucket, fetch_pages
+from utils.storage import read_table, write_table
+
+PAGES_DIR = os.path.join(FIXTURES_DIR, 'boxscores')
+GAMES = {
+    '2009_1_TEN_PIT': '200909100pit',
+    '2012_1_DAL_NYG': '201209050nyg',
+    '2012_19_BAL_DEN': '201301120den',
+}
+RATE = 120  # requests per minute, one every 0.5 seconds
+
+
+def write_missing(games):
+    write_table(pd.DataFrame({
+        'game_id': list(games),
+        'pfr': list(games.values()),
+        'url': [f'https://www.pro-football-reference.com/boxscores/{pfr}.htm' for pfr in games.values()],
+    }), 'missing', 'raw')
+
+
+def request_gaps(request_log):
+    times = sorted(t for t, _ in request_log)
+    return [b - a for a, b in zip(times, times[1:])]
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(rate_per_minute=600)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # The first token is available at once, the other three take 0.1 seconds each
+    assert time.monotonic() - start >= 0.3 * 0.95
+
+
+def test_fetch_pages_keeps_order_under_rate_limit():
+    with serve_pages(PAGES_DIR) as (base_url, request_log):
+        items = [(game_id, f'{base_url}/boxscores/{pfr}.htm') for game_id, pfr in GAMES.items()]
+        items.append(('2009_1_AAA_BBB', f'{base_url}/boxscores/missing.htm'))
+        fetcher = HttpFetcher()
+        try:
+            results = list(fetch_pages(items, fetcher, TokenBucket(RATE), lambda key, html: html, workers=3))
+        finally:
+            fetcher.close()
+
+    assert [key for key, _, _, _ in results] == [key for key, _ in items]
+    assert all(error is None for _, _, _, error in results)
+    # Commented out tables are restored and a missing page comes back as None
+    assert '<!--' not in results[0][2] and 'id="team_stats"' in results[0][2]
+    assert results[-1][2] is None
+    assert len(request_log) == len(items)
+    assert min(request_gaps(request_log)) >= 60 / RATE * 0.95
+
+
+def test_scrape_games_against_fake_server(data_dir):
+    write_missing(GAMES)
+    with serve_pages(PAGES_DIR) as (base_url, request_log):
+        scrape_games.main(['--base-url', base_url, '--rate', str(RATE), '--workers', '2'])
+
+    assert sorted(path for _, path in request_log) == sorted(f'/boxscores/{pfr}.htm' for pfr in GAMES.values())
+    assert min(request_gaps(request_log)) >= 60 / RATE * 0.95
+    assert max_requests_per_minute(request_log) <= RATE
+
+    game_detail = read_table('game_detail', 'raw')
+    assert sorted(game_detail['game_id']) == sorted(GAMES)
+    detail = game_detail.set_index('game_id').loc['2009_1_TEN_PIT']
+    assert (detail['home_team'], detail['away_team'], detail['home_points'], detail['away_points']) == \
+        ('PIT', 'TEN', 13, 10)
+    assert detail['Referee'] == 'Bill Leavy'
+
+    team_performances = read_table('team_performances', 'raw')
+    assert len(team_performances) == 2 * len(GAMES)
+    overtime = team_performances.set_index(['game_id', 'team_id'])['otpts']
+    assert overtime[('2012_19_BAL_DEN', 'BAL')] == 3 and pd.isna(overtime[('2012_1_DAL_NYG', 'DAL')])
+
+    drives = read_table('drives', 'raw')
+    assert drives.groupby('game_id').size().to_dict() == {'2009_1_TEN_PIT': 9, '2012_19_BAL_DEN': 6,
+                                                          '2012_1_DAL_NYG': 8}
+    # Every page went into the page cache and every game into the journal
+    assert len(scrape_games.PageCache(scrape_games.CACHE_SITE).entries()) == len(GAMES)
+    assert ProgressJournal(str(data_dir / 'raw' / 'scrape_games.journal.jsonl')).completed() == set(GAMES)
+
+
+def test_scrape_games_again_keeps_the_games_written(data_dir):
+    write_missing(GAMES)
+    with serve_pages(PAGES_DIR) as (base_url, request_log):
+        scrape_games.main(['--base-url', base_url, '--rate', '600'])
+        # missing.py has not been run again, so the same games are still listed
+        assert scrape_games.main(['--base-url', base_url, '--rate', '600']) is None
+
+    assert len(request_log) == len(GAMES)
+    assert sorted(read_table('game_detail', 'raw')['game_id']) == sorted(GAMES)
+    assert len(read_table('team_performances', 'raw')) == 2 * len(GAMES)
+
+
+def test_scrape_games_skips_pages_that_fail(data_dir):
+    write_missing({**GAMES, '2010_1_CIN_NWE': '201009120nwe'})
+    with serve_pages(PAGES_DIR) as (base_url, request_log):
+        assert scrape_games.main(['--base-url', base_url, '--rate', str(RATE)]) == 1
+        # Only the game that failed is fetched again
+        assert scrape_games.main(['--base-url', base_url, '--rate', str(RATE)]) == 1
+
+    assert len(request_log) == len(GAMES) + 2
+    assert sorted(read_table('game_detail', 'raw')['game_id']) == sorted(GAMES)
+
+
+def test_scrape_games_continues_past_a_game_that_raises(data_dir, monkeypatch):
+    parse_game = scrape_games.parse_game
+
+    def failing_parse(game_id, html_source, parser=scrape_games.DEFAULT_PARSER):
+        if game_id == '2009_1_TEN_PIT':
+            raise ValueError('unexpected page layout')
+        return parse_game(game_id, html_source, parser)
+
+    monkeypatch.setattr(scrape_games, 'parse_game', failing_parse)
+    write_missing(GAMES)
+    with serve_pages(PAGES_DIR) as (base_url, _):
+        assert scrape_games.main(['--base-url', base_url, '--rate', '600']) == 1
+
+    assert sorted(read_table('game_detail', 'raw')['game_id']) == sorted(set(GAMES) - {'2009_1_TEN_PIT'})
+    assert ProgressJournal(str(data_dir / 'raw' / 'scrape_games.journal.jsonl')).completed() == \
+        set(GAMES) - {'2009_1_TEN_PIT'}
+
+
+def test_reparse_keeps_games_without_cached_pages(data_dir):
+    write_missing(GAMES)
+    with serve_pages(PAGES_DIR) as (base_url, _):
+        scrape_games.main(['--base-url', base_url, '--rate', '600'])
+    uncached = read_table('game_detail', 'raw').iloc[[0]].assign(game_id='2008_1_AAA_BBB')
+    write_table(pd.concat([read_table('game_detail', 'raw'), uncached]), 'game_detail', 'raw')
+
+    assert scrape_games.main(['--reparse', '--processes', '1']) == 0
+    assert sorted(read_table('game_detail', 'raw')['game_id']) == sorted([*GAMES, '2008_1_AAA_BBB'])
+    assert len(read_table('team_performances', 'raw')) == 2 * len(GAMES)
+
+
+def test_reparse_refuses_an_empty_cache(data_dir):
+    write_table(pd.DataFrame({'game_id': ['2009_1_TEN_PIT'], 'home_team': ['PIT']}), 'game_detail', 'raw')
+
+    assert scrape_games.main(['--reparse']) == 1
+    assert len(read_table('game_detail', 'raw')) == 1
+
+
+def test_fetcher_is_closed_when_the_loop_fails(data_dir, monkeypatch):
+    fetchers = []
+
+    def make_fetcher(backend):
+        fetchers.append(HttpFetcher())
+        fetchers[-1].closed = False
+        fetchers[-1].close = lambda: setattr(fetchers[-1], 'closed', True)
+        return fetchers[-1]
+
+    def write_games(batch, journal):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(scrape_games, 'make_fetcher', make_fetcher)
+    monkeypatch.setattr(scrape_games, 'write_games', write_games)
+    write_missing(GAMES)
+    with serve_pages(PAGES_DIR) as (base_url, _):
+        with pytest.raises(OSError):
+            scrape_games.main(['--base-url', base_url, '--rate', '600'])
+    assert fetchers[0].closed
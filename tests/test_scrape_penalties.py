@@ -0,0 +1,100 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import scrape_penalties
+from conftest import FIXTURES_DIR
+from utils.fake_server import serve_pages
+from utils.partitions import load_manifest
+from utils.storage import read_table, write_table
+
+PAGES_DIR = os.path.join(FIXTURES_DIR, 'nflpenalties')
+LABELS = ['2023_pittsburgh-steelers', '2023_tennessee-titans']
+
+
+@pytest.fixture
+def crawl(data_dir, tmp_path, monkeypatch):
+    """
+    Two teams and their 2023 season, the only season crawled, with the fixture pages copied to a served directory.
+    Yields the served directory and a function running main against it, which returns its status and requests.
+    """
+    monkeypatch.setattr(scrape_penalties, 'FIRST_SEASON', 2023)
+    monkeypatch.setattr(scrape_penalties, 'current_nfl_season', lambda: 2022)
+    write_table(pd.DataFrame({'team_id': ['PIT', 'TEN'], 'city': ['Pittsburgh', 'Tennessee'],
+                              'name': ['Steelers', 'Titans']}), 'teams', 'processed')
+    write_table(pd.DataFrame({'game_id': ['2023_01_TEN_PIT'], 'season': [2023], 'gameday': ['2023-09-10'],
+                              'away_team': ['TEN'], 'home_team': ['PIT'], 'home_score': [20]}), 'games', 'raw')
+    directory = tmp_path / 'served'
+    shutil.copytree(PAGES_DIR, directory)
+
+    def run(*args):
+        with serve_pages(str(directory)) as (base_url, request_log):
+            status = scrape_penalties.main(['--backend', 'http', '--base-url', base_url, '--rate', '6000', *args])
+        return status, sorted(path for _, path in request_log)
+
+    yield directory, run
+
+
+def test_crawl_writes_partitions_and_manifest(data_dir, crawl):
+    _, run = crawl
+    status, requests = run()
+
+    assert status is None and len(requests) == 2
+    steelers = read_table('penalties/2023_pittsburgh-steelers', 'raw')
+    assert steelers['Penalty'].tolist() == ['Roughing the Passer', 'False Start']
+    assert (steelers['Team'] == 'pittsburgh-steelers').all() and (steelers['Year'] == 2023).all()
+    assert len(read_table('penalties', 'raw')) == 3
+
+    hashes = load_manifest('penalties', 'raw')['inputs']
+    assert sorted(hashes['content']) == LABELS
+    # Both teams played a game that is settled, so the schedule is recorded
+    assert sorted(hashes['schedule']) == LABELS
+
+
+def test_unchanged_schedule_skips_the_fetch(data_dir, crawl):
+    _, run = crawl
+    run()
+
+    assert run() == (None, [])
+    assert len(read_table('penalties', 'raw')) == 3
+
+
+def test_interrupted_crawl_fetches_only_the_missing_pages(data_dir, crawl):
+    directory, run = crawl
+    os.remove(directory / 'tennessee-titans_year-2023_view-log.htm')
+    status, requests = run()
+
+    # The failed page makes the run fail, and the page that was stored is kept
+    assert status == 1 and len(requests) == 2
+    assert sorted(load_manifest('penalties', 'raw')['inputs']['content']) == ['2023_pittsburgh-steelers']
+
+    shutil.copy(os.path.join(PAGES_DIR, 'tennessee-titans_year-2023_view-log.htm'), directory)
+    status, requests = run()
+    assert status is None and requests == ['/team/tennessee-titans?year=2023&view=log']
+    assert sorted(read_table('penalties', 'raw')['Team']) == ['pittsburgh-steelers'] * 2 + ['tennessee-titans']
+
+
+def test_seed_partitions_splits_an_existing_penalties_csv(data_dir):
+    teams_df = pd.DataFrame({'team_id': ['PIT', 'TEN'], 'city': ['Pittsburgh', 'Tennessee'],
+                             'name': ['Steelers', 'Titans']})
+    penalties = pd.DataFrame({
+        'Penalty': ['False Start', 'Offensive Holding', 'Offside', 'Face Mask', 'Tripping'],
+        'Yardage': [5, 10, 5, 15, 10],
+        'Team': ['pittsburgh-steelers', 'tennessee-titans', 'pittsburgh-steelers', 'pittsburgh-steelers',
+                 'tennessee-titans'],
+        'Year': [2022, 2022, 2023, 2023, 2023],
+    })
+    write_table(penalties, 'penalties', 'raw')
+    schedules = {('PIT', 2022): ('pit-2022', True), ('TEN', 2022): ('ten-2022', True),
+                 ('PIT', 2023): ('pit-2023', True), ('TEN', 2023): ('ten-2023', True)}
+    hashes = {'schedule': {}, 'content': {}}
+
+    scrape_penalties.seed_partitions(teams_df, schedules, hashes)
+
+    assert sorted(hashes['content']) == ['2022_pittsburgh-steelers', '2022_tennessee-titans', *LABELS]
+    steelers = read_table('penalties/2023_pittsburgh-steelers', 'raw')
+    assert steelers['Penalty'].tolist() == ['Offside', 'Face Mask']
+    # Only the seasons before the last one in the file are complete and recorded against their schedule
+    assert hashes['schedule'] == {'2022_pittsburgh-steelers': 'pit-2022', '2022_tennessee-titans': 'ten-2022'}